@@ -0,0 +1,148 @@
+"""
+QC_Batch.py
+Multi-year batch mode ('batchYears' parameter in SFAN_AccessQCChecks.py or --years on the command line) - the QC
+workflow is run for a range of years in one process.
+
+The years share one warm database backend session (Access COM session and pooled ODBC connections), the Access
+processes are closed once and 'tbl_QCQueries' is read once for the batch.  The QC checks of the years are processed one
+year after the other: every year rebuilds the same Front End QC queries (e.g. 'qsel_QA_Control') and checks not scoped
+to the year (e.g. qa_j182_Predator_ActivityType) flag the same records, so the years' writes conflict.  The read only
+preparation of the next year (yearly records - createYearlyRecs) runs concurrently with the QC checks of the current
+year.  Per year and total times are reported.  A year failing (any exception, SystemExit included - e.g. an exit in
+a data management routine) is logged and recorded in 'failedYears', the batch continues with the next year.
+"""
+import sys
+import traceback
+import logging
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+import generalDM as dm
+import QC_Checks as qc
+import QC_Registry as qcr
+
+logger = logging.getLogger(__name__)
+
+class qcBatchClass:
+    """
+    QC run for a range of years of a protocol
+    """
+
+    def __init__(self, protocol, inDBBE, inDBFE, years, inUser):
+        """
+        Define the instantiated batch attributes
+
+        :param protocol: Name of the Protocol being processes
+        :param inDBBE: Protocol Backend Access database full path
+        :param inDBFE: Protocol Frontend Access database full path
+        :param years: Years to be processed, in processing order
+        :param inUser: NPS UserName
+
+        :return: instantiated self object
+        """
+
+        self.protocol = protocol
+        self.inDBBE = inDBBE
+        self.inDBFE = inDBFE
+        self.years = list(years)
+        self.inUser = inUser
+        # Processing time in seconds per year
+        self.yearSeconds = {}
+        # Years stopped on an error or not fully processed (process_QCRequest)
+        self.failedYears = []
+
+    def parseYears(yearRange):
+        """
+        Years of a year range argument - e.g. '2019-2023', '2019,2021,2023' or '2023'.  A reversed range (e.g.
+        '2023-2019') is read as the same range ascending, duplicate years are dropped keeping the first occurrence.
+
+        :param yearRange: Year range string
+
+        :return: years: List of years
+        """
+
+        years = []
+        for part in yearRange.split(','):
+            part = part.strip()
+            if '-' in part:
+                startYear, endYear = sorted(int(value) for value in part.split('-', 1))
+                years.extend(range(startYear, endYear + 1))
+            elif part:
+                years.append(int(part))
+
+        return list(dict.fromkeys(years))
+
+    def run(self, dmInstance, jobs=1, incremental=False, engine='sql', engineParity=False, snapshotCache=False):
+        """
+        Run the QC workflow for the years of the batch (qcChecks.process_QCRequest per year)
+
+        :param dmInstance: Data Management Instance
+        :param jobs: Number of QC queries processed concurrently within a year
+        :param incremental: Incremental mode (QC_Incremental.py)
+        :param engine: 'sql' or 'pandas' (QC_Engine.py)
+        :param engineParity: Engine parity mode
+        :param snapshotCache: Snapshot cache of the engine tables (QC_Snapshot.py)
+
+        :return: yearSeconds: Dictionary - year: processing time in seconds
+        """
+
+        batchStart = perf_counter()
+        protocolClass = qcr.qcRegistryClass.loadProtocol(self.protocol)
+        if protocolClass is None:
+            logMsg = f"WARNING Protocol Specific Instance - {self.protocol} - has not been defined."
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.critical(logMsg)
+            return self.yearSeconds
+
+        qcCheckInstances = [qc.qcChecks(protocol=self.protocol, inDBBE=self.inDBBE, inDBFE=self.inDBFE, yearLU=year,
+                                        inUser=self.inUser) for year in self.years]
+
+        # One backend session for all years (Access COM session), process_QCRequest reuses the active session
+        with dm.generalDMClass.backendSession(), ThreadPoolExecutor(max_workers=1) as prefetchPool:
+
+            # 'tbl_QCQueries' is read once for the batch
+            querySpecs = qc.qcChecks.define_QuerySpecs(qc.qcChecks.define_QCQueries(qcCheckInstances[0]))
+
+            prefetch = prefetchPool.submit(protocolClass.createYearlyRecs, qcCheckInstances[0])
+            for yearIndex, qcCheckInstance in enumerate(qcCheckInstances):
+                yearLU = qcCheckInstance.yearLU
+                yearStart = perf_counter()
+                try:
+                    try:
+                        yearlyRecs = prefetch.result()
+                    finally:
+                        # Read the yearly records of the next year while the QC checks of this year run
+                        if yearIndex + 1 < len(qcCheckInstances):
+                            prefetch = prefetchPool.submit(protocolClass.createYearlyRecs,
+                                                           qcCheckInstances[yearIndex + 1])
+
+                    processed = qc.qcChecks.process_QCRequest(qcCheckInstance, dmInstance, jobs=jobs,
+                                                              incremental=incremental, engine=engine,
+                                                              engineParity=engineParity, snapshotCache=snapshotCache,
+                                                              querySpecs=querySpecs, yearlyRecs=yearlyRecs)
+                    if not processed:
+                        self.failedYears.append(yearLU)
+
+                # SystemExit included - the batch continues with the next year and reports the times
+                except (Exception, SystemExit) as e:
+                    self.failedYears.append(yearLU)
+                    logMsg = f'ERROR - An error occurred in the batch run for year {yearLU}: {e!r}'
+                    dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+                    logging.critical(logMsg, exc_info=True)
+                    traceback.print_exc(file=sys.stdout)
+
+                self.yearSeconds[yearLU] = perf_counter() - yearStart
+                logMsg = (f'Batch - finished QC Checks for {self.protocol} - {yearLU} in '
+                          f'{self.yearSeconds[yearLU]:.2f}s ({yearIndex + 1} of {len(self.years)} years)')
+                dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+                logging.info(logMsg)
+
+        yearTimes = ', '.join(f'{yearLU}: {seconds:.2f}s' for yearLU, seconds in self.yearSeconds.items())
+        logMsg = (f'Batch - processed {len(self.years)} years for {self.protocol} in {perf_counter() - batchStart:.2f}s'
+                  f' ({yearTimes}) - failed years: {self.failedYears or "none"}')
+        dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+        logging.info(logMsg)
+
+        return self.yearSeconds
+
+if __name__ == "__name__":
+    logger.info("Running QC_Batch.py")
@@ -0,0 +1,239 @@
+"""
+QC_Benchmarks.py
+Performance benchmarks for the data management routines used in the QC workflow.  Benchmarks are run against a scratch
+copy of a protocol database - do not point these at a production backend, benchmark tables are created and dropped.
+
+Benchmarks:
+createTableFromDF - rows/sec of the bulk 'executemany' loader versus the legacy 'iterrows' row by row insert loop.
+readColumnarDF - rows/sec of the columnar typed buffer fetch versus 'pd.read_sql' (connect_to_AcessDB_DF).
+applyQCFlag - seconds of the keyed 'IN' list flag updates versus the temp table join update per number of flagged keys,
+ used to choose 'QC_Checks.qcChecks.flagKeyedMaxKeys'.  The default (200) is not tuned - on one SQLite run (20000 row
+ table) keyed was faster up to 100-200 keys, the crossover on Access has not been measured.  Run against a scratch copy
+ of the Access Back End and set 'flagKeyedMaxKeys' in SFAN_AccessQCChecks.py (or --flag-keyed-max-keys).
+
+Python Environment: SFAN_QC - Python 3.11
+"""
+
+# Import Libraries
+import sys
+import time
+import traceback
+import numpy as np
+import pandas as pd
+import generalDM as dm
+import QC_Checks as qc
+import logging
+
+# Get the logger
+logger = logging.getLogger(__name__)
+
+# Scratch Access Database the benchmarks are run against
+inDBBench = r'C:\Users\KSherrill\OneDrive - DOI\SFAN\VitalSigns\SnowyPlovers_PORE\SNPLOVER\SNPL_IM\Data\Database\Dbase_BE\PORE_SNPL_BE_Benchmark.accdb'
+# Number of rows in the benchmark dataframes
+benchRows = 5000
+# Batch sizes evaluated for the bulk loader
+benchBatchSizes = [100, 1000, 5000]
+# Name of the scratch table created by the benchmarks
+benchTable = 'tmpBenchTable'
+# Number of timed repeats for the read benchmarks
+benchReadRepeats = 3
+# Number of flagged keys evaluated for the flag update benchmark
+benchFlagKeyCounts = [10, 50, 100, 200, 300, 500, 1000, 5000]
+
+def benchmarkFrame(numRows):
+    """
+    Create a synthetic dataframe resembling the flagged Event_ID/SNPL_Data_ID sets pushed to 'tmpQCTable', including
+    nullable pandas dtypes.
+
+    :param numRows: Number of rows to create
+
+    :return: benchDF: Synthetic dataframe
+    """
+
+    rng = np.random.default_rng(2024)
+    benchDF = pd.DataFrame({'Event_ID': [f'{{{i:08X}-0000-0000-0000-000000000000}}' for i in range(numRows)],
+                            'SNPL_Data_ID': pd.array(rng.integers(1, 10**6, numRows), dtype='Int64'),
+                            'Loc_Name': pd.Categorical(rng.choice(['Abbotts', 'Kehoe', 'Limantour', 'North Beach'],
+                                                                  numRows)),
+                            'SNPL_Bands': rng.integers(0, 6, numRows).astype('float64'),
+                            'Start_Date': pd.Timestamp('2023-04-01') + pd.to_timedelta(
+                                rng.integers(0, 180, numRows), unit='D')})
+
+    return benchDF
+
+def dropBenchTable(tableName, inDBPath):
+    """
+    Drop the benchmark table via the run database backend if it exists
+
+    :param tableName: Name of the benchmark table
+    :param inDBPath: Path to the benchmark database
+
+    :return:
+    """
+
+    dm.generalDMClass.getBackend().dropObject(tableName, inDBPath, 'table')
+
+def insertRowsIterrows(df, tableName, inDBPath):
+    """
+    Legacy 'createTableFromDF' insert loop - one 'cursor.execute' per 'df.iterrows()' row, used as the benchmark
+    baseline.  Nullable extension dtypes are cast to object prior to loading as the legacy routine did not support them.
+
+    :param df: Data Frame to be loaded
+    :param tableName: Name of table to be created
+    :param inDBPath: Path to the benchmark database
+
+    :return:
+    """
+
+    col_defs = [f"[{column}] {dm.generalDMClass.accessColumnType(dtype)}" for column, dtype in
+                zip(df.columns, df.dtypes)]
+    legacyDF = pd.DataFrame(dm.generalDMClass.frameToRecords(df), columns=df.columns, dtype=object)
+
+    with dm.generalDMClass.pooledConnection(inDBPath) as cnxn:
+        cursor = cnxn.cursor()
+        cursor.execute(f"CREATE TABLE {tableName} ({', '.join(col_defs)})")
+
+        for index, row in legacyDF.iterrows():
+            insert_query = f"INSERT INTO {tableName} VALUES ({', '.join(['?' for _ in row])})"
+            cursor.execute(insert_query, tuple(row))
+
+        cnxn.commit()
+        cursor.close()
+
+def timeRun(function, *args, **kwargs):
+    """
+    Time the passed function
+
+    :return: elapsed: Elapsed seconds
+    """
+
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    return elapsed
+
+def benchmarkCreateTableFromDF(inDBPath, numRows, batchSizes):
+    """
+    Benchmark rows/sec of the legacy iterrows insert loop versus the bulk 'createTableFromDF' loader
+
+    :param inDBPath: Path to the benchmark database
+    :param numRows: Number of rows to load
+    :param batchSizes: List of batch sizes to evaluate for the bulk loader
+
+    :return: resultsDF: Dataframe with Method, BatchSize, Rows, Seconds and RowsPerSec
+    """
+
+    benchDF = benchmarkFrame(numRows)
+    results = []
+
+    dropBenchTable(benchTable, inDBPath)
+    elapsed = timeRun(insertRowsIterrows, benchDF, benchTable, inDBPath)
+    results.append({'Method': 'iterrows', 'BatchSize': 1, 'Rows': numRows, 'Seconds': elapsed})
+
+    for batchSize in batchSizes:
+        dropBenchTable(benchTable, inDBPath)
+        elapsed = timeRun(dm.generalDMClass.createTableFromDF, benchDF, benchTable, inDBPath, batchSize=batchSize)
+        results.append({'Method': 'executemany', 'BatchSize': batchSize, 'Rows': numRows, 'Seconds': elapsed})
+
+    dropBenchTable(benchTable, inDBPath)
+
+    resultsDF = pd.DataFrame(results)
+    resultsDF['RowsPerSec'] = (resultsDF['Rows'] / resultsDF['Seconds']).round(1)
+
+    return resultsDF
+
+def benchmarkReadColumnar(inDBPath, numRows, repeats):
+    """
+    Benchmark rows/sec of 'pd.read_sql' (connect_to_AcessDB_DF) versus the columnar typed buffer fetch
+    (readColumnarDF) over the benchmark table, best of 'repeats' runs.
+
+    :param inDBPath: Path to the benchmark database
+    :param numRows: Number of rows in the benchmark table
+    :param repeats: Number of timed runs per method
+
+    :return: resultsDF: Dataframe with Method, Rows, Seconds and RowsPerSec
+    """
+
+    dropBenchTable(benchTable, inDBPath)
+    dm.generalDMClass.createTableFromDF(benchmarkFrame(numRows), benchTable, inDBPath)
+    inQuery = f"SELECT * FROM {benchTable}"
+
+    methods = {'read_sql': lambda: dm.generalDMClass.connect_to_AcessDB_DF(inQuery, inDBPath),
+               'columnar': lambda: dm.generalDMClass.readColumnarDF(inQuery, inDBPath, categoricalColumns=['Loc_Name'],
+                                                                    parseDates=['Start_Date'])}
+    results = []
+    for method, function in methods.items():
+        elapsed = min(timeRun(function) for _ in range(repeats))
+        results.append({'Method': method, 'Rows': numRows, 'Seconds': elapsed})
+
+    dropBenchTable(benchTable, inDBPath)
+
+    resultsDF = pd.DataFrame(results)
+    resultsDF['RowsPerSec'] = (resultsDF['Rows'] / resultsDF['Seconds']).round(1)
+
+    return resultsDF
+
+def benchmarkFlagUpdate(inDBPath, numRows, keyCounts):
+    """
+    Benchmark seconds of the keyed 'IN' list flag updates (applyFlagKeyed) versus the temp table join update
+    (applyFlagTempTable) per number of flagged keys.  The flag field of the benchmark table is reset before each run.
+
+    :param inDBPath: Path to the benchmark database
+    :param numRows: Number of rows in the benchmark table
+    :param keyCounts: List of the number of keys to flag
+
+    :return: resultsDF: Dataframe with Method, Keys, Seconds and KeysPerSec
+    """
+
+    benchDF = benchmarkFrame(numRows)[['Event_ID']].copy()
+    benchDF['QCFlag'] = pd.Series([None] * numRows, dtype=object)
+    dropBenchTable(benchTable, inDBPath)
+    dm.generalDMClass.createTableFromDF(benchDF, benchTable, inDBPath)
+
+    querySpec = qc.qcQuerySpecClass(queryName='qa_Benchmark', qcFlag='BNCH', flagFieldTable='QCFlag',
+                                    flagFieldQuery='QCFlag', flagTable=benchTable, joinField='Event_ID')
+    methods = {'keyed': qc.qcChecks.applyFlagKeyed, 'tempTable': qc.qcChecks.applyFlagTempTable}
+
+    results = []
+    for keyCount in keyCounts:
+        keysDF = benchDF[['Event_ID']].head(keyCount)
+        for method, function in methods.items():
+            dm.generalDMClass.excuteQuery(f"UPDATE {benchTable} SET {benchTable}.QCFlag = Null;", inDBPath)
+            elapsed = timeRun(function, querySpec, keysDF, inDBPath)
+            results.append({'Method': method, 'Keys': len(keysDF), 'Seconds': elapsed})
+
+    dropBenchTable(benchTable, inDBPath)
+    dropBenchTable(f'tmpQCTable_{benchTable}', inDBPath)
+
+    resultsDF = pd.DataFrame(results)
+    resultsDF['KeysPerSec'] = (resultsDF['Keys'] / resultsDF['Seconds']).round(1)
+
+    return resultsDF
+
+def main():
+
+    try:
+        resultsDF = benchmarkCreateTableFromDF(inDBBench, benchRows, benchBatchSizes)
+        print(resultsDF.to_string(index=False))
+
+        resultsDF = benchmarkReadColumnar(inDBBench, benchRows, benchReadRepeats)
+        print(resultsDF.to_string(index=False))
+
+        resultsDF = benchmarkFlagUpdate(inDBBench, benchRows, benchFlagKeyCounts)
+        print(resultsDF.to_string(index=False))
+
+    except Exception as e:
+
+        logMsg = f'ERROR - "Exiting Error - QC_Benchmarks.py: {e}'
+        print(logMsg)
+        logging.critical(logMsg, exc_info=True)
+        traceback.print_exc(file=sys.stdout)
+
+    finally:
+        dm.generalDMClass.closeConnections()
+
+if __name__ == '__main__':
+
+    # Run Main Code Bloc
+    main()
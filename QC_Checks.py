@@ -3,19 +3,111 @@ QC_Checks.py
 QC_Checks Methods/Functions to be used for general Quality Control Validation workflow.
 """
 #Import Required Dependices
-import pandas as pd
 import glob, os, sys, traceback
+import threading
+from contextlib import nullcontext
 import generalDM as dm
-import QC_Checks_SNPLPORE as SNPLP
+import QC_Scheduler as qcs
+import QC_Registry as qcr
+import QC_Incremental as qci
+import QC_Snapshot as qsn
 import logging
 import log_config
+from lazyImports import lazyModuleClass
+
+# pandas is imported on first use, protocol modules (e.g. QC_Checks_SNPLPORE) are imported by the QC registry when the
+# protocol is processed
+pd = lazyModuleClass('pandas')
 
 logger = logging.getLogger(__name__)
+
+class qcQuerySpecClass:
+    """
+    Immutable definition of a QC query from table 'tbl_QCQueries' - query name, description and the QC flag fields.
+    Built once per run ('qcChecks.define_QuerySpecs') and passed to the query and flag routines.
+    """
+
+    __slots__ = ('queryName', 'queryDescription', 'qcFlag', 'flagFieldTable', 'flagFieldQuery', 'flagTable',
+                 'joinField')
+
+    # 'tbl_QCQueries' field per attribute
+    recordFields = {'queryName': 'QueryName', 'queryDescription': 'QueryDescription', 'qcFlag': 'QCFlag',
+                    'flagFieldTable': 'FlagFieldTable', 'flagFieldQuery': 'FlagFieldQuery', 'flagTable': 'FlagTable',
+                    'joinField': 'JoinField'}
+
+    def __init__(self, queryName, queryDescription=None, qcFlag=None, flagFieldTable=None, flagFieldQuery=None,
+                 flagTable=None, joinField=None):
+        """
+        Define the instantiated QC query attributes, attributes can not be changed once defined
+
+        :param queryName: Query name - 'QueryName' in 'tbl_QCQueries'
+        :param queryDescription: Query description - 'QueryDescription'
+        :param qcFlag: Flag code to apply (e.g. 'DFO') - 'QCFlag'
+        :param flagFieldTable: Flag field in the flag table the QC flag is applied to - 'FlagFieldTable'
+        :param flagFieldQuery: Flag field in the QC query checked for an existing flag - 'FlagFieldQuery'
+        :param flagTable: Table the QC flag is applied to (e.g. 'tbl_Events') - 'FlagTable'
+        :param joinField: Field joining the QC query and the flag table (e.g. 'Event_ID') - 'JoinField'
+
+        :return: instantiated self object
+        """
+
+        for attribute, value in (('queryName', queryName), ('queryDescription', queryDescription),
+                                 ('qcFlag', qcFlag), ('flagFieldTable', flagFieldTable),
+                                 ('flagFieldQuery', flagFieldQuery), ('flagTable', flagTable),
+                                 ('joinField', joinField)):
+            object.__setattr__(self, attribute, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"QC query definition '{self.queryName}' is read only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"QC query definition '{self.queryName}' is read only")
+
+    def __repr__(self):
+        return f"<QC query '{self.queryName}' - flag {self.qcFlag} on {self.flagTable}>"
+
+    def fromRecord(record):
+        """
+        Create the QC query definition from a 'tbl_QCQueries' record, missing and null values are set to None
+
+        :param record: Dictionary - 'tbl_QCQueries' field: value
+
+        :return: querySpec: qcQuerySpecClass instance
+        """
+
+        values = {}
+        for attribute, field in qcQuerySpecClass.recordFields.items():
+            value = record.get(field)
+            values[attribute] = None if value is None or (not isinstance(value, str) and pd.isna(value)) else value
+
+        return qcQuerySpecClass(**values)
+
 class qcChecks:
 
     #Class Variables
     numqcChecksInstances = 0
 
+    # Flag candidates (records without the QC flag) are selected in the database, False to filter client side
+    flagCandidatePushdown = True
+
+    # Flags for up to 'flagKeyedMaxKeys' keys are applied with keyed 'IN' list updates of 'flagKeyedChunkSize' keys,
+    # larger key sets via the temp table join update.  200 is a default, not a tuned value - it was only compared on
+    # the SQLite backend (QC_Benchmarks.benchmarkFlagUpdate), the Access crossover is unknown.  Configurable via
+    # 'flagKeyedMaxKeys' in SFAN_AccessQCChecks.py or --flag-keyed-max-keys on the command line.
+    flagKeyedMaxKeys = 200
+    flagKeyedChunkSize = 50
+
+    # Parameterized 'tbl_QA_Results' statements - the SQL text is identical for every QC check so
+    # each is prepared once per connection (backend prepared statement cache) and re-executed with new parameters
+    qaResultsKeysSQL = "SELECT Query_Name FROM tbl_QA_Results WHERE [Time_Frame] = ?;"
+    qaResultsUpdateSQL = ("UPDATE tbl_QA_Results SET tbl_QA_Results.Query_Type = ?, tbl_QA_Results.Query_Result = ?,"
+                          " tbl_QA_Results.Query_Run_Time = ?, tbl_QA_Results.Query_Description = ?,"
+                          " tbl_QA_Results.QA_User = ?, tbl_QA_Results.Is_Done = ?, tbl_QA_Results.Data_Scope = ?"
+                          " WHERE tbl_QA_Results.Query_Name = ? AND tbl_QA_Results.Time_Frame = ?;")
+    qaResultsInsertSQL = ("INSERT INTO tbl_QA_Results ( Query_Name, Time_Frame, Query_Type, Query_Result,"
+                          " Query_Run_Time, Query_Description, QA_User, Is_Done, Data_Scope) VALUES (?, ?, ?, ?, ?,"
+                          " ?, ?, ?, ?);")
+
     def __init__(self, protocol, inDBBE, inDBFE, yearLU, inUser):
         """
         Define the instantiated QCChecks attributes
@@ -34,28 +126,62 @@ class qcChecks:
         self.inDBFE = inDBFE
         self.yearLU = yearLU
         self.inUser = inUser
+        # QC_Scheduler.qcSchedulerClass instance of the run, defined in 'process_QCRequest'
+        self.scheduler = None
+        # QC_Incremental.qcIncrementalClass instance of the run in incremental mode, defined in 'process_QCRequest'
+        self.incremental = None
+        # 'tbl_QA_Results' summaries collected during the run - query name: summary record ('qaResultsInsertSQL'
+        # field order), written in one upsert at the end of the run ('writeQAResults'). None outside of a run.
+        self.qaResults = None
+        self.qaResultsLock = threading.Lock()
+        # In-memory evaluation engine of the run (QC_Engine.py) with 'engine' 'pandas', defined in 'process_QCRequest'.
+        # None if the QC Queries are read from the Front End.
+        self.engine = None
+        self.engineParity = False
+        # SQL of the queries pushed to the Front End in the run - query name: SQL (check keys in incremental mode)
+        self.pushedQueries = {}
+        # Temp tables (tmpQCTable_{FlagTable}) created in the Back End during the run, dropped at the end of the run
+        self.tempTables = set()
 
         #Update the Class Variable
         qcChecks.numqcChecksInstances += 1
 
-    def process_QCRequest(qcCheckInstance, dmInstance):
+    def process_QCRequest(qcCheckInstance, dmInstance, jobs=1, incremental=False, engine='sql', engineParity=False,
+                          snapshotCache=False, querySpecs=None, yearlyRecs=None):
 
         """
         General Quality Control workflow processing workflow steps.
-        Workflow will iterate throug the queries by protocol defined in the 'tbl_QCQuries' table
+        Workflow will iterate throug the queries by protocol defined in the 'tbl_QCQuries' table.  Queries are run by
+        the QC scheduler (QC_Scheduler.py), with 'jobs' > 1 independent queries are processed concurrently.
 
         :param qcCheckInstance: QC Check Instance
         :param dmInstance: data management instance which will have the logfile name
-
-        :return:
+        :param jobs: Number of QC queries processed concurrently
+        :param incremental: Incremental mode - QC queries whose source tables are unchanged since the last run for the
+         year reuse their 'tbl_QA_Results' record (QC_Incremental.py)
+        :param engine: 'sql' - record counts and flag candidates are read from the pushed QC Queries, 'pandas' - the
+         QC Queries are evaluated in memory by the protocol engine (QC_Engine.py)
+        :param engineParity: With engine 'pandas' compare the engine result of each QC query with the pushed QC Query,
+         on a mismatch the QC Query is used
+        :param snapshotCache: With engine 'pandas' read the tables of the year from local snapshots when unchanged
+         since the snapshot was taken (QC_Snapshot.py)
+        :param querySpecs: Query definitions from 'tbl_QCQueries' (define_QuerySpecs) shared across runs (e.g. years
+         of a batch run, QC_Batch.py), None reads 'tbl_QCQueries'
+        :param yearlyRecs: Output of the protocol 'createYearlyRecs' if already read (e.g. prefetched by the batch
+         run), None reads the yearly records
+
+        :return: processed: True if all QC Queries were processed and their 'tbl_QA_Results' summaries written, False if
+         the run stopped on an error (logged)
         """
 
         #Configure Logging:
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-        # Create the protocol specific instance
-        if qcCheckInstance.protocol == 'SNPLPORE':
-            qcProtocolInstance = SNPLP.qcProtcol_SNPLPORE()
+        # Create the protocol specific instance - the protocol module (QC_Checks_{protocol}.py) is imported on first use
+        # and registers the protocol class and its QC checks (QC_Registry.py)
+        protocolClass = qcr.qcRegistryClass.loadProtocol(qcCheckInstance.protocol)
+        if protocolClass is not None:
+            qcProtocolInstance = protocolClass()
         else:
             logMsg = f"WARNING Protocol Specific Instance - {qcCheckInstance.protocol} - has not been defined."
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
@@ -63,50 +189,212 @@ class qcChecks:
             traceback.print_exc(file=sys.stdout)
             sys.exit()
 
-        # Get the Subset of records for the year
-        outMethod = SNPLP.qcProtcol_SNPLPORE.createYearlyRecs(qcCheckInstance)
-        yearlyRecDF = outMethod[0]
-        inQuerySel = outMethod[1]
-
-        filterQueryName = qcProtocolInstance.filterRecQuery
-        # Push Yearly Records to be used in the QC routines back to Backend (i.e. qsel_QA_Control)
-        # Only need to do this once per year being processed
-        qcChecks.pushQueryToDB(inQuerySel, filterQueryName, qcCheckInstance, dmInstance)
-
-        #Define the Queries to process
-        outDFQueries = qcChecks.define_QCQueries(qcCheckInstance)
-
-        try:
-            # Iterate through the QC Queries defined in 'tbl_QCQueries' via outDFQueries
-            for index, row in outDFQueries.iterrows():
-                queryName_LU = row.get('QueryName')
-                queryDecrip_LU = row.get('QueryDescription')
-                if qcCheckInstance.protocol.lower() == 'snplpore':
-
-                    #Process each QC Routine
-                    SNPLP.qcProtcol_SNPLPORE.processQuery(queryName_LU, queryDecrip_LU, yearlyRecDF,
-                                                                         qcCheckInstance, dmInstance)
-
-                elif qcCheckInstance.protocol.lower() == 'salmonids': #To Be Developed 7/16/2024
-                    print('Test')
-
-                else:
-                    logMsg = f"WARNING - {qcCheckInstance.protocol} - Exiting script"
+        # Open the database backend session for the run (Access COM session) - each database is opened once and the
+        # QueryDefs/TableDefs operations for all QC checks are served from it. Reuses the session if already active.
+        with dm.generalDMClass.backendSession():
+
+            # Get the Subset of records for the year
+            outMethod = yearlyRecs if yearlyRecs is not None else protocolClass.createYearlyRecs(qcCheckInstance)
+            yearlyRecDF = outMethod[0]
+            inQuerySel = outMethod[1]
+
+            filterQueryName = qcProtocolInstance.filterRecQuery
+            # Push Yearly Records to be used in the QC routines back to Backend (i.e. qsel_QA_Control)
+            # Only need to do this once per year being processed
+            qcChecks.pushQueryToDB(inQuerySel, filterQueryName, qcCheckInstance, dmInstance)
+
+            # In-memory evaluation engine - source tables of the year are read once
+            if engine == 'pandas':
+                engineClass = getattr(protocolClass, 'engineClass', None)
+                if engineClass is None:
+                    logMsg = (f'WARNING - No QC evaluation engine defined for - {qcCheckInstance.protocol} - QC '
+                              f'Queries are read from the Front End')
                     dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
                     logging.warning(logMsg)
-                    exit()
+                else:
+                    snapshot = (qsn.qcSnapshotClass(qcCheckInstance.inDBBE, qcCheckInstance.yearLU) if snapshotCache
+                                else None)
+                    qcCheckInstance.engine = engineClass(qcCheckInstance, yearlyRecDF, snapshot=snapshot)
+                    qcCheckInstance.engineParity = engineParity
+                    if not qcCheckInstance.engine.load(dmInstance):
+                        qcCheckInstance.engine = None
+
+            #Define the Queries to process - 'tbl_QCQueries' is read once, the query definitions are passed to the
+            # query and flag routines
+            if querySpecs is None:
+                querySpecs = qcChecks.define_QuerySpecs(qcChecks.define_QCQueries(qcCheckInstance))
+
+            # Registered check metadata disagreeing with 'tbl_QCQueries' - the 'tbl_QCQueries' flag table is used
+            for mismatch in qcr.qcRegistryClass.validateChecks(qcCheckInstance.protocol, querySpecs):
+                logMsg = f'WARNING - {mismatch}'
+                dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+                logging.warning(logMsg)
+
+            # Dependencies (registered check metadata) and flag table (write group) by query name - the write group is
+            # the 'tbl_QCQueries' flag table the flags are applied to (applyQCFlag), None if the check applies no flags
+            protocolChecks = qcr.qcRegistryClass.protocolChecks(qcCheckInstance.protocol)
+            dependencies = {}
+            writeGroups = {}
+            for queryName_LU, querySpec in querySpecs.items():
+                checkSpec = protocolChecks.get(queryName_LU)
+                if checkSpec is not None:
+                    dependencies[queryName_LU] = checkSpec.dependsOn
+                appliesFlags = checkSpec is None or checkSpec.appliesFlags
+                writeGroups[queryName_LU] = querySpec.flagTable if appliesFlags else None
+
+            # Schedule the queries - queries flagging the same table apply their flags in 'tbl_QCQueries' order, checks
+            # declaring 'dependsOn' run after the checks they depend on
+            qcCheckInstance.scheduler = qcs.qcSchedulerClass(checkNames=list(querySpecs),
+                                                             dependencies=dependencies, writeGroups=writeGroups,
+                                                             jobs=jobs)
+
+            # Incremental mode - fingerprint the source tables and define the QC queries to be reused
+            if incremental:
+                qcCheckInstance.incremental = qci.qcIncrementalClass(qcCheckInstance, protocolClass, protocolChecks,
+                                                                     querySpecs)
+                qcCheckInstance.incremental.prepare(dmInstance)
+
+            def processCheck(queryName_LU):
+                """
+                Process one QC Query, called by the scheduler
+
+                :param queryName_LU: Name of the QC query being processed
+
+                :return:
+                """
+
+                #Process each QC Routine
+                protocolClass.processQuery(querySpecs[queryName_LU], yearlyRecDF, qcCheckInstance, dmInstance)
 
                 # Message QC Check Completed
                 logMsg = f'Successfully Finished QC Check Script for - {qcCheckInstance.protocol} - {queryName_LU}'
                 dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
                 logging.info(logMsg)
 
-        except Exception as e:
+            # Collect the 'tbl_QA_Results' summaries of the QC Queries, written once the queries are processed
+            qcCheckInstance.qaResults = {}
+            processed = False
+
+            try:
+                try:
+                    # Run the QC Queries defined in 'tbl_QCQueries' via outDFQueries
+                    runSeconds = qcCheckInstance.scheduler.run(processCheck)
+                finally:
+                    # Upsert the collected summaries in one transaction - also the summaries of the queries
+                    # processed before an error
+                    qcSummaries = qcCheckInstance.qaResults
+                    qcCheckInstance.qaResults = None
+                    qaResultsWritten = qcChecks.writeQAResults(list(qcSummaries.values()), qcCheckInstance,
+                                                               dmInstance)
+                    qcChecks.dropTempTables(qcCheckInstance, dmInstance)
+
+                logMsg = (f'Processed {len(querySpecs)} QC Queries with {qcCheckInstance.scheduler.jobs} '
+                          f'job(s) in {runSeconds:.2f}s - sum of query times '
+                          f'{sum(qcCheckInstance.scheduler.checkSeconds.values()):.2f}s')
+                dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+                logging.info(logMsg)
+                processed = qaResultsWritten
+
+                # Record the source table fingerprints for the next incremental run - not if the 'tbl_QA_Results'
+                # summaries were rolled back, the stored records are not current
+                if qcCheckInstance.incremental is not None and qaResultsWritten:
+                    qcCheckInstance.incremental.record(dmInstance)
+
+            except Exception as e:
+
+                logMsg = (f'ERROR - An error occurred process_QCRequest: {e}')
+                dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+                logging.critical(logMsg, exc_info=True)
+                traceback.print_exc(file=sys.stdout)
+
+        return processed
+
+    def reuseQAResults(qcCheckInstance, querySpec, inQuerySel, dmInstance):
+        """
+        In incremental mode check if the stored 'tbl_QA_Results' record of the query is reused (source tables, check
+        SQL and 'tbl_QCQueries' flag definition unchanged since the last run for the year), if yes the record count and
+        QC flag updates are skipped
+
+        :param qcCheckInstance: QC Check Instance
+        :param querySpec: Definition of the QueryName being processed (qcQuerySpecClass)
+        :param inQuerySel: SQL of the check query
+        :param dmInstance: Data Management Instance
+
+        :return: reuse: True if the stored record is reused
+        """
+
+        if qcCheckInstance.incremental is None:
+            return False
+
+        return qcCheckInstance.incremental.reuseResult(querySpec, inQuerySel, qcCheckInstance.pushedQueries,
+                                                       dmInstance)
+
+    def commitCheck(querySpec, qcCheckInstance, flagKeysDF=None):
+        """
+        Mark the QC query as committed once its write batch (QC flag updates) is executed - the flagged keys are
+        recorded in the engine flag state and in incremental mode only committed queries are recorded for the next run
+
+        :param querySpec: Definition of the QueryName being processed (qcQuerySpecClass)
+        :param qcCheckInstance: QC Check Instance
+        :param flagKeysDF: Dataframe with the join field values flagged by the committed batch (applyQCFlag), None if
+         no flags were applied
+
+        :return:
+        """
+
+        # Keep the engine flag state in step with the flag table for the following checks
+        if qcCheckInstance.engine is not None and flagKeysDF is not None and len(flagKeysDF) > 0:
+            qcCheckInstance.engine.recordFlags(querySpec, flagKeysDF)
 
-            logMsg = (f'ERROR - An error occurred process_QCRequest: {e}')
+        if qcCheckInstance.incremental is not None:
+            qcCheckInstance.incremental.commitCheck(querySpec.queryName)
+
+    def engineResult(querySpec, qcCheckInstance, dmInstance):
+        """
+        Result records of the QC query computed by the in-memory evaluation engine.  In parity mode the result is
+        only used if it matches the pushed QC Query.
+
+        :param querySpec: Definition of the QueryName being processed (qcQuerySpecClass)
+        :param qcCheckInstance: QC Check Instance
+        :param dmInstance: Data Management Instance
+
+        :return: resultDF: Dataframe of the query records, None if the query is not evaluated by the engine (the
+         pushed QC Query is read)
+        """
+
+        engine = qcCheckInstance.engine
+        queryName = querySpec.queryName
+        if engine is None or not engine.hasEvaluator(queryName):
+            return None
+
+        try:
+            resultDF = engine.evaluate(queryName)
+        except Exception as e:
+            logMsg = f'WARNING - Engine evaluation failed for - {queryName} - using the QC Query: {e}'
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
-            logging.critical(logMsg, exc_info=True)
-            traceback.print_exc(file=sys.stdout)
+            logging.warning(logMsg, exc_info=True)
+            return None
+
+        if qcCheckInstance.engineParity and not engine.checkParity(querySpec, resultDF, dmInstance):
+            return None
+
+        return resultDF
+
+    def writeTurn(qcCheckInstance, queryName):
+        """
+        Context manager for the write phase (QC flag writes) of a QC query, waits on the write phase of the previous
+        query flagging the same table when run by the scheduler
+
+        :param qcCheckInstance: QC Check Instance
+        :param queryName: Name of the QC query being processed
+
+        :return: Context manager
+        """
+
+        if qcCheckInstance.scheduler is None:
+            return nullcontext()
+
+        return qcCheckInstance.scheduler.writeTurn(queryName)
 
     def define_QCQueries(qcCheckInstance):
         """
@@ -124,193 +412,471 @@ class qcChecks:
 
         return outDFQueries
 
-    def pushQueryToDB(inQuerySel, queryName, qcCheckInstance,dmInstance):
+    def define_QuerySpecs(outDFQueries):
         """
-        Push the passed SQL Query to the defined output query
+        Define the QC query definitions from the 'tbl_QCQueries' dataframe
+
+        :param outDFQueries: dataframe with the 'tbl_QCQueries' table (define_QCQueries)
+
+        :return: querySpecs: Dictionary - query name: qcQuerySpecClass, in 'tbl_QCQueries' order
+        """
+
+        querySpecs = {}
+        for record in outDFQueries.to_dict('records'):
+            querySpec = qcQuerySpecClass.fromRecord(record)
+            querySpecs[querySpec.queryName] = querySpec
+
+        return querySpecs
+
+    def pushQueryToDB(inQuerySel, queryName, qcCheckInstance, dmInstance, queryDescription=None):
+        """
+        Push the passed SQL Query to the defined output query.  If the query already exists in the Front End with the
+        same (normalized) SQL and description (query fingerprint cache) the delete, create and describe are skipped.
 
         :param inQuerySel: SQL Query defining the query to be pushed back to the backend instance
         :param queryName: Name of query being pushed, will deleted first if exists
         :param qcCheckInstance: QC Check Instance (has Database paths, etc
         :param dmInstance: Data Management Instance
+        :param queryDescription: Optional query description, added to the query once pushed
 
-        :return existsLU: String defining if query exists ('Yes') or not ('No')
+        :return pushed: True if the query was pushed, False if already up to date
         """
 
+        inDBFE = qcCheckInstance.inDBFE
+        qcCheckInstance.pushedQueries[queryName] = inQuerySel
+
+        # Skip the push if the query is unchanged
+        if dm.generalDMClass.queryUpToDate(inQuerySel, queryName, inDBFE, description=queryDescription):
+            logMsg = f'Query - {queryName} - is up to date in Front End Database - {inDBFE} - push skipped'
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            return False
+
         #Check if query exists first - if yes delete
-        dm.generalDMClass.queryExistsDelete(queryName=queryName, inDBPath=qcCheckInstance.inDBFE)
+        dm.generalDMClass.queryExistsDelete(queryName=queryName, inDBPath=inDBFE)
 
         # Push the new query
         #PYWIN 32 is much slower using ODBC
         #dm.generalDMClass.pushQuery(inQuerySel=inQuerySel, queryName=queryName, inDBPath=qcCheckInstance.inDBFE)
         #Using ODBC connect this requires ODBC Driver to be in place, if not use PYWIN32.
-        dm.generalDMClass.pushQueryODBC(inQuerySel=inQuerySel, queryName=queryName, inDBPath=qcCheckInstance.inDBFE)
+        dm.generalDMClass.pushQueryODBC(inQuerySel=inQuerySel, queryName=queryName, inDBPath=inDBFE)
 
-        logMsg = f'Successfully pushed Query - {queryName} - to Front End Database - {qcCheckInstance.inDBFE}'
+        # Define the description for the created query
+        if queryDescription is not None:
+            dm.generalDMClass.queryDesc(queryName, queryDescription, qcCheckInstance)
+
+        logMsg = f'Successfully pushed Query - {queryName} - to Front End Database - {inDBFE}'
         dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
 
+        return True
+
 
-    def updateQAResultsTable(queryName, queryDecrip_LU, qcCheckInstance,dmInstance):
+    def queryRecordCount(queryName, qcCheckInstance):
         """
-        Perform append or update query to table 'tbl_QA_Results' which resides in the SFAN Backend Databases.
-        Checking queryName with '_PY" suffix added - will remove once done with development.
+        Count the records of the QC query, the query output is streamed in chunks rather than read into a single
+        dataframe
+
+        :param queryName: Name of the QC query
+        :param qcCheckInstance: QC Check Instance (has Database paths, etc
+
+        :return: recordCount: Number of query records
+        """
+
+        inQuery = f'Select * FROM {queryName}'
+        return dm.generalDMClass.countQueryRecords(inQuery, qcCheckInstance.inDBFE)
+
+    def updateQAResultsTable(queryName, queryDecrip_LU, qcCheckInstance,dmInstance, recordCount=None):
+        """
+        Define the summary of the QC query (record count, run time, user) for table 'tbl_QA_Results' which resides in
+        the SFAN Backend Databases.  During a run ('process_QCRequest') the summary is collected and written with the
+        summaries of all QC queries at the end of the run ('writeQAResults'), otherwise it is written directly.
+        Called once the writes of the QC query are committed, a rolled back query has no summary.
         :param queryName: Name of query being pushed, will deleted first if exists
         :param queryDecrip_LU: Query description pulled from the 'tbl_QCQueries' table
         :param qcCheckInstance: QC Check Instance (has Database paths, etc
         :param dmInstance: Data Management Instance
+        :param recordCount: Record count of the query if already known (e.g. evaluated by the engine), else the query
+         records are counted
 
         :return
         """
         try:
-            #Read query into a dataframe allowing for creation of the dataframe to append or update
-            inQuery = f'Select * FROM {queryName}'
-            outDF = dm.generalDMClass.connect_to_AcessDB_DF(inQuery, qcCheckInstance.inDBFE)
+            #Count the query records
+            if recordCount is None:
+                recordCount = qcChecks.queryRecordCount(queryName, qcCheckInstance)
 
             #Create the Summary of the output Query to be pushed to 'tbl_QA_Results' - below are fields in the
             # 'tbl_QA_Results' table
 
             Query_Name = queryName
             Time_Frame = str(qcCheckInstance.yearLU)
-            Query_Type = queryName[6]
-            Query_Result = str(outDF.shape[0])
+            Query_Type = int(queryName[6])
+            Query_Result = recordCount
 
             from datetime import datetime
-            now = datetime.now()
-            Query_Run_Time = now.strftime('%m/%d/%y %H:%M:%S')
+            Query_Run_Time = datetime.now().replace(microsecond=0)
             Query_Description = queryDecrip_LU
             QA_User = qcCheckInstance.inUser
             Is_Done = 0
             Data_Scope = 0
 
-            # Determine if record for 'Query_Name' and 'Time_Frame' already exists. If yes - update, else append
-            # Read query into a dataframe allowing for creation of the dataframe to append or update
-            inQuery = (f"Select COUNT(*) AS RecCount FROM tbl_QA_Results WHERE [Query_Name] = '{queryName}' AND" 
-                       f" [Time_Frame] ='{Time_Frame}'")
-
-            outCountDF = dm.generalDMClass.connect_to_AcessDB_DF(inQuery, qcCheckInstance.inDBFE)
-            countValue = outCountDF['RecCount'][0]
-
-            if countValue >= 1:  # Already exists
-                type = 'Update'
-                #Update record in 'tbl_QA_Results'
-                inQuery = (f"UPDATE tbl_QA_Results SET tbl_QA_Results.Query_Type = {Query_Type}, tbl_QA_Results.Query_Result"
-                            f" = {Query_Result}, tbl_QA_Results.Query_Run_Time = #{Query_Run_Time}#, tbl_QA_Results.Query_Description"
-                            f" = '{Query_Description}', tbl_QA_Results.QA_User = '{QA_User}',"
-                            f" tbl_QA_Results.Is_Done = 0, tbl_QA_Results.Data_Scope = 0 WHERE"
-                            f" tbl_QA_Results.Query_Name = '{queryName}' AND tbl_QA_Results.Time_Frame = '{Time_Frame}';")
-
-            else: #Append New Record to 'tbl_QA_Results'
-                type = 'Append'
-                inQuery = (f"INSERT INTO tbl_QA_Results ( Query_Name, Time_Frame, Query_Type, Query_Result, Query_Run_Time,"
-                           f" Query_Description, QA_User, Is_Done, Data_Scope) SELECT '{Query_Name}' AS Query_Name, {Time_Frame} AS"
-                           f" Time_Frame, {Query_Type} AS Query_Type, {Query_Result} AS Query_Result, #{Query_Run_Time}# AS"
-                           f" Query_Run_Time, '{Query_Description}' AS Query_Description, '{QA_User}' AS QA_User, "
-                           f" {Is_Done} AS Is_Done, {Data_Scope} AS DataScope;")
-
-            #Push the Update or Append Query
-            dm.generalDMClass.excuteQuery(inQuery, qcCheckInstance.inDBBE)
-
-            logMsg = f"Success for QC Check - {queryName} - {type} made to table tbl_QA_Results - in {qcCheckInstance.inDBBE}"
+            qaSummary = (Query_Name, Time_Frame, Query_Type, Query_Result, Query_Run_Time, Query_Description, QA_User,
+                         Is_Done, Data_Scope)
+
+            with qcCheckInstance.qaResultsLock:
+                collecting = qcCheckInstance.qaResults is not None
+                if collecting:
+                    qcCheckInstance.qaResults[queryName] = qaSummary
+
+            if collecting:
+                logMsg = (f"Summary for QC Check - {queryName} - {recordCount} records - queued for table "
+                          f"tbl_QA_Results")
+                dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+                logging.info(logMsg)
+            else:
+                qcChecks.writeQAResults([qaSummary], qcCheckInstance, dmInstance)
+
+        except Exception as e:
+
+            logMsg = (f'ERROR - An error occurred in UpdateQAResultsTable: {e}')
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.critical(logMsg, exc_info=True)
+            traceback.print_exc(file=sys.stdout)
+
+    def writeQAResults(qaSummaries, qcCheckInstance, dmInstance):
+        """
+        Set based upsert of the QC query summaries to table 'tbl_QA_Results'.  The existing 'Query_Name' keys for the
+        year are read once, summaries with an existing record are updated and the others appended - all statements
+        executed in one transaction.
+
+        :param qaSummaries: List of summary records ('qaResultsInsertSQL' field order) for the year being processed
+        :param qcCheckInstance: QC Check Instance (has Database paths, etc
+        :param dmInstance: Data Management Instance
+
+        :return: written: True if the summaries were committed, False if the upsert failed (rolled back)
+        """
+
+        if not qaSummaries:
+            return True
+
+        try:
+            # Existing records for the year - one read for all summaries
+            Time_Frame = str(qcCheckInstance.yearLU)
+            outKeysDF = dm.generalDMClass.connect_to_AcessDB_DF(qcChecks.qaResultsKeysSQL, qcCheckInstance.inDBFE,
+                                                                params=(Time_Frame,))
+            existingKeys = set(outKeysDF['Query_Name'])
+
+            writeBatch = dm.statementBatchClass(qcCheckInstance.inDBBE)
+            updateCount = 0
+            for qaSummary in qaSummaries:
+                Query_Name = qaSummary[0]
+                if Query_Name in existingKeys:  # Already exists - Update
+                    writeBatch.add(qcChecks.qaResultsUpdateSQL, params=qaSummary[2:] + qaSummary[:2],
+                                   label=f'tbl_QA_Results Update {Query_Name}')
+                    updateCount += 1
+                else:  # Append New Record
+                    writeBatch.add(qcChecks.qaResultsInsertSQL, params=qaSummary,
+                                   label=f'tbl_QA_Results Append {Query_Name}')
+                    existingKeys.add(Query_Name)
+
+            dm.generalDMClass.executeBatch(writeBatch, dmInstance)
+
+            logMsg = (f"Success for {len(qaSummaries)} QC Checks - {updateCount} Update(s), "
+                      f"{len(qaSummaries) - updateCount} Append(s) made to table tbl_QA_Results - in "
+                      f"{qcCheckInstance.inDBBE}")
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.info(logMsg)
 
+            return True
+
         except Exception as e:
 
-            logMsg = (f'ERROR - An error occurred in UpdateQAResultsTable: {e}')
+            logMsg = (f'ERROR - An error occurred in writeQAResults: {e}')
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.critical(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
 
-    def applyQCFlag(queryName_LU, flagDefDf, qcCheckInstance, dmInstance):
+            return False
+
+    def flagTokenIndex(flagSeries):
+        """
+        Split the ';' separated QC flag lists (e.g. 'DFO;LESPC') into one flag code per row.  The codes are indexed by
+        the record position in 'flagSeries', null and empty flag lists have no rows.  Codes are not trimmed, the same
+        token rule as the flag candidate pushdown ('flagCandidateKeys').
+
+        :param flagSeries: Series with the QC flag lists of the records
+
+        :return: tokenSeries: Categorical series of the flag codes, index is the record position
+        """
+
+        flagValues = pd.Series(flagSeries.to_numpy(), dtype='string')
+        tokenSeries = flagValues.str.split(';').explode()
+        tokenSeries = tokenSeries[tokenSeries.notna() & (tokenSeries != '')]
+
+        return tokenSeries.astype('category')
+
+    def hasQCFlag(flagSeries, qcFlag):
+        """
+        Records whose QC flag list contains the flag code - exact, case insensitive match of the code (as the Access
+        'InStr' of the flag candidate pushdown), a code contained in a longer code (e.g. 'DFO' in 'DFOX') or with
+        surrounding spaces (e.g. ' DFO') is not a match
+
+        :param flagSeries: Series with the QC flag lists of the records
+        :param qcFlag: Flag code (e.g. 'DFO')
+
+        :return: hasFlag: Boolean series, same index as 'flagSeries'
+        """
+
+        tokenSeries = qcChecks.flagTokenIndex(flagSeries)
+        flaggedPositions = tokenSeries.index[tokenSeries.astype('string').str.upper() == str(qcFlag).upper()]
+
+        return pd.Series(pd.RangeIndex(len(flagSeries)).isin(flaggedPositions), index=flagSeries.index)
+
+    def appendQCFlag(flagSeries, qcFlag):
+        """
+        Flag lists after appending the flag code - same as the flag update expression ('flagUpdateSQL'), the code is
+        appended to an existing flag list
+
+        :param flagSeries: Series with the QC flag lists of the records
+        :param qcFlag: Flag code (e.g. 'DFO')
+
+        :return: flagSeries: Series of the new flag lists, same index as 'flagSeries'
+        """
+
+        return pd.Series([qcFlag if pd.isna(value) else f'{value};{qcFlag}' for value in flagSeries],
+                         index=flagSeries.index, dtype=object)
+
+    def flagCandidateKeys(querySpec, qcCheckInstance, dmInstance):
+        """
+        Distinct join field values (e.g. 'Event_ID') of the QC query records without the QC flag.  The filter and
+        distinct are pushed down to the database so only the key column is fetched, if the pushdown query fails (or
+        'flagCandidatePushdown' is False) the query records are streamed and filtered client side.
+
+        :param querySpec: Definition of the QueryName being processed (qcQuerySpecClass)
+        :param qcCheckInstance: QC Check Instance (has Database paths, etc
+        :param dmInstance: Data Management Instance
+
+        :return: keysDF: Dataframe with the join field column, one row per distinct value
+        """
+
+        if qcChecks.flagCandidatePushdown:
+            # Exact flag code membership - the ';' delimited flag list (e.g. ';DFO;LESPC;') does not contain ';DFO;',
+            # untrimmed and case insensitive as 'hasQCFlag'
+            flagField = querySpec.flagFieldQuery
+            inQuery = (f"SELECT DISTINCT [{querySpec.joinField}] FROM [{querySpec.queryName}] WHERE ([{flagField}] Is"
+                       f" Null Or InStr(';' & [{flagField}] & ';', ?) = 0);")
+            try:
+                return dm.generalDMClass.connect_to_AcessDB_DF(inQuery, qcCheckInstance.inDBFE,
+                                                               params=(f';{querySpec.qcFlag};',))
+            except Exception as e:
+                logMsg = (f'WARNING - Flag candidate pushdown failed for - {querySpec.queryName} - filtering the query '
+                          f'records client side: {e}')
+                dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+                logging.warning(logMsg)
+
+        # Stream the query records in chunks and filter the records without the flag
+        joinField_LU = querySpec.joinField
+        inQuerySel = f"SELECT * FROM {querySpec.queryName}"
+        # Dictionary keys retain the order values are first seen
+        noFlagUniqueDic = {}
+        for outDFChunk in dm.generalDMClass.readChunksDF(query=inQuerySel, inDB=qcCheckInstance.inDBFE):
+            # Exact flag code membership over the ';' separated flag lists (e.g. 'DFO;LESPC')
+            hasFlag = qcChecks.hasQCFlag(outDFChunk[querySpec.flagFieldQuery], querySpec.qcFlag)
+            noFlagUniqueDic.update(dict.fromkeys(outDFChunk.loc[~hasFlag, joinField_LU].unique()))
+
+        return pd.DataFrame(list(noFlagUniqueDic), columns=[joinField_LU])
+
+    def flagUpdateStrategy(keyCount):
         """
-        Routine to apply the Quality Control flag to the underlying table per Quality Control check.  Information is
-        being pulled from the 'tbl_QCQueries' table in the backend database.  Processing creates a temporary table
-        in the backend dataabase with the records in need of data flag to be applied.  From this temporary table
-        and the information in 'tbl_QCQueries' the join table (e.g. tbl_Events, etc.), join field (e.g. 'Event_ID'),
-        field to apply the flag to (e.g. QCFlag) and flag value to apply (e.g. DFO, etc.) are pushed.
+        Flag update strategy for the number of keys to flag - keyed 'IN' list updates up to 'flagKeyedMaxKeys' keys
+        (no temp table create/drop), above the temp table join update
+
+        :param keyCount: Number of distinct join field values to flag
+
+        :return: flagStrategy: 'keyed' or 'tempTable'
+        """
+
+        return 'keyed' if keyCount <= qcChecks.flagKeyedMaxKeys else 'tempTable'
+
+    def flagUpdateSQL(querySpec):
+        """
+        Flag value expression of the flag update - the flag code is appended to an existing flag list (e.g.
+        'DFO;LESPC').  The flag code is a SQL literal (quotes escaped) rather than a parameter, the Access ODBC driver
+        does not reliably type parameters inside an IIf expression.
+
+        :param querySpec: Definition of the QueryName being processed (qcQuerySpecClass)
+
+        :return: setSQL: SET clause of the flag update
+        """
+
+        flagField = querySpec.flagFieldTable
+        qcFlag = str(querySpec.qcFlag).replace("'", "''")
+        return (f"SET {querySpec.flagTable}.{flagField} = IIf(IsNull([{flagField}]),'{qcFlag}',"
+                f"[{flagField}] & ';{qcFlag}')")
+
+    def applyFlagKeyed(querySpec, keysDF, inDBBE, writeBatch=None):
+        """
+        Apply the QC flag with keyed updates - one 'UPDATE ... WHERE joinField IN (?, ...)' per chunk of
+        'flagKeyedChunkSize' keys, the full chunks share the same SQL text (prepared once per connection).  The last
+        chunk has one marker per remaining key.
+
+        :param querySpec: Definition of the QueryName being processed (qcQuerySpecClass)
+        :param keysDF: Dataframe with the distinct join field values to flag
+        :param inDBBE: Backend database the flag table resides in
+        :param writeBatch: Optional statementBatchClass - if passed the updates are added to the batch, else executed
+         in one transaction
+
+        :return:
+        """
+
+        flagTable_LU = querySpec.flagTable
+        chunkSize = qcChecks.flagKeyedChunkSize
+        keys = [record[0] for record in dm.generalDMClass.frameToRecords(keysDF[[querySpec.joinField]]) if record[0]
+                is not None]
+
+        updateSQL = (f"UPDATE {flagTable_LU} {qcChecks.flagUpdateSQL(querySpec)} WHERE "
+                     f"{flagTable_LU}.{querySpec.joinField}")
+
+        batch = writeBatch if writeBatch is not None else dm.statementBatchClass(inDBBE)
+        for start in range(0, len(keys), chunkSize):
+            chunkKeys = keys[start:start + chunkSize]
+            inQuery = f"{updateSQL} IN ({', '.join(['?'] * len(chunkKeys))});"
+            batch.add(inQuery, params=chunkKeys,
+                      label=f'{flagTable_LU} {querySpec.qcFlag} flag keys {start + 1}-{start + len(chunkKeys)}')
+
+        if writeBatch is None:
+            dm.generalDMClass.executeBatch(batch)
+
+    def dropTempTables(qcCheckInstance, dmInstance):
+        """
+        Drop the temp tables (tmpQCTable_{FlagTable}) created in the Back End during the run - called once the write
+        batches of the run are executed
+
+        :param qcCheckInstance: QC Check Instance
+        :param dmInstance: Data Management Instance
+
+        :return:
+        """
+
+        tempTables = sorted(qcCheckInstance.tempTables)
+        qcCheckInstance.tempTables = set()
+        for tmpTableName in tempTables:
+            dm.generalDMClass.tableExistsDelete(tableName=tmpTableName, inDBPath=qcCheckInstance.inDBBE)
+
+        if tempTables:
+            logMsg = f"Dropped the temp tables of the run - {', '.join(tempTables)}"
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.info(logMsg)
+
+    def applyFlagTempTable(querySpec, keysDF, inDBBE, writeBatch=None):
+        """
+        Apply the QC flag by loading the keys to the temp table 'tmpQCTable_{FlagTable}' and a join update.  Temp table
+        per flag table - queries flagging the same table have their write phase ordered by the scheduler, queries
+        flagging other tables can run concurrently.
+
+        :param querySpec: Definition of the QueryName being processed (qcQuerySpecClass)
+        :param keysDF: Dataframe with the distinct join field values to flag
+        :param inDBBE: Backend database the flag table resides in
+        :param writeBatch: Optional statementBatchClass - if passed the update is added to the batch rather than
+         executed, the batch must be executed before the temp table is recreated
+
+        :return: tmpTableName: Name of the temp table created in the Back End
+        """
+
+        flagTable_LU = querySpec.flagTable
+        joinField_LU = querySpec.joinField
+        tmpTableName = f'tmpQCTable_{flagTable_LU}'
+
+        # Delete Temp Table if Exists
+        dm.generalDMClass.tableExistsDelete(tableName=tmpTableName, inDBPath=inDBBE)
+
+        # Create the Temporary Table and Populate with the unique join field values without the flag
+        dm.generalDMClass.createTableFromDF(keysDF, tmpTableName, inDBBE)
+
+        inQuery = (f"UPDATE {tmpTableName} INNER JOIN {flagTable_LU} ON {tmpTableName}.{joinField_LU} ="
+                   f" {flagTable_LU}.{joinField_LU} {qcChecks.flagUpdateSQL(querySpec)};")
+
+        # Apply the QC Flag - executed in its own transaction if no batch is passed, a failed update is raised
+        batch = writeBatch if writeBatch is not None else dm.statementBatchClass(inDBBE)
+        batch.add(inQuery, label=f'{flagTable_LU} {querySpec.qcFlag} flag')
+        if writeBatch is None:
+            dm.generalDMClass.executeBatch(batch)
+
+        return tmpTableName
+
+    def applyQCFlag(querySpec, qcCheckInstance, dmInstance, writeBatch=None, resultDF=None):
+        """
+        Routine to apply the Quality Control flag to the underlying table per Quality Control check.  The flag fields
+        are defined by the query definition from the 'tbl_QCQueries' table.  The distinct join field values (e.g.
+        'Event_ID') of the records in need of the data flag are applied to the join table (e.g. tbl_Events, etc.),
+        field to apply the flag to (e.g. QCFlag) and flag value to apply (e.g. DFO, etc.) - via keyed updates for
+        small key sets, else via a temporary table in the backend database joined to the join table.
         If the flag already exists the flag will not be pushed. Existing flags are not overwritten with new flags
         being concatenated.
 
-        :param queryName_LU: QueryName being processed
-        :param flagDefDf: Data frame of the Flags Dictionary defining the flag field information
+        :param querySpec: Definition of the QueryName being processed (qcQuerySpecClass)
         :param qcCheckInstance: QC Check Instance (has Database paths, etc
         :param dmInstance: Data Management Instance
+        :param writeBatch: Optional statementBatchClass - if passed the flag Update is added to the batch rather than
+         executed, the batch must be executed before the temp table (tmpQCTable_{FlagTable}) is recreated
+        :param resultDF: Result records of the query evaluated by the engine (engineResult) - the flag candidates are
+         taken from the engine flag state rather than the pushed QC Query
 
-        :return
+        :return: flagKeysDF: Dataframe with the join field values flagged (an empty dataframe if no new flags),
+         with 'writeBatch' the flags are only applied once the batch is executed.  Errors are logged and raised.
         """
         try:
 
-            # 1a) Read record for the query in 'tbl_QCQueries
-            inQuery = f"SELECT * FROM tbl_QCQueries WHERE [QueryName] = '{queryName_LU}';"
-            inDBFE = qcCheckInstance.inDBFE
-            outDFQCFields = dm.generalDMClass.connect_to_AcessDB_DF(query=inQuery, inDB=inDBFE)
-
-            # Pull Information from the defined flagging fields in the QC_Results table
+            # 1a) Flag fields of the query from 'tbl_QCQueries' (read once per run)
+            queryName_LU = querySpec.queryName
             # Get Flag Code to Apply
-            qcFlag_LU = outDFQCFields.loc[0, 'QCFlag']
-            # Get Flag Field in Source Table - QC Flag will be applied here
-            qcFlagFieldTable_LU = outDFQCFields.loc[0, 'FlagFieldTable']
-            qcFlagFieldQuery_LU = outDFQCFields.loc[0, 'FlagFieldQuery']
-            flagTable_LU = outDFQCFields.loc[0, 'FlagTable']
-            joinField_LU = outDFQCFields.loc[0, 'JoinField']
-
-
-            # Get Flag Field in the Summary Query (i.e. field in the 'queryName_LU'), will be checking this field
-            # to see if the QC Flag is present
-            inQuerySel = f"SELECT * FROM {queryName_LU}"
-            # 1b) Read in the Final Query
-            outDFwRecs = dm.generalDMClass.connect_to_AcessDB_DF(query=inQuerySel, inDB=inDBFE)
-
-            # 2) Apply the QC Flag where 'Current Flag' doesn't exists
-            outDFNoFlag = outDFwRecs[~outDFwRecs[qcFlagFieldQuery_LU].str.contains(qcFlag_LU, na=False)]
-            recToFlag = len(outDFNoFlag)  #If a one-to-many relationship this might not be accuracte count
-
-            # Get the unique/distinct values without flags for the records without the flag.  Due to one to many
-            # only going to push the temp table with the unique value to avoid applying the flag more than once
-            # when a one to many relationship exists
-
-            # Get the unique values in the 'joinField_LU' identifier for the records without the flag
-            outDFNoFlagUnique = outDFNoFlag[joinField_LU].unique()
-            # Convert the NumPy array to a DataFrame - this will be pushed to the tmpTable in the backend.
-            outDFNoFlagUniqueDF = pd.DataFrame(outDFNoFlagUnique, columns=[joinField_LU])
-
-            #Delete Temp Table (if exists) and apply the QC Flag if number of records >0, else no new flagging requried.
-            if len(outDFNoFlag) > 0:
-                # Delete Temp Table (tmpQCTable) if Exists
-                dm.generalDMClass.tableExistsDelete(tableName= 'tmpQCTable', inDBPath=qcCheckInstance.inDBBE)
-
-                # Create the Temporary Table and Populate with the dataframe records without the flag, further
-                # subset to only the unique records for the defiened field (i.e. unique ID field).
-                dm.generalDMClass.createTableFromDF(outDFNoFlagUniqueDF, 'tmpQCTable', qcCheckInstance.inDBBE)
-
-                # Define the Update Query no Existing QC Flag (e.g. DFO) for this iteration
-
-                inQuery = (f"UPDATE tmpQCTable INNER JOIN {flagTable_LU} ON tmpQCTable.{joinField_LU} ="
-                           f" {flagTable_LU}.{joinField_LU} SET {flagTable_LU}.{qcFlagFieldTable_LU} = IIf(IsNull([{qcFlagFieldTable_LU}])"
-                           f",'{qcFlag_LU}',[{qcFlagFieldTable_LU}] & ';{qcFlag_LU}');")
-
-                # Apply the QC Flag
-                # Apply the QC Flag
-                inDBBE = qcCheckInstance.inDBBE
-                dm.generalDMClass.excuteQuery(inQuery=inQuery, inDBBE=inDBBE)
-
-                logMsg = f'Applied QC Flag to {recToFlag} records without EXISTING QC Flag - {qcFlag_LU} - {queryName_LU}'
+            qcFlag_LU = querySpec.qcFlag
+            joinField_LU = querySpec.joinField
+
+            # 1b) Distinct join field values (e.g. 'Event_ID') of the query records without the QC Flag - due to one
+            # to many only the unique values are pushed to the temp table to avoid applying the flag more than once
+            outDFNoFlagUniqueDF = None
+            if resultDF is not None:
+                outDFNoFlagUniqueDF = qcCheckInstance.engine.flagCandidateKeys(querySpec, resultDF)
+            if outDFNoFlagUniqueDF is None:
+                outDFNoFlagUniqueDF = qcChecks.flagCandidateKeys(querySpec, qcCheckInstance, dmInstance)
+            recToFlag = len(outDFNoFlagUniqueDF)
+
+            # Apply the QC Flag if number of records >0, else no new flagging requried.
+            if recToFlag > 0:
+                # Keyed updates for small key sets, temp table join update for large key sets
+                flagStrategy = qcChecks.flagUpdateStrategy(recToFlag)
+                if flagStrategy == 'keyed':
+                    qcChecks.applyFlagKeyed(querySpec, outDFNoFlagUniqueDF, qcCheckInstance.inDBBE,
+                                            writeBatch=writeBatch)
+                else:
+                    tmpTableName = qcChecks.applyFlagTempTable(querySpec, outDFNoFlagUniqueDF,
+                                                               qcCheckInstance.inDBBE, writeBatch=writeBatch)
+                    qcCheckInstance.tempTables.add(tmpTableName)
+
+                # Flags applied without a batch are committed - keep the engine flag state in step, with a batch the
+                # caller records them once the batch is executed (commitCheck)
+                if writeBatch is None and qcCheckInstance.engine is not None:
+                    qcCheckInstance.engine.recordFlags(querySpec, outDFNoFlagUniqueDF)
+
+                logMsg = (f'Applied QC Flag to {recToFlag} {joinField_LU} values without EXISTING QC Flag - {qcFlag_LU}'
+                          f' - {queryName_LU} - {flagStrategy} update')
                 dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
                 logging.info(logMsg)
             else:
-                outDFWithFlag = outDFwRecs[outDFwRecs[qcFlagFieldQuery_LU].str.contains(qcFlag_LU, na=False)]
-                recAlreadyFlagged = len(outDFWithFlag)
-
-                logMsg = (f'No New QC Flags applied - {queryName_LU} - Number of records already flagged '
-                          f'was {recAlreadyFlagged}')
+                logMsg = f'No New QC Flags applied - {queryName_LU} - all records already flagged - {qcFlag_LU}'
                 dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
                 logging.info(logMsg)
 
+            return outDFNoFlagUniqueDF
+
         except Exception as e:
 
-            logMsg = f'ERROR - An error occurred in UpdateQAResultsTable: {e}'
+            logMsg = f'ERROR - An error occurred in applyQCFlag for - {querySpec.queryName}: {e}'
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.critical(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
 
+            raise
+
 if __name__ == "__name__":
     logger.info("Running QC_Checks.py")
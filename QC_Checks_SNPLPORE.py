@@ -4,17 +4,30 @@ Methods/Functions to be used SNPL PORE Quality Control Validation workflow.
 
 """
 #Import Required Libraries
-import pandas as pd
 import sys
 import traceback
 import QC_Checks as qc
+import QC_Registry as qcr
+import QC_Engine_SNPLPORE as qce
 import generalDM as dm
 import logging
+from lazyImports import lazyModuleClass
+
+# pandas is imported on first use
+pd = lazyModuleClass('pandas')
 
 logger = logging.getLogger(__name__)
 
+@qcr.qcRegistryClass.registerProtocol('SNPLPORE')
 class qcProtcol_SNPLPORE:
 
+    # Source tables of the queries read by the QC checks (i.e. the yearly filter query), used to resolve the tables read
+    # by a check in incremental mode
+    queryTables = {'qsel_QA_Control': ('tbl_Events', 'tbl_Locations')}
+
+    # In-memory evaluation engine of the QC checks ('engine' 'pandas')
+    engineClass = qce.qcEngineSNPLPOREClass
+
     def __init__(self):
         """
         Define the instantiated QC Protocol instantiation attributes
@@ -53,17 +66,17 @@ class qcProtcol_SNPLPORE:
                    f' tbl_Locations.Location_ID = tbl_Events.Location_ID'
                    f' WHERE (((Year([Start_Date])) = {yearLU} Or (Year([Start_Date])) Is Null));')
 
-        yearlyRecDF = dm.generalDMClass.connect_to_AcessDB_DF(inQuery, inDBBE)
+        yearlyRecDF = dm.generalDMClass.readColumnarDF(inQuery, inDBBE, categoricalColumns=['Loc_Name'],
+                                                      parseDates=['Start_Date'])
 
         return yearlyRecDF, inQuery
 
-    def processQuery(queryName_LU, queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
+    def processQuery(querySpec, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Iterate through the defined queries
 
-        :param queryName_LU: Name of query routine being processes this is query name in the 'Query_Name' field in
-         table 'tbl_QCQueries'
-        :param queryDecrip_LU: Query description pulled from the 'tbl_QCQueries' table
+        :param querySpec: Definition of the query routine being processed from table 'tbl_QCQueries'
+         (QC_Checks.qcQuerySpecClass - query name, description and QC flag fields)
         :param yearlyRecDF:  Dataframe with the subset of yearly records by Event to be processed
         :param qcCheckInstance: QC Check Instance
         :param dmInstance: data management instance which will have the logfile name
@@ -71,160 +84,81 @@ class qcProtcol_SNPLPORE:
         :return:
         """
 
+        queryName_LU = querySpec.queryName
+        queryDecrip_LU = querySpec.queryDescription
         try:
-            if queryName_LU == "qa_a102_Unverified_Events_X":
-                outFun = qcProtcol_SNPLPORE.qa_a102_Unverified_Events(queryDecrip_LU, yearlyRecDF, qcCheckInstance,
-                                                                      dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_f112_Incomplete_Weather_X":
-                outFun = qcProtcol_SNPLPORE.qa_f112_Incomplete_Weather(queryDecrip_LU, yearlyRecDF,
-                                                                                       qcCheckInstance, dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_f122_CompleteSurvey_IncompleteSNPL_X":
-                outFun = qcProtcol_SNPLPORE.qa_f122_CompleteSurvey_IncompleteSNPL(queryDecrip_LU,
-                                                                                                  yearlyRecDF,
-                                                                                                  qcCheckInstance,
-                                                                                                  dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_f132_MoreCheckedSNPL_ThanTotal_X":
-                outFun = qcProtcol_SNPLPORE.qa_f132_MoreCheckedSNPL_ThanTotal(queryDecrip_LU,
-                                                                                  yearlyRecDF,
-                                                                                  qcCheckInstance,
-                                                                                  dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_f142_MoreBandedSNPL_ThanChecked_X":
-                outFun = qcProtcol_SNPLPORE.qa_f142_MoreBandedSNPL_ThanChecked(queryDecrip_LU, yearlyRecDF,
-                                                                              qcCheckInstance, dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_f152_StopTime_MoreThanEvent_X":
-                outFun = qcProtcol_SNPLPORE.qa_f152_StopTime_MoreThanEvent(queryDecrip_LU, yearlyRecDF,
-                                                                           qcCheckInstance, dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_h102_Missing_Observers_X":
-                outFun = qcProtcol_SNPLPORE.qa_h102_Missing_Observers(queryDecrip_LU, yearlyRecDF,
-                                                                      qcCheckInstance, dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_j102_SNPL_ObservationTime_Error_X":
-                outFun = qcProtcol_SNPLPORE.qa_j102_SNPL_ObservationTime_Error(queryDecrip_LU, yearlyRecDF,
-                                                                               qcCheckInstance, dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            ##### MisMatched_SNPL_{....} queries evaluating SNPL Observation numbers against tbl Event Details Numbers
-            ##### have been set to Legacy because the tbl Event Details SNPL attributes (i.e. Count Adults, Hatchlings
-            ##### , Fledglings, Bands) should be coming from th SNPLO Observatiosn.  Additional with Survey 123 data
-            ##### data collection these tbl Event Details SNPL attributes are not being
-            ###### collected - 12/10/2024 - Kirk Sherrill.
-            # elif queryName_LU == "qa_j112_Mismatched_SNPL_Numbers_Adults":
-            #     outFun = qcProtcol_SNPLPORE.qa_j112_Mismatched_SNPL_Numbers_Adults(queryDecrip_LU, yearlyRecDF,
-            #                                                                    qcCheckInstance, dmInstance)
-            #     inQuerySel = outFun[0]
-            #     flagFieldsDic = outFun[1]
-            # 
-            # elif queryName_LU == "qa_j112_Mismatched_SNPL_Numbers_Fledglings":
-            #     outFun = qcProtcol_SNPLPORE.qa_j112_Mismatched_SNPL_Numbers_Fledglings(queryDecrip_LU, yearlyRecDF,
-            #                                                                    qcCheckInstance, dmInstance)
-            #     inQuerySel = outFun[0]
-            #     flagFieldsDic = outFun[1]
-            # 
-            # elif queryName_LU == "qa_j112_Mismatched_SNPL_Numbers_Hatchlings":
-            #     outFun = qcProtcol_SNPLPORE.qa_j112_Mismatched_SNPL_Numbers_Fledglings(queryDecrip_LU, yearlyRecDF,
-            #                                                                            qcCheckInstance, dmInstance)
-            #     inQuerySel = outFun[0]
-            #     flagFieldsDic = outFun[1]
-            # 
-            # elif queryName_LU == "qa_j122_Mismatched_Banded_Numbers":
-            #     outFun = qcProtcol_SNPLPORE.qa_j122_Mismatched_Banded_Numbers(queryDecrip_LU, yearlyRecDF,
-            #                                                                    qcCheckInstance, dmInstance)
-            #     inQuerySel = outFun[0]
-            #     flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_j132_NestID_Year_Mismatch_X":
-                outFun = qcProtcol_SNPLPORE.qa_j132_NestID_Year_Mismatch(queryDecrip_LU, yearlyRecDF,
-                                                                               qcCheckInstance, dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_j142_Missing_Band_Totals_X":
-                outFun = qcProtcol_SNPLPORE.qa_j142_Missing_Band_Totals(queryDecrip_LU, yearlyRecDF,
-                                                                               qcCheckInstance, dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_j152_Missing_Band_Data_X":
-                outFun = qcProtcol_SNPLPORE.qa_j152_Missing_Band_Data(queryDecrip_LU, yearlyRecDF,
-                                                                               qcCheckInstance, dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_j162_Mismatched_Band_Obs":
-                outFun = qcProtcol_SNPLPORE.qa_j162_Mismatched_Band_Obs(queryDecrip_LU, yearlyRecDF,
-                                                                               qcCheckInstance, dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_j172_Mismatched_Band_Summary":
-                outFun = qcProtcol_SNPLPORE.qa_j172_Mismatched_Band_Summary(queryDecrip_LU, yearlyRecDF,
-                                                                               qcCheckInstance, dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            elif queryName_LU == "qa_j182_Predator_ActivityType_X":
-                outFun = qcProtcol_SNPLPORE.qa_j182_Predator_ActivityType(queryDecrip_LU, yearlyRecDF,
-                                                                            qcCheckInstance, dmInstance)
-                inQuerySel = outFun[0]
-                flagFieldsDic = outFun[1]
-
-            else:
-                logMsg = f'Query - {queryName_LU} - is not defined - existing script'
+            # Look up the QC check routine registered for the query (@qcRegistryClass.registerCheck on the 'qa_'
+            # routines below)
+            checkSpec = qcr.qcRegistryClass.getCheck('SNPLPORE', queryName_LU)
+            if checkSpec is None:
+                logMsg = f'Query - {queryName_LU} - is not defined as a registered QC check'
                 dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
-                logging.error(logMsg, exc_info=True)
-                exit()
+                logging.error(logMsg)
+                raise ValueError(logMsg)
+
+            outFun = checkSpec.function(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance)
+            inQuerySel = outFun[0]
+            flagFieldsDic = outFun[1]
 
             #####################################################################
             # Below are needed for all queries - Push Query, Updated Description, Append/Update to tbl_QA_Results
             #####################################################################
 
-            # Push Yearly Records Query back to Backend (e.g. qa_f132_MoreCheckedSNPL_ThanTotal)
-            qc.qcChecks.pushQueryToDB(inQuerySel, queryName_LU, qcCheckInstance, dmInstance)
+            # Push Yearly Records Query back to Backend (e.g. qa_f132_MoreCheckedSNPL_ThanTotal) and define the
+            # description for the created query - skipped if the query is unchanged
+            qc.qcChecks.pushQueryToDB(inQuerySel, queryName_LU, qcCheckInstance, dmInstance,
+                                      queryDescription=queryDecrip_LU)
 
-            # Define the description for the created query
-            dm.generalDMClass.queryDesc(queryName_LU, queryDecrip_LU, qcCheckInstance)
+            # Incremental mode - source tables unchanged, the stored 'tbl_QA_Results' record is reused
+            if qc.qcChecks.reuseQAResults(qcCheckInstance, querySpec, inQuerySel, dmInstance):
+                return
 
-            #For all QC queries update the 'tbl_QA_Results
-            qc.qcChecks.updateQAResultsTable(queryName_LU, queryDecrip_LU, qcCheckInstance, dmInstance)
+            # QC Flag writes for the check are executed in one transaction at the end of the write phase
+            checkBatch = dm.statementBatchClass(qcCheckInstance.inDBBE)
 
-            #Apply QC Flag if needed
-            # Convert the Raster Dictionary to a Dataframe
-            flagDefDf = pd.DataFrame.from_dict(flagFieldsDic, orient='columns')
-            applyFlag = flagDefDf.loc[0, 'ApplyFlag']
+            # Engine 'pandas' - query records evaluated in memory, None if the pushed query is read
+            engineResultDF = qc.qcChecks.engineResult(querySpec, qcCheckInstance, dmInstance)
 
-            if applyFlag == 'Yes':
-                qc.qcChecks.applyQCFlag(queryName_LU, flagDefDf, qcCheckInstance, dmInstance)
-                logMsg = f"Success Applying QC Flags for  - {queryName_LU}"
-                dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            # Record count for the 'tbl_QA_Results' summary - counted before the flags are applied, runs concurrently
+            # with other checks
+            if engineResultDF is not None:
+                recordCount = len(engineResultDF)
+            else:
+                recordCount = qc.qcChecks.queryRecordCount(queryName_LU, qcCheckInstance)
+
+            # Write phase - waits on the previous check flagging the same table when run by the scheduler
+            with qc.qcChecks.writeTurn(qcCheckInstance, queryName_LU):
+
+                #Apply QC Flag if needed
+                applyFlag = flagFieldsDic['ApplyFlag'][0]
+
+                flagKeysDF = None
+                if applyFlag == 'Yes':
+                    flagKeysDF = qc.qcChecks.applyQCFlag(querySpec, qcCheckInstance, dmInstance, writeBatch=checkBatch,
+                                                         resultDF=engineResultDF)
+                    logMsg = f"Success Applying QC Flags for  - {queryName_LU}"
+                    dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+
+                # A failed batch is rolled back and raised - the check is not completed
+                dm.generalDMClass.executeBatch(checkBatch, dmInstance)
+
+                # Committed - the engine flag state and incremental state are updated
+                qc.qcChecks.commitCheck(querySpec, qcCheckInstance, flagKeysDF)
+
+            #For all QC queries define the 'tbl_QA_Results' summary once the check writes are committed, the summaries
+            # of all checks are written at the end of the run
+            qc.qcChecks.updateQAResultsTable(queryName_LU, queryDecrip_LU, qcCheckInstance, dmInstance,
+                                             recordCount=recordCount)
 
         except Exception as e:
             logMsg = (f'ERROR - An error occurred in QC_Checks_SNPLPORE - processQuery - for query {queryName_LU}: {e}')
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_a102_Unverified_Events_X', appliesFlags=False,
+                                       tablesRead=('qsel_QA_Control', 'tbl_Events', 'tlu_Data_Processing_Level'))
     def qa_a102_Unverified_Events(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_a102_Unverified_Events. Shows records that have not been marked as
@@ -265,8 +199,10 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_f112_Incomplete_Weather_X', flagTable='tbl_Event_Details',
+                                       tablesRead=('qsel_QA_Control', 'tbl_Event_Details', 'tbl_Events'))
     def qa_f112_Incomplete_Weather (queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_f112_Incomplete_Weather. Returns complete surveys (not marked as
@@ -316,8 +252,11 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_f122_CompleteSurvey_IncompleteSNPL_X',
+                                       flagTable='tbl_Event_Details',
+                                       tablesRead=('qsel_QA_Control', 'tbl_Event_Details', 'tbl_Events'))
     def qa_f122_CompleteSurvey_IncompleteSNPL(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_f122_CompleteSurvey_IncompleteSNPL. Returns surveys not marked as
@@ -366,9 +305,11 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_f132_MoreCheckedSNPL_ThanTotal_X', flagTable='tbl_Event_Details',
+                                       tablesRead=('qsel_QA_Control', 'tbl_Event_Details', 'tbl_Events'))
     def qa_f132_MoreCheckedSNPL_ThanTotal(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_f132_MoreCheckedSNPL_ThanTotal. Returns surveys that have more SNPL
@@ -412,7 +353,10 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_f142_MoreBandedSNPL_ThanChecked_X',
+                                       flagTable='tbl_Event_Details',
+                                       tablesRead=('qsel_QA_Control', 'tbl_Event_Details', 'tbl_Events'))
     def qa_f142_MoreBandedSNPL_ThanChecked(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_f142_MoreBandedSNPL_ThanChecked. Returns surveys that have more SNPL
@@ -456,8 +400,10 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_f152_StopTime_MoreThanEvent_X', flagTable='tbl_Event_Details',
+                                       tablesRead=('qsel_QA_Control', 'tbl_Event_Details', 'tbl_Events'))
     def qa_f152_StopTime_MoreThanEvent(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_f142_MoreBandedSNPL_ThanChecked. Returns surveys where the predator
@@ -501,7 +447,9 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_h102_Missing_Observers_X', flagTable='tbl_Events',
+                                       tablesRead=('qsel_QA_Control', 'tbl_Events', 'xref_Event_Contacts'))
     def qa_h102_Missing_Observers(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_h102_Missing_Observers. Returns surveys where the predator
@@ -524,7 +472,7 @@ class qcProtcol_SNPLPORE:
             inQuerySel = (f"SELECT qsel_QA_Control.Event_ID, qsel_QA_Control.Start_Date, qsel_QA_Control.Loc_Name, "
                           f"qsel_QA_Control.QCFlag AS EventQCFlag, qsel_QA_Control.QCNotes AS EventQCNotes, "
                           f"xref_Event_Contacts.Contact_ID, 'frm_Data_Entry' AS varObject, 'tbl_Events' "
-                          f"AS RecTable, 'Event_ID' AS RecField, tbl_Events.Event_ID AS RecValue "
+                          f"AS RecTable, 'Event_ID' AS RecField, qsel_QA_Control.Event_ID AS RecValue "
                           f"FROM qsel_QA_Control LEFT JOIN xref_Event_Contacts ON qsel_QA_Control.Event_ID = "
                           f"xref_Event_Contacts.Event_ID WHERE (((xref_Event_Contacts.Contact_ID) Is Null));")
 
@@ -541,8 +489,11 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_j102_SNPL_ObservationTime_Error_X',
+                                       flagTable='tbl_SNPL_Observations',
+                                       tablesRead=('qsel_QA_Control', 'tbl_Events', 'tbl_SNPL_Observations'))
     def qa_j102_SNPL_ObservationTime_Error(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_j102_SNPL_ObservationTime_Error. Returns SNPL observation records where
@@ -568,7 +519,7 @@ class qcProtcol_SNPLPORE:
                           f"SNPLObsQCFlag, tbl_SNPL_Observations.QCNotes AS SNPLObsQCNotes, qsel_QA_Control.Start_Date, "
                           f"qsel_QA_Control.Start_Time, qsel_QA_Control.End_Time, tbl_SNPL_Observations.SNPL_Time, "
                           f"'frm_Data_Entry' AS varObject, 'tbl_Events' AS RecTable, 'Event_ID' AS RecField, "
-                          f"tbl_Events.Event_ID AS RecValue FROM qsel_QA_Control INNER JOIN tbl_SNPL_Observations ON "
+                          f"qsel_QA_Control.Event_ID AS RecValue FROM qsel_QA_Control INNER JOIN tbl_SNPL_Observations ON "
                           f"qsel_QA_Control.Event_ID = tbl_SNPL_Observations.Event_ID "
                           f"WHERE (((tbl_SNPL_Observations.SNPL_Time)<[Start_Time] Or "
                           f"(tbl_SNPL_Observations.SNPL_Time)>[End_Time])) ORDER BY qsel_QA_Control.Start_Date DESC;")
@@ -586,8 +537,13 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
+    ##### MisMatched_SNPL_{....} queries evaluating SNPL Observation numbers against tbl Event Details Numbers
+    ##### have been set to Legacy because the tbl Event Details SNPL attributes (i.e. Count Adults, Hatchlings
+    ##### , Fledglings, Bands) should be coming from th SNPLO Observatiosn.  Additional with Survey 123 data
+    ##### data collection these tbl Event Details SNPL attributes are not being
+    ###### collected - 12/10/2024 - Kirk Sherrill.  The j112/j122 routines are not registered as QC checks.
     def qa_j112_Mismatched_SNPL_Numbers_Adults(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Not Being Used / Legacy Routines as of 12/10/2024 - KRS
@@ -635,7 +591,7 @@ class qcProtcol_SNPLPORE:
                           f"IIf(IsNull([tbl_Event_Details].[SNPL_Adults]),0,[tbl_Event_Details].[SNPL_Adults]) "
                           f"AS EventDetail_Adults, qasub_j112_Mismatched_SNPL_Numbers.Total_Adults AS Calc_Adults, "
                           f"'frm_Data_Entry' AS varObject, 'tbl_Events' AS RecTable, 'Event_ID' "
-                          f"AS RecField, qsel_QA_Control.tbl_Events.Event_ID AS RecValue "
+                          f"AS RecField, qsel_QA_Control.Event_ID AS RecValue "
                           f"FROM (qsel_QA_Control INNER JOIN qasub_j112_Mismatched_SNPL_Numbers ON"
                           f" qsel_QA_Control.Event_ID = qasub_j112_Mismatched_SNPL_Numbers.Event_ID) INNER JOIN"
                           f" tbl_Event_Details ON qsel_QA_Control.Event_ID = tbl_Event_Details.Event_ID "
@@ -656,7 +612,7 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
     def qa_j112_Mismatched_SNPL_Numbers_Fledglings(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
@@ -705,7 +661,7 @@ class qcProtcol_SNPLPORE:
                           f"IIf(IsNull([tbl_Event_Details].[SNPL_Fledglings]),0,[tbl_Event_Details].[SNPL_Fledglings]) "
                           f"AS EventDetail_Fledlings, qasub_j112_Mismatched_SNPL_Numbers.Total_Fledge AS "
                           f"Calc_Fledglings, 'frm_Data_Entry' AS varObject, 'tbl_Events' AS RecTable, 'Event_ID' AS "
-                          f"RecField, qsel_QA_Control.tbl_Events.Event_ID AS RecValue FROM (qsel_QA_Control INNER "
+                          f"RecField, qsel_QA_Control.Event_ID AS RecValue FROM (qsel_QA_Control INNER "
                           f"JOIN qasub_j112_Mismatched_SNPL_Numbers ON qsel_QA_Control.Event_ID = "
                           f"qasub_j112_Mismatched_SNPL_Numbers.Event_ID) INNER JOIN tbl_Event_Details ON "
                           f"qsel_QA_Control.Event_ID = tbl_Event_Details.Event_ID WHERE "
@@ -726,7 +682,7 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
     def qa_j112_Mismatched_SNPL_Numbers_Hatchlings(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
@@ -775,7 +731,7 @@ class qcProtcol_SNPLPORE:
                           f"IIf(IsNull([tbl_Event_Details].[SNPL_Hatchlings]),0,[tbl_Event_Details].[SNPL_Hatchlings]) "
                           f"AS EventDetail_Hatchlings, qasub_j112_Mismatched_SNPL_Numbers.Total_Hatch AS "
                           f"Calc_Hatchlings, 'frm_Data_Entry' AS varObject, 'tbl_Events' AS RecTable, 'Event_ID' AS "
-                          f"RecField, qsel_QA_Control.tbl_Events.Event_ID AS RecValue FROM (qsel_QA_Control INNER JOIN "
+                          f"RecField, qsel_QA_Control.Event_ID AS RecValue FROM (qsel_QA_Control INNER JOIN "
                           f"qasub_j112_Mismatched_SNPL_Numbers ON qsel_QA_Control.Event_ID = "
                           f"qasub_j112_Mismatched_SNPL_Numbers.Event_ID) INNER JOIN tbl_Event_Details ON "
                           f"qsel_QA_Control.Event_ID = tbl_Event_Details.Event_ID WHERE "
@@ -796,7 +752,7 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
     def qa_j122_Mismatched_Banded_Numbers(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
@@ -866,8 +822,11 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_j132_NestID_Year_Mismatch_X', flagTable='tbl_SNPL_Observations',
+                                       tablesRead=('qsel_QA_Control', 'tbl_Events', 'tbl_Nest_Master',
+                                                   'tbl_SNPL_Observations'))
     def qa_j132_NestID_Year_Mismatch(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_j132_NestID_Year_Mismatch. Returns records from SNPL_Obsevations where
@@ -895,7 +854,7 @@ class qcProtcol_SNPLPORE:
                           f"tbl_Nest_Master.Nest_ID, tbl_SNPL_Observations.QCFlag AS SNPLObsQCFlag, "
                           f"tbl_SNPL_Observations.QCNotes AS SNPLObsQCNotes, Year([Start_Date]) AS ObsYear, "
                           f"tbl_Nest_Master.Year AS NestYear, 'frm_Data_Entry' AS varObject, 'tbl_Events' AS RecTable, "
-                          f"'Event_ID' AS RecField, tbl_Events.Event_ID AS RecValue FROM tbl_Nest_Master INNER "
+                          f"'Event_ID' AS RecField, qsel_QA_Control.Event_ID AS RecValue FROM tbl_Nest_Master INNER "
                           f"JOIN (qsel_QA_Control INNER JOIN tbl_SNPL_Observations ON qsel_QA_Control.Event_ID = "
                           f"tbl_SNPL_Observations.Event_ID) ON tbl_Nest_Master.Nest_ID = tbl_SNPL_Observations.Nest_ID "
                           f"WHERE (((Year([Start_Date]))<>[tbl_Nest_Master].[Year]));")
@@ -913,8 +872,11 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_j142_Missing_Band_Totals_X', flagTable='tbl_SNPL_Observations',
+                                       tablesRead=('qsel_QA_Control', 'tbl_Events', 'tbl_SNPL_Banded',
+                                                   'tbl_SNPL_Observations'))
     def qa_j142_Missing_Band_Totals (queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_j142_Missing_Band_Totals. Returns records where there is data in
@@ -945,7 +907,7 @@ class qcProtcol_SNPLPORE:
                            f"tbl_SNPL_Observations.Nest_ID, tbl_SNPL_Observations.SNPL_Time, "
                            f"tbl_SNPL_Observations.SNPL_Bands, tbl_SNPL_Banded.Left_Leg, "
                            f"tbl_SNPL_Banded.Right_Leg, tbl_SNPL_Banded.Band_Notes, 'frm_Data_Entry' AS varObject, "
-                           f"'tbl_Events' AS RecTable, 'Event_ID' AS RecField, tbl_Events.Event_ID AS RecValue "
+                           f"'tbl_Events' AS RecTable, 'Event_ID' AS RecField, qsel_QA_Control.Event_ID AS RecValue "
                            f"FROM (qsel_QA_Control INNER JOIN tbl_SNPL_Observations ON qsel_QA_Control.Event_ID = "
                            f"tbl_SNPL_Observations.Event_ID) INNER JOIN tbl_SNPL_Banded ON "
                            f"tbl_SNPL_Observations.SNPL_Data_ID = tbl_SNPL_Banded.SNPL_Data_ID "
@@ -965,8 +927,11 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_j152_Missing_Band_Data_X', flagTable='tbl_SNPL_Observations',
+                                       tablesRead=('qsel_QA_Control', 'tbl_Events', 'tbl_SNPL_Banded',
+                                                   'tbl_SNPL_Observations'))
     def qa_j152_Missing_Band_Data(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_j152_Missing_Band_Data. Returns records where there are no records in
@@ -998,7 +963,7 @@ class qcProtcol_SNPLPORE:
                           f"tbl_SNPL_Observations.SNPL_Bands AS [Count SNPL Observations], "
                           f"tbl_SNPL_Banded.SNPL_Data_ID AS [SNPL Banded Is Null], tbl_SNPL_Banded.Left_Leg, "
                           f"tbl_SNPL_Banded.Right_Leg, tbl_SNPL_Banded.Band_Notes, 'frm_Data_Entry' AS varObject, "
-                          f"'tbl_Events' AS RecTable, 'Event_ID' AS RecField, tbl_Events.Event_ID AS RecValue "
+                          f"'tbl_Events' AS RecTable, 'Event_ID' AS RecField, qsel_QA_Control.Event_ID AS RecValue "
                           f"FROM (qsel_QA_Control INNER JOIN tbl_SNPL_Observations ON qsel_QA_Control.Event_ID = "
                           f"tbl_SNPL_Observations.Event_ID) LEFT JOIN tbl_SNPL_Banded ON "
                           f"tbl_SNPL_Observations.SNPL_Data_ID = tbl_SNPL_Banded.SNPL_Data_ID "
@@ -1019,8 +984,11 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_j162_Mismatched_Band_Obs', flagTable='tbl_SNPL_Observations',
+                                       tablesRead=('qsel_QA_Control', 'qasub_j162_Mismatched_Band_Obs',
+                                                   'tbl_SNPL_Banded', 'tbl_SNPL_Observations'))
     def qa_j162_Mismatched_Band_Obs (queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_j162_Mismatched_Band_Obs. Returns records where there where the
@@ -1058,10 +1026,8 @@ class qcProtcol_SNPLPORE:
                        f"qsel_QA_Control.Start_Date, tbl_SNPL_Observations.SNPL_Time;")
 
 
-            # Check if query exists first - if yes delete
-            dm.generalDMClass.queryExistsDelete(queryName=queryName_LU, inDBPath=qcCheckInstance.inDBFE)
-
-            dm.generalDMClass.pushQueryODBC(inQuerySel=inQuery, queryName=queryName_LU, inDBPath=qcCheckInstance.inDBFE)
+            # Push the setup query (deleted first if exists) - skipped if the query is unchanged
+            qc.qcChecks.pushQueryToDB(inQuery, queryName_LU, qcCheckInstance, dmInstance)
 
             #####################
             # Final Query hitting setup query qasub_j162_Mismatched_Band_Obs
@@ -1093,9 +1059,12 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_j172_Mismatched_Band_Summary', flagTable='tbl_Event_Details',
+                                       tablesRead=('qsel_QA_Control', 'qasub_j172_Mismatched_Band_Summary',
+                                                   'tbl_Event_Details', 'tbl_SNPL_Banded', 'tbl_SNPL_Observations'))
     def qa_j172_Mismatched_Band_Summary (queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_j172_Mismatched_Band_Summary. Returns records where there the number of
@@ -1128,10 +1097,8 @@ class qcProtcol_SNPLPORE:
                        f"JOIN tbl_Event_Details ON qsel_QA_Control.Event_ID = tbl_Event_Details.Event_ID "
                        f"GROUP BY tbl_SNPL_Observations.Event_ID, tbl_Event_Details.SNPL_Banded;")
 
-            # Check if query exists first - if yes delete
-            dm.generalDMClass.queryExistsDelete(queryName=queryName_LU, inDBPath=qcCheckInstance.inDBFE)
-
-            dm.generalDMClass.pushQueryODBC(inQuerySel=inQuery, queryName=queryName_LU, inDBPath=qcCheckInstance.inDBFE)
+            # Push the setup query (deleted first if exists) - skipped if the query is unchanged
+            qc.qcChecks.pushQueryToDB(inQuery, queryName_LU, qcCheckInstance, dmInstance)
 
             #####################
             # Final Query hitting setup query qasub_j172_Mismatched_Band_Summary
@@ -1163,10 +1130,13 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
 
 
+    @qcr.qcRegistryClass.registerCheck('SNPLPORE', 'qa_j182_Predator_ActivityType_X', flagTable='tbl_Predator_Survey',
+                                       tablesRead=('tbl_Events', 'tbl_Locations', 'tbl_Predator_Survey',
+                                                   'tlu_Predator_Actions', 'tlu_Predator_Type'))
     def qa_j182_Predator_ActivityType (queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
         """
         Query routine for validation check - qa_j182_Predator_ActivityType. Returns records where the predator survey
@@ -1244,7 +1214,7 @@ class qcProtcol_SNPLPORE:
             dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.error(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
-            exit()
+            raise
 
 
     if __name__ == "__name__":
@@ -0,0 +1,299 @@
+"""
+QC_Engine.py
+In-memory evaluation engine for the QC checks ('engine' parameter 'pandas' in SFAN_AccessQCChecks.py or --engine on the
+command line).  The source tables of the year are read once per run and the result records of the QC checks are
+computed as vectorized dataframe operations, rather than reading back each pushed QC query from the Front End.
+
+The QC queries are still pushed to the Front End (the QC forms use them), only the 'tbl_QA_Results' record counts and
+the flag candidates come from the engine.  The engine keeps the state of the flag fields in memory, flags applied during
+the run are recorded so the flag candidates of the following checks match the QC queries.  With the snapshot cache
+(QC_Snapshot.py) the tables are read from local snapshots of the year when unchanged.  In parity mode
+('engineParity') the engine result of each check is compared with the pushed QC query (record count and distinct join
+field values), on a mismatch the QC query is used.
+
+Protocol engines subclass 'qcEngineClass' (e.g. QC_Engine_SNPLPORE.py), read the source tables in 'loadTables' and map
+the query names to evaluator methods in 'evaluators'.  The protocol class defines its engine via 'engineClass'.
+"""
+import logging
+import threading
+from time import perf_counter
+import generalDM as dm
+import QC_Checks as qc
+from lazyImports import lazyModuleClass
+
+# pandas is imported on first use
+pd = lazyModuleClass('pandas')
+
+logger = logging.getLogger(__name__)
+
+class qcEngineClass:
+    """
+    In-memory evaluation of the QC checks for one year - base class of the protocol engines
+    """
+
+    # Evaluator method name per query name - query name ('QueryName' in 'tbl_QCQueries'): method name
+    evaluators = {}
+
+    def __init__(self, qcCheckInstance, yearlyRecDF, snapshot=None):
+        """
+        Define the instantiated engine attributes
+
+        :param qcCheckInstance: QC Check Instance
+        :param yearlyRecDF: Dataframe with the subset of yearly records by Event to be processed (filter query)
+        :param snapshot: Snapshot cache of the tables (QC_Snapshot.qcSnapshotClass), None reads the backend
+
+        :return: instantiated self object
+        """
+
+        self.qcCheckInstance = qcCheckInstance
+        self.yearlyRecDF = yearlyRecDF
+        self.snapshot = snapshot
+        self.dmInstance = None
+        # Source tables read by 'loadTables' - table name: dataframe
+        self.tables = {}
+        # Flag field state of the flag tables - (flag table, flag field): dataframe, copied from 'tables' on first use
+        self.flagStates = {}
+        self.flagLock = threading.Lock()
+
+    def load(self, dmInstance):
+        """
+        Read the source tables of the year, on error the engine is not used
+
+        :param dmInstance: Data Management Instance
+
+        :return: loaded: True if the tables were read
+        """
+
+        try:
+            startTime = perf_counter()
+            self.dmInstance = dmInstance
+            self.loadTables()
+
+            logMsg = (f'QC evaluation engine - loaded {len(self.tables)} tables '
+                      f'({sum(len(tableDF) for tableDF in self.tables.values())} rows) for '
+                      f'{self.qcCheckInstance.yearLU} in {perf_counter() - startTime:.2f}s')
+            if self.snapshot is not None:
+                cacheStats = self.snapshot.cacheStats()
+                logMsg = (f"{logMsg} - {cacheStats['snapshotHits']} from the snapshot cache, "
+                          f"{cacheStats['snapshotMisses']} from the backend")
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.info(logMsg)
+            return True
+
+        except Exception as e:
+            logMsg = f'WARNING - QC evaluation engine not available, QC Queries are read from the Front End - {e}'
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.warning(logMsg, exc_info=True)
+            return False
+
+    def loadTables(self):
+        """
+        Read the source tables into 'tables' - defined by the protocol engine
+
+        :return:
+        """
+
+        raise NotImplementedError
+
+    def readTable(self, tableName, dateColumns=(), keyField=None, keys=None):
+        """
+        Read a backend table into a dataframe, via the snapshot cache if defined
+
+        :param tableName: Name of the table
+        :param dateColumns: Date/time columns converted to datetime (unparsable values are null)
+        :param keyField: Field the table is subset on (e.g. 'Event_ID'), None reads all records
+        :param keys: Values of 'keyField' retained (e.g. the Event_IDs of the year)
+
+        :return: tableDF: Table dataframe
+        """
+
+        def readBackend():
+            tableDF = dm.generalDMClass.connect_to_AcessDB_DF(f'SELECT * FROM {tableName}', self.qcCheckInstance.inDBBE)
+            if keyField is not None:
+                tableDF = tableDF[tableDF[keyField].isin(keys)]
+            for column in dateColumns:
+                tableDF[column] = pd.to_datetime(tableDF[column], errors='coerce')
+
+            return tableDF
+
+        if self.snapshot is None:
+            return readBackend()
+
+        scope = None if keyField is None else [keyField] + list(keys)
+        return self.snapshot.readTable(tableName, readBackend, scope=scope, dmInstance=self.dmInstance)
+
+    def hasEvaluator(self, queryName):
+        """
+        Check if the query is evaluated by the engine
+
+        :param queryName: Query name ('QueryName' in 'tbl_QCQueries')
+
+        :return: True if an evaluator is defined for the query
+        """
+
+        return queryName in self.evaluators
+
+    def evaluate(self, queryName):
+        """
+        Compute the result records of the QC query
+
+        :param queryName: Query name ('QueryName' in 'tbl_QCQueries')
+
+        :return: resultDF: Dataframe with one row per QC query record
+        """
+
+        return getattr(self, self.evaluators[queryName])()
+
+    def join(left, right, on, how='inner'):
+        """
+        SQL join of two dataframes - rows with a null join key do not match (pandas matches null keys)
+
+        :param left: Left dataframe
+        :param right: Right dataframe
+        :param on: Join column(s)
+        :param how: 'inner' or 'left'
+
+        :return: joinedDF: Joined dataframe
+        """
+
+        on = [on] if isinstance(on, str) else list(on)
+        right = right[right[on].notna().all(axis=1)]
+        if how == 'inner':
+            left = left[left[on].notna().all(axis=1)]
+
+        return left.merge(right, on=on, how=how)
+
+    def condition(series):
+        """
+        SQL WHERE condition of a boolean series - null (e.g. comparison with null) is False
+
+        :param series: Boolean series, may hold nulls
+
+        :return: Boolean series
+        """
+
+        return series.fillna(False).astype(bool)
+
+    def flagState(self, querySpec):
+        """
+        Current flag field values of the flag table of the query, copied from the loaded table on first use
+
+        :param querySpec: Definition of the query (QC_Checks.qcQuerySpecClass)
+
+        :return: stateDF: Dataframe of the flag table, None if the table is not loaded by the engine
+        """
+
+        stateKey = (querySpec.flagTable, querySpec.flagFieldTable)
+        if stateKey not in self.flagStates:
+            tableDF = self.tables.get(querySpec.flagTable)
+            if tableDF is None or querySpec.flagFieldTable not in tableDF.columns:
+                return None
+            self.flagStates[stateKey] = tableDF.copy()
+
+        return self.flagStates[stateKey]
+
+    def flagCandidateKeys(self, querySpec, resultDF):
+        """
+        Distinct join field values of the query result without the QC flag in the current flag field state
+
+        :param querySpec: Definition of the query (QC_Checks.qcQuerySpecClass)
+        :param resultDF: Result records of the query (evaluate)
+
+        :return: keysDF: Dataframe with the join field column, one row per distinct value.  None if the flag table is
+         not loaded by the engine.
+        """
+
+        joinField = querySpec.joinField
+        with self.flagLock:
+            stateDF = self.flagState(querySpec)
+            if stateDF is None:
+                return None
+
+            stateDF = stateDF[stateDF[joinField].isin(resultDF[joinField].dropna().unique())]
+            hasFlag = qc.qcChecks.hasQCFlag(stateDF[querySpec.flagFieldTable], querySpec.qcFlag)
+            keys = stateDF.loc[~hasFlag.to_numpy(), joinField].unique()
+
+        return pd.DataFrame({joinField: keys})
+
+    def recordFlags(self, querySpec, keysDF):
+        """
+        Record the QC flag applied to the join field values in the flag field state (same as the flag update - the
+        flag code is appended to the existing flags)
+
+        :param querySpec: Definition of the query (QC_Checks.qcQuerySpecClass)
+        :param keysDF: Dataframe with the join field values flagged
+
+        :return:
+        """
+
+        joinField = querySpec.joinField
+        flagField = querySpec.flagFieldTable
+        with self.flagLock:
+            stateDF = self.flagState(querySpec)
+            if stateDF is None or joinField not in stateDF.columns:
+                return
+
+            flagRows = stateDF[joinField].isin(keysDF[joinField].dropna().unique())
+            stateDF[flagField] = stateDF[flagField].astype(object)
+            stateDF.loc[flagRows, flagField] = qc.qcChecks.appendQCFlag(stateDF.loc[flagRows, flagField],
+                                                                        querySpec.qcFlag)
+
+    def parityKeys(values):
+        """
+        Normalized join field values for the parity comparison (integral floats from joins with nulls as integers)
+
+        :param values: Iterable of join field values
+
+        :return: keys: Set of string values
+        """
+
+        return {str(int(value)) if isinstance(value, float) and value.is_integer() else str(value) for value in values
+                if pd.notna(value)}
+
+    def checkParity(self, querySpec, resultDF, dmInstance):
+        """
+        Compare the engine result with the pushed QC query - record count and distinct join field values
+
+        :param querySpec: Definition of the query (QC_Checks.qcQuerySpecClass)
+        :param resultDF: Result records of the query (evaluate)
+        :param dmInstance: Data Management Instance
+
+        :return: parity: True if the engine result matches the QC query
+        """
+
+        queryName = querySpec.queryName
+        inDBFE = self.qcCheckInstance.inDBFE
+        try:
+            sqlCount = dm.generalDMClass.countQueryRecords(f'Select * FROM {queryName}', inDBFE)
+            mismatches = []
+            if sqlCount != len(resultDF):
+                mismatches.append(f'record count {len(resultDF)} (query {sqlCount})')
+
+            joinField = querySpec.joinField
+            if joinField is not None and joinField in resultDF.columns:
+                sqlKeysDF = dm.generalDMClass.connect_to_AcessDB_DF(f'SELECT DISTINCT [{joinField}] FROM [{queryName}]',
+                                                                    inDBFE)
+                sqlKeys = qcEngineClass.parityKeys(sqlKeysDF[joinField])
+                engineKeys = qcEngineClass.parityKeys(resultDF[joinField].unique())
+                if sqlKeys != engineKeys:
+                    mismatches.append(f'{len(engineKeys ^ sqlKeys)} {joinField} values differ')
+
+        except Exception as e:
+            logMsg = f'WARNING - Engine parity not checked for - {queryName} - using the QC Query: {e}'
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.warning(logMsg)
+            return False
+
+        if mismatches:
+            logMsg = (f'WARNING - Engine result does not match the QC Query for - {queryName} - '
+                      f'{", ".join(mismatches)} - using the QC Query')
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.warning(logMsg)
+            return False
+
+        logMsg = f'Engine result matches the QC Query for - {queryName} - {len(resultDF)} records'
+        dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+        return True
+
+if __name__ == "__name__":
+    logger.info("Running QC_Engine.py")
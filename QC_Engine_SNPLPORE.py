@@ -0,0 +1,315 @@
+"""
+QC_Engine_SNPLPORE.py
+In-memory evaluation engine for the SNPL PORE QC checks (QC_Engine.py).  The events of the year (filter query
+'qsel_QA_Control'), event details, SNPL observations, banding, observer, nest and predator rows are read once, the
+result records of each QC check are computed with dataframe joins and filters equivalent to the QC check SQL in
+QC_Checks_SNPLPORE.py.
+
+SQL semantics retained: null join keys do not match, comparisons with null are False, 'DateDiff' with the 'n' interval
+counts the minute boundaries crossed.
+"""
+import logging
+import QC_Engine as qce
+from lazyImports import lazyModuleClass
+
+# pandas is imported on first use
+pd = lazyModuleClass('pandas')
+
+logger = logging.getLogger(__name__)
+
+join = qce.qcEngineClass.join
+condition = qce.qcEngineClass.condition
+
+class qcEngineSNPLPOREClass(qce.qcEngineClass):
+    """
+    In-memory evaluation of the SNPL PORE QC checks for one year
+    """
+
+    # Evaluator method per query name in 'tbl_QCQueries'
+    evaluators = {'qa_a102_Unverified_Events_X': 'qa_a102_Unverified_Events',
+                  'qa_f112_Incomplete_Weather_X': 'qa_f112_Incomplete_Weather',
+                  'qa_f122_CompleteSurvey_IncompleteSNPL_X': 'qa_f122_CompleteSurvey_IncompleteSNPL',
+                  'qa_f132_MoreCheckedSNPL_ThanTotal_X': 'qa_f132_MoreCheckedSNPL_ThanTotal',
+                  'qa_f142_MoreBandedSNPL_ThanChecked_X': 'qa_f142_MoreBandedSNPL_ThanChecked',
+                  'qa_f152_StopTime_MoreThanEvent_X': 'qa_f152_StopTime_MoreThanEvent',
+                  'qa_h102_Missing_Observers_X': 'qa_h102_Missing_Observers',
+                  'qa_j102_SNPL_ObservationTime_Error_X': 'qa_j102_SNPL_ObservationTime_Error',
+                  'qa_j132_NestID_Year_Mismatch_X': 'qa_j132_NestID_Year_Mismatch',
+                  'qa_j142_Missing_Band_Totals_X': 'qa_j142_Missing_Band_Totals',
+                  'qa_j152_Missing_Band_Data_X': 'qa_j152_Missing_Band_Data',
+                  'qa_j162_Mismatched_Band_Obs': 'qa_j162_Mismatched_Band_Obs',
+                  'qa_j172_Mismatched_Band_Summary': 'qa_j172_Mismatched_Band_Summary',
+                  'qa_j182_Predator_ActivityType_X': 'qa_j182_Predator_ActivityType'}
+
+    # Event detail fields - weather (qa_f112) and SNPL summary (qa_f122) fields which must be populated
+    weatherFields = ['Wind_Spd', 'Wind_Max', 'Wind_Dir', 'Air_Temp', 'Rel_Hum', 'Cloud_Cover']
+    snplSummaryFields = ['SNPL_Adults', 'SNPL_Hatchlings', 'SNPL_Fledglings', 'SNPL_Checked_Bands', 'SNPL_Banded']
+
+    def loadTables(self):
+        """
+        Read the source tables of the SNPL PORE QC checks - tables by Event are subset to the events of the year, the
+        predator check (qa_j182) reads all years
+
+        :return:
+        """
+
+        # Events of the year - filter query records
+        controlDF = self.yearlyRecDF.copy()
+        for column in ('Start_Date', 'Start_Time', 'End_Time'):
+            controlDF[column] = pd.to_datetime(controlDF[column], errors='coerce')
+        self.tables['qsel_QA_Control'] = controlDF
+        yearEvents = controlDF['Event_ID'].dropna().unique()
+
+        for tableName in ('tbl_Event_Details', 'xref_Event_Contacts'):
+            self.tables[tableName] = self.readTable(tableName, keyField='Event_ID', keys=yearEvents)
+
+        observationsDF = self.readTable('tbl_SNPL_Observations', dateColumns=['SNPL_Time'], keyField='Event_ID',
+                                        keys=yearEvents)
+        self.tables['tbl_SNPL_Observations'] = observationsDF
+
+        self.tables['tbl_SNPL_Banded'] = self.readTable('tbl_SNPL_Banded', keyField='SNPL_Data_ID',
+                                                        keys=observationsDF['SNPL_Data_ID'].dropna().unique())
+
+        for tableName in ('tbl_Nest_Master', 'tlu_Data_Processing_Level', 'tbl_Locations', 'tbl_Predator_Survey',
+                          'tlu_Predator_Type', 'tlu_Predator_Actions'):
+            self.tables[tableName] = self.readTable(tableName)
+
+        self.tables['tbl_Events'] = self.readTable('tbl_Events', dateColumns=['Start_Date'])
+
+    def controlDetails(self, detailFields, how='inner'):
+        """
+        Filter query records joined to the event details
+
+        :param detailFields: 'tbl_Event_Details' fields returned
+        :param how: 'inner' or 'left' join
+
+        :return: joinedDF: Joined dataframe
+        """
+
+        controlDF = self.tables['qsel_QA_Control'][['Event_ID', 'Start_Date', 'Loc_Name', 'Start_Time', 'End_Time']]
+        detailsDF = self.tables['tbl_Event_Details'][['Event_ID'] + detailFields]
+
+        return join(controlDF, detailsDF, 'Event_ID', how=how)
+
+    def controlObservations(self):
+        """
+        Filter query records joined to the SNPL observations
+
+        :return: joinedDF: Joined dataframe
+        """
+
+        controlDF = self.tables['qsel_QA_Control'][['Event_ID', 'Start_Date', 'Loc_Name', 'Start_Time', 'End_Time']]
+        observationsDF = self.tables['tbl_SNPL_Observations'][['SNPL_Data_ID', 'Event_ID', 'SNPL_Time', 'Nest_ID',
+                                                               'SNPL_Bands']]
+
+        return join(controlDF, observationsDF, 'Event_ID')
+
+    def qa_a102_Unverified_Events(self):
+        """
+        Events not marked as verified - data processing level below 2 or not defined
+
+        :return: resultDF: Result records
+        """
+
+        levelsDF = self.tables['tlu_Data_Processing_Level'][['DataProcessingLevelID', 'Label']]
+        resultDF = join(self.tables['qsel_QA_Control'][['Event_ID', 'Start_Date', 'Loc_Name',
+                                                        'DataProcessingLevelID']], levelsDF, 'DataProcessingLevelID',
+                        how='left')
+        levelID = resultDF['DataProcessingLevelID']
+
+        return resultDF[condition(levelID < 2) | levelID.isna()]
+
+    def qa_f112_Incomplete_Weather(self):
+        """
+        Complete surveys missing weather condition data
+
+        :return: resultDF: Result records
+        """
+
+        fields = qcEngineSNPLPOREClass.weatherFields
+        resultDF = self.controlDetails(['Incomplete_Survey'] + fields, how='left')
+        complete = condition(resultDF['Incomplete_Survey'] == False)
+
+        return resultDF[complete & resultDF[fields].isna().any(axis=1)]
+
+    def qa_f122_CompleteSurvey_IncompleteSNPL(self):
+        """
+        Complete surveys missing SNPL summary data
+
+        :return: resultDF: Result records
+        """
+
+        fields = qcEngineSNPLPOREClass.snplSummaryFields
+        resultDF = self.controlDetails(['Incomplete_Survey'] + fields, how='left')
+        complete = condition(resultDF['Incomplete_Survey'] == False)
+
+        return resultDF[complete & resultDF[fields].isna().any(axis=1)]
+
+    def qa_f132_MoreCheckedSNPL_ThanTotal(self):
+        """
+        Surveys with more SNPL checked for bands than the total SNPL
+
+        :return: resultDF: Result records
+        """
+
+        resultDF = self.controlDetails(qcEngineSNPLPOREClass.snplSummaryFields)
+        totalSNPL = resultDF['SNPL_Adults'] + resultDF['SNPL_Hatchlings'] + resultDF['SNPL_Fledglings']
+        resultDF = resultDF.assign(TotalSNPL=totalSNPL)
+
+        return resultDF[condition(totalSNPL < resultDF['SNPL_Checked_Bands'])]
+
+    def qa_f142_MoreBandedSNPL_ThanChecked(self):
+        """
+        Surveys with more banded SNPL than SNPL checked for bands
+
+        :return: resultDF: Result records
+        """
+
+        resultDF = self.controlDetails(qcEngineSNPLPOREClass.snplSummaryFields)
+
+        return resultDF[condition(resultDF['SNPL_Banded'] > resultDF['SNPL_Checked_Bands'])]
+
+    def qa_f152_StopTime_MoreThanEvent(self):
+        """
+        Surveys where the predator stop time (minutes) is longer than the survey event time (minutes)
+
+        :return: resultDF: Result records
+        """
+
+        resultDF = self.controlDetails(['Predtor_Survey', 'PredatorStop'])
+        # DateDiff('n') - minute boundaries crossed
+        surveyMinutes = ((resultDF['End_Time'].dt.floor('min') - resultDF['Start_Time'].dt.floor('min')) /
+                         pd.Timedelta(minutes=1))
+        resultDF = resultDF.assign(SurveyMinutes=surveyMinutes)
+
+        return resultDF[condition(surveyMinutes < resultDF['PredatorStop'])]
+
+    def qa_h102_Missing_Observers(self):
+        """
+        Surveys without an observer
+
+        :return: resultDF: Result records
+        """
+
+        contactsDF = self.tables['xref_Event_Contacts'][['Event_ID', 'Contact_ID']]
+        resultDF = join(self.tables['qsel_QA_Control'][['Event_ID', 'Start_Date', 'Loc_Name']], contactsDF,
+                        'Event_ID', how='left')
+
+        return resultDF[resultDF['Contact_ID'].isna()]
+
+    def qa_j102_SNPL_ObservationTime_Error(self):
+        """
+        SNPL observations with an observation time outside the survey start and end times
+
+        :return: resultDF: Result records
+        """
+
+        resultDF = self.controlObservations()
+        snplTime = resultDF['SNPL_Time']
+
+        return resultDF[condition(snplTime < resultDF['Start_Time']) | condition(snplTime > resultDF['End_Time'])]
+
+    def qa_j132_NestID_Year_Mismatch(self):
+        """
+        SNPL observations where the survey year does not match the nest year
+
+        :return: resultDF: Result records
+        """
+
+        nestDF = self.tables['tbl_Nest_Master'][['Nest_ID', 'Year']].rename(columns={'Year': 'NestYear'})
+        resultDF = join(self.controlObservations(), nestDF, 'Nest_ID')
+        obsYear = resultDF['Start_Date'].dt.year
+        resultDF = resultDF.assign(ObsYear=obsYear)
+
+        return resultDF[condition(obsYear.notna() & resultDF['NestYear'].notna() & (obsYear != resultDF['NestYear']))]
+
+    def qa_j142_Missing_Band_Totals(self):
+        """
+        SNPL observations with banding records but no band total
+
+        :return: resultDF: Result records
+        """
+
+        bandedDF = self.tables['tbl_SNPL_Banded'][['SNPL_Data_ID', 'Left_Leg', 'Right_Leg', 'Band_Notes']]
+        resultDF = join(self.controlObservations(), bandedDF, 'SNPL_Data_ID')
+        snplBands = resultDF['SNPL_Bands']
+
+        return resultDF[snplBands.isna() | condition(snplBands == 0)]
+
+    def qa_j152_Missing_Band_Data(self):
+        """
+        SNPL observations with a band total but no banding records
+
+        :return: resultDF: Result records
+        """
+
+        bandedDF = self.tables['tbl_SNPL_Banded'][['SNPL_Data_ID']].assign(Banded=True)
+        resultDF = join(self.controlObservations(), bandedDF, 'SNPL_Data_ID', how='left')
+
+        return resultDF[condition(resultDF['SNPL_Bands'] > 0) & resultDF['Banded'].isna()]
+
+    def qa_j162_Mismatched_Band_Obs(self):
+        """
+        SNPL observations where the band total does not match the number of banding records
+
+        :return: resultDF: Result records
+        """
+
+        bandedDF = self.tables['tbl_SNPL_Banded'][['SNPL_Data_ID', 'SNPL_Band_ID']]
+        joinedDF = join(self.controlObservations(), bandedDF, 'SNPL_Data_ID')
+
+        # Summary by observation (qasub_j162_Mismatched_Band_Obs) - count of the banding records
+        summaryDF = joinedDF.groupby('SNPL_Data_ID', sort=False).agg(
+            Event_ID=('Event_ID', 'first'), Loc_Name=('Loc_Name', 'first'), Start_Date=('Start_Date', 'first'),
+            SNPL_Time=('SNPL_Time', 'first'), Nest_ID=('Nest_ID', 'first'), SNPL_Bands=('SNPL_Bands', 'first'),
+            CountSNPBanded=('SNPL_Band_ID', 'count')).reset_index()
+        summaryDF = summaryDF[condition(summaryDF['CountSNPBanded'] != summaryDF['SNPL_Bands']) &
+                              summaryDF['SNPL_Bands'].notna()]
+
+        observationsDF = self.tables['tbl_SNPL_Observations'][['SNPL_Data_ID']]
+
+        return join(summaryDF, observationsDF, 'SNPL_Data_ID')
+
+    def qa_j172_Mismatched_Band_Summary(self):
+        """
+        Surveys where the banded SNPL in the event summary does not match the number of banding records
+
+        :return: resultDF: Result records
+        """
+
+        detailsDF = self.tables['tbl_Event_Details'][['Event_ID', 'SNPL_Banded']]
+        bandedDF = self.tables['tbl_SNPL_Banded'][['SNPL_Data_ID']]
+        joinedDF = join(join(self.controlObservations(), bandedDF, 'SNPL_Data_ID'), detailsDF, 'Event_ID')
+
+        # Summary by event (qasub_j172_Mismatched_Band_Summary) - count of the banding records
+        summaryDF = joinedDF.groupby(['Event_ID', 'SNPL_Banded'], sort=False, dropna=False).size().reset_index(
+            name='CountSNPLBanded')
+        summaryDF = summaryDF[condition(summaryDF['SNPL_Banded'] != summaryDF['CountSNPLBanded']) &
+                              summaryDF['SNPL_Banded'].notna()]
+
+        controlDF = self.tables['qsel_QA_Control'][['Event_ID', 'Loc_Name', 'Start_Date']]
+
+        return join(join(summaryDF, controlDF, 'Event_ID'), detailsDF[['Event_ID']], 'Event_ID')
+
+    def qa_j182_Predator_ActivityType(self):
+        """
+        Predator survey records with an activity type not in 'tlu_Predator_Actions' (all years)
+
+        :return: resultDF: Result records
+        """
+
+        eventsDF = self.tables['tbl_Events'][['Event_ID', 'Location_ID', 'Start_Date']]
+        predatorDF = self.tables['tbl_Predator_Survey'][['Predator_Data_ID', 'Event_ID', 'Predator_Type_ID',
+                                                         'GroupSize', 'BinNumber', 'ACT', 'Waypoint']]
+        locationsDF = self.tables['tbl_Locations'][['Location_ID', 'Loc_Name']]
+        typesDF = self.tables['tlu_Predator_Type'][['Predator_Type_ID', 'Description']]
+
+        resultDF = join(join(join(eventsDF, predatorDF, 'Event_ID'), locationsDF, 'Location_ID'), typesDF,
+                        'Predator_Type_ID')
+        # Activity types compared as text - the QC query filters on the quoted 'Predator_Action_ID' values
+        actions = self.tables['tlu_Predator_Actions']['Predator_Action_ID'].dropna().astype(str).unique()
+
+        return resultDF[resultDF['ACT'].notna() & ~resultDF['ACT'].astype(str).isin(actions)]
+
+if __name__ == "__name__":
+    logger.info("Running QC_Engine_SNPLPORE.py")
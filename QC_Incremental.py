@@ -0,0 +1,392 @@
+"""
+QC_Incremental.py
+Incremental QC mode - re-runs only the QC checks whose source data changed since the last run for the year.
+
+After each run a change fingerprint (row count, maximum 'Updated_Date' and row hash - generalDMClass.tableFingerprint)
+and change stamp (one aggregate query - generalDMClass.tableChangeStamp) of every table read by the checks is recorded
+per year in the backend table 'tbl_QC_Fingerprints', together with the checks whose writes were committed and their
+check key (hash of the check SQL, the SQL of the queries it reads and its 'tbl_QCQueries' flag definition).  On the next
+run for the year the change stamps are recomputed, the rows of a table are only read and hashed when its change stamp
+changed (edits not setting 'Updated_Date' or a QC flag field are not detected); a check is skipped and
+its stored 'tbl_QA_Results' record count reused when none of its source tables (registered 'tablesRead' metadata,
+queries resolved to their source tables) changed, it was committed in the last run with the same check key and its
+'tbl_QA_Results' record exists.  The queries of skipped checks are still pushed to the Front End, only the record
+counts and flag updates are skipped.
+"""
+import sys
+import hashlib
+import threading
+import traceback
+import logging
+from datetime import datetime
+import generalDM as dm
+from lazyImports import lazyModuleClass
+
+# pandas is imported on first use
+pd = lazyModuleClass('pandas')
+
+logger = logging.getLogger(__name__)
+
+class qcIncrementalClass:
+    """
+    Incremental state of a QC run for one year
+    """
+
+    # Backend table holding the table fingerprints and processed checks per year
+    fingerprintTable = 'tbl_QC_Fingerprints'
+
+    # Prefixes of the Front End queries (not tables) read by the QC checks
+    queryPrefixes = ('qsel_', 'qasub_', 'qa_')
+
+    # 'tbl_QC_Fingerprints' fields
+    stateColumns = ['Time_Frame', 'Object_Type', 'Object_Name', 'Row_Count', 'Max_Updated_Date', 'Row_Hash',
+                    'Change_Stamp', 'Recorded_Time']
+
+    def __init__(self, qcCheckInstance, protocolClass, protocolChecks, querySpecs):
+        """
+        Define the instantiated incremental state attributes
+
+        :param qcCheckInstance: QC Check Instance
+        :param protocolClass: Protocol class, 'queryTables' defines the source tables of the filter query
+        :param protocolChecks: Dictionary - query name: registered check (QC_Registry.qcCheckSpecClass)
+        :param querySpecs: Dictionary - query name: query definition (QC_Checks.qcQuerySpecClass) of the queries
+         processed in the run
+
+        :return: instantiated self object
+        """
+
+        self.qcCheckInstance = qcCheckInstance
+        self.timeFrame = str(qcCheckInstance.yearLU)
+        queryTables = getattr(protocolClass, 'queryTables', {})
+
+        # Source tables per check - None if the check is not registered (always processed)
+        self.checkTables = {}
+        # Queries read by the check (e.g. 'qsel_QA_Control', 'qasub_' queries), their SQL is part of the check key
+        self.checkQueries = {}
+        for queryName in querySpecs:
+            checkSpec = protocolChecks.get(queryName)
+            self.checkTables[queryName] = (qcIncrementalClass.sourceTables(checkSpec, queryTables) if checkSpec
+                                           is not None else None)
+            self.checkQueries[queryName] = (tuple(tableName for tableName in checkSpec.tablesRead if
+                                                  tableName.startswith(qcIncrementalClass.queryPrefixes)) if
+                                            checkSpec is not None else ())
+
+        # Flag table per check ('tbl_QCQueries' FlagTable) - re-fingerprinted after the run if the check was processed
+        self.flagTables = {queryName: querySpec.flagTable for queryName, querySpec in querySpecs.items()}
+
+        self.previousTables = {}
+        # Checks committed in the last run - query name: check key
+        self.previousChecks = {}
+        # None until 'tbl_QC_Fingerprints' is read, False if the table does not exist
+        self.stateExists = None
+        # False if 'tbl_QC_Fingerprints' was created without the 'Change_Stamp' field
+        self.stampExists = True
+        self.currentTables = {}
+        self.changedTables = set()
+        # Stored 'tbl_QA_Results' record counts for the year - query name: Query_Result
+        self.qaResults = {}
+        # Checks with unchanged source tables, reused if the check key is unchanged
+        self.reuseChecks = set()
+        # Check keys of the run - query name: check key, and of the checks committed (or reused) in the run
+        self.checkKeys = {}
+        self.committedKeys = {}
+        self.reusedChecks = set()
+        self.lock = threading.Lock()
+
+    def sourceTables(checkSpec, queryTables):
+        """
+        Tables read by the check - queries are resolved to their source tables via 'queryTables', other queries (e.g.
+        'qasub_' queries pushed by the check) are dropped as their source tables are listed with the check
+
+        :param checkSpec: Registered check (QC_Registry.qcCheckSpecClass)
+        :param queryTables: Dictionary - query name: source tables
+
+        :return: tables: Set of table names
+        """
+
+        tables = set()
+        for tableName in checkSpec.tablesRead:
+            if tableName in queryTables:
+                tables.update(queryTables[tableName])
+            elif not tableName.startswith(qcIncrementalClass.queryPrefixes):
+                tables.add(tableName)
+
+        return tables
+
+    def checkKey(querySpec, inQuerySel, sourceSQL=()):
+        """
+        Key of the check definition - hash of the check SQL, the SQL of the queries read by the check and the flag
+        definition of the query in 'tbl_QCQueries'.  A changed key re-runs the check.
+
+        :param querySpec: Definition of the QueryName being processed (QC_Checks.qcQuerySpecClass)
+        :param inQuerySel: SQL of the check query
+        :param sourceSQL: SQL of the queries read by the check
+
+        :return: checkKey: Hexadecimal string
+        """
+
+        keyValues = [inQuerySel, *sourceSQL, querySpec.qcFlag, querySpec.flagTable, querySpec.flagFieldTable,
+                     querySpec.flagFieldQuery, querySpec.joinField]
+
+        return hashlib.sha1('\x1f'.join(str(value) for value in keyValues).encode('utf-8')).hexdigest()
+
+    def prepare(self, dmInstance):
+        """
+        Read the state of the last run for the year, fingerprint the source tables and define the checks whose stored
+        'tbl_QA_Results' counts are reused.  On error all checks are processed.
+
+        :param dmInstance: Data Management Instance
+
+        :return:
+        """
+
+        try:
+            self.readState()
+
+            allTables = set()
+            for tables in self.checkTables.values():
+                allTables.update(tables or ())
+            hashedTables = []
+            for tableName in sorted(allTables):
+                self.currentTables[tableName] = self.fingerprint(tableName, self.previousTables.get(tableName))
+                if self.currentTables[tableName] is not self.previousTables.get(tableName):
+                    hashedTables.append(tableName)
+
+            self.changedTables = {tableName for tableName, fingerprint in self.currentTables.items() if
+                                  qcIncrementalClass.tableChanged(self.previousTables.get(tableName), fingerprint)}
+
+            # Stored record counts for the year
+            qaResultsDF = dm.generalDMClass.connect_to_AcessDB_DF("SELECT Query_Name, Query_Result FROM tbl_QA_Results"
+                                                                  " WHERE [Time_Frame] = ?;",
+                                                                  self.qcCheckInstance.inDBFE,
+                                                                  params=(self.timeFrame,))
+            self.qaResults = dict(zip(qaResultsDF['Query_Name'], qaResultsDF['Query_Result']))
+
+            self.reuseChecks = {queryName for queryName, tables in self.checkTables.items() if tables is not None and
+                                not (tables & self.changedTables) and queryName in self.previousChecks and
+                                queryName in self.qaResults}
+
+            logMsg = (f"Incremental mode - {len(self.changedTables)} of {len(self.currentTables)} source tables changed"
+                      f" since the last run for {self.timeFrame} ({', '.join(sorted(self.changedTables)) or 'none'}) -"
+                      f" rows hashed for {len(hashedTables)} tables with a changed change stamp - source tables"
+                      f" unchanged for {len(self.reuseChecks)} of {len(self.checkTables)} QC Queries")
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.info(logMsg)
+
+        except Exception as e:
+            self.reuseChecks = set()
+            logMsg = f'WARNING - Incremental state not available, processing all QC Queries - {e}'
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.warning(logMsg, exc_info=True)
+
+    def fingerprint(self, tableName, recorded):
+        """
+        Fingerprint of a source table - the change stamp is computed first, the rows are only read and hashed when the
+        stamp differs from the recorded fingerprint
+
+        :param tableName: Name of the table
+        :param recorded: Recorded fingerprint of the table (fingerprint dictionary) or None
+
+        :return: fingerprint: Dictionary - Row_Count, Max_Updated_Date, Row_Hash, Change_Stamp; the recorded fingerprint
+         if the change stamp is unchanged
+        """
+
+        changeStamp = dm.generalDMClass.tableChangeStamp(tableName, self.qcCheckInstance.inDBBE)
+        if recorded is not None and recorded.get('Change_Stamp') == changeStamp:
+            return recorded
+
+        fingerprint = dm.generalDMClass.tableFingerprint(tableName, self.qcCheckInstance.inDBBE)
+        fingerprint['Change_Stamp'] = changeStamp
+
+        return fingerprint
+
+    def tableChanged(recorded, fingerprint):
+        """
+        Check if the table changed since the recorded fingerprint - row count, maximum 'Updated_Date' and row hash are
+        compared (a changed change stamp with the same rows is not a change)
+
+        :param recorded: Recorded fingerprint of the table or None
+        :param fingerprint: Current fingerprint of the table
+
+        :return: changed: True if the table changed or has no recorded fingerprint
+        """
+
+        if recorded is None:
+            return True
+
+        return any(recorded.get(key) != fingerprint.get(key) for key in ('Row_Count', 'Max_Updated_Date', 'Row_Hash'))
+
+    def reuseResult(self, querySpec, inQuerySel, pushedQueries, dmInstance):
+        """
+        Check if the stored 'tbl_QA_Results' record of the query is reused (source tables and check key unchanged), a
+        reused check is committed
+
+        :param querySpec: Definition of the QueryName being processed (QC_Checks.qcQuerySpecClass)
+        :param inQuerySel: SQL of the check query
+        :param pushedQueries: Dictionary - query name: SQL of the queries pushed in the run
+        :param dmInstance: Data Management Instance
+
+        :return: reuse: True if the record count and flag updates of the query are skipped
+        """
+
+        queryName = querySpec.queryName
+        sourceSQL = [pushedQueries.get(sourceQuery) for sourceQuery in self.checkQueries.get(queryName, ())]
+        checkKey = qcIncrementalClass.checkKey(querySpec, inQuerySel, sourceSQL)
+        with self.lock:
+            self.checkKeys[queryName] = checkKey
+
+        if queryName not in self.reuseChecks or self.previousChecks.get(queryName) != checkKey:
+            return False
+
+        with self.lock:
+            self.reusedChecks.add(queryName)
+        self.commitCheck(queryName)
+
+        logMsg = (f'Source tables unchanged - reusing tbl_QA_Results record count {self.qaResults[queryName]} for -'
+                  f' {queryName}')
+        dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+        logging.info(logMsg)
+
+        return True
+
+    def commitCheck(self, queryName):
+        """
+        Mark the check as committed - its write batch (QC flags) was executed, or its stored record reused.  Only
+        committed checks are recorded for the next run.
+
+        :param queryName: Name of the QC query
+
+        :return:
+        """
+
+        with self.lock:
+            if queryName in self.checkKeys:
+                self.committedKeys[queryName] = self.checkKeys[queryName]
+
+    def record(self, dmInstance):
+        """
+        Record the table fingerprints and committed checks for the year after the run.  The flag tables of the
+        processed (not reused) checks are fingerprinted again as the QC flag updates change them (rows hashed only if
+        the change stamp changed).
+
+        :param dmInstance: Data Management Instance
+
+        :return:
+        """
+
+        try:
+            with self.lock:
+                committedKeys = dict(self.committedKeys)
+            flaggedTables = {self.flagTables.get(queryName) for queryName in committedKeys if queryName not in
+                             self.reusedChecks} & set(self.currentTables)
+            for tableName in sorted(flaggedTables):
+                self.currentTables[tableName] = self.fingerprint(tableName, self.currentTables[tableName])
+
+            self.writeState(committedKeys)
+
+            logMsg = (f'Recorded the fingerprints of {len(self.currentTables)} source tables for {self.timeFrame} in'
+                      f' {qcIncrementalClass.fingerprintTable}')
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.info(logMsg)
+
+        except Exception as e:
+            logMsg = f'ERROR - An error occurred recording the incremental state: {e}'
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.critical(logMsg, exc_info=True)
+            traceback.print_exc(file=sys.stdout)
+
+    def readStateDF(self):
+        """
+        Read the records of the year from the 'tbl_QC_Fingerprints' table, errors reading an existing table are raised
+
+        :return: stateDF: Dataframe with the recorded fingerprints of the year, None if the table does not exist
+        """
+
+        if not dm.generalDMClass.tableExists(qcIncrementalClass.fingerprintTable, self.qcCheckInstance.inDBBE):
+            return None
+
+        stateDF = dm.generalDMClass.connect_to_AcessDB_DF(f'SELECT * FROM {qcIncrementalClass.fingerprintTable} WHERE'
+                                                          f' [Time_Frame] = ?;', self.qcCheckInstance.inDBBE,
+                                                          params=(self.timeFrame,))
+
+        return stateDF
+
+    def readState(self):
+        """
+        Define the table fingerprints and committed checks (check keys) of the last run for the year
+
+        :return:
+        """
+
+        yearDF = self.readStateDF()
+        self.stateExists = yearDF is not None
+        if yearDF is None:
+            return
+
+        self.stampExists = 'Change_Stamp' in yearDF.columns
+
+        for row in yearDF.itertuples(index=False):
+            if row.Object_Type == 'Table':
+                maxUpdated = row.Max_Updated_Date if pd.notna(row.Max_Updated_Date) else None
+                changeStamp = getattr(row, 'Change_Stamp', None)
+                self.previousTables[row.Object_Name] = {'Row_Count': int(row.Row_Count),
+                                                        'Max_Updated_Date': maxUpdated,
+                                                        'Row_Hash': str(row.Row_Hash),
+                                                        'Change_Stamp': changeStamp if pd.notna(changeStamp) else None}
+            elif row.Object_Type == 'Check' and pd.notna(row.Row_Hash):
+                self.previousChecks[row.Object_Name] = str(row.Row_Hash)
+
+    def writeState(self, committedKeys):
+        """
+        Replace the records of the year in 'tbl_QC_Fingerprints' with the current table fingerprints and committed
+        checks - the records of the year are deleted and inserted in one transaction, the table is only created if it
+        does not exist (the 'Change_Stamp' field is added to a table created without it)
+
+        :param committedKeys: Dictionary - query name: check key of the checks committed or reused in the run
+
+        :return:
+        """
+
+        recordedTime = datetime.now().replace(microsecond=0)
+        records = [(self.timeFrame, 'Table', tableName, fingerprint['Row_Count'], fingerprint['Max_Updated_Date'],
+                    fingerprint['Row_Hash'], fingerprint.get('Change_Stamp'), recordedTime) for tableName, fingerprint
+                   in sorted(self.currentTables.items())]
+        records += [(self.timeFrame, 'Check', queryName, None, None, checkKey, None, recordedTime) for
+                    queryName, checkKey in sorted(committedKeys.items())]
+
+        inDBBE = self.qcCheckInstance.inDBBE
+        if self.stateExists is None:
+            stateDF = self.readStateDF()
+            self.stateExists = stateDF is not None
+            self.stampExists = stateDF is None or 'Change_Stamp' in stateDF.columns
+
+        if not self.stateExists:
+            yearDF = pd.DataFrame.from_records(records, columns=qcIncrementalClass.stateColumns)
+            yearDF['Row_Count'] = yearDF['Row_Count'].astype('Int64')
+            yearDF['Max_Updated_Date'] = yearDF['Max_Updated_Date'].astype(object)
+            yearDF['Row_Hash'] = yearDF['Row_Hash'].astype(object)
+            yearDF['Change_Stamp'] = yearDF['Change_Stamp'].astype(object)
+            yearDF['Recorded_Time'] = pd.to_datetime(yearDF['Recorded_Time'])
+            dm.generalDMClass.createTableFromDF(yearDF, qcIncrementalClass.fingerprintTable, inDBBE)
+            self.stateExists = True
+            return
+
+        fingerprintTable = qcIncrementalClass.fingerprintTable
+        if not self.stampExists:
+            alterBatch = dm.statementBatchClass(inDBBE)
+            alterBatch.add(f'ALTER TABLE {fingerprintTable} ADD COLUMN Change_Stamp TEXT(255);',
+                           label=f'{fingerprintTable} Add Change_Stamp')
+            dm.generalDMClass.executeBatch(alterBatch)
+            self.stampExists = True
+
+        writeBatch = dm.statementBatchClass(inDBBE)
+        writeBatch.add(f'DELETE FROM {fingerprintTable} WHERE [Time_Frame] = ?;', params=(self.timeFrame,),
+                       label=f'{fingerprintTable} Delete {self.timeFrame}')
+        insertSQL = (f"INSERT INTO {fingerprintTable} ( {', '.join(qcIncrementalClass.stateColumns)} ) VALUES "
+                     f"({', '.join(['?'] * len(qcIncrementalClass.stateColumns))});")
+        for record in records:
+            writeBatch.add(insertSQL, params=record, label=f'{fingerprintTable} Insert {record[2]}')
+        dm.generalDMClass.executeBatch(writeBatch)
+
+if __name__ == "__name__":
+    logger.info("Running QC_Incremental.py")
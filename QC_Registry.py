@@ -0,0 +1,235 @@
+"""
+QC_Registry.py
+Registry of the QC protocols and QC checks.  Protocol modules (QC_Checks_{PROTOCOL}.py) are discovered by file name and
+imported when the protocol is first processed.  On import the protocol class and its QC checks register themselves via
+the decorators below, mapping the query names in 'tbl_QCQueries' to the check routine and its metadata.
+
+Usage (protocol module):
+    @qcRegistryClass.registerProtocol('SNPLPORE')
+    class qcProtcol_SNPLPORE:
+
+        @qcRegistryClass.registerCheck('SNPLPORE', 'qa_f112_Incomplete_Weather_X', flagTable='tbl_Event_Details',
+                                       tablesRead=('qsel_QA_Control', 'tbl_Event_Details', 'tbl_Events'))
+        def qa_f112_Incomplete_Weather(queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance):
+
+The check metadata (tables read, flag table, applies flags, check dependencies) is used by the scheduler
+(QC_Scheduler.py) and other run level routines without running or parsing the check routines.
+"""
+import os
+import glob
+import importlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class qcCheckSpecClass:
+    """
+    Registered QC check - check routine and metadata
+    """
+
+    def __init__(self, protocol, queryName, function, tablesRead=(), flagTable=None, appliesFlags=True,
+                 dependsOn=()):
+        """
+        Define the instantiated QC check attributes
+
+        :param protocol: Protocol of the check (e.g. 'SNPLPORE')
+        :param queryName: Query name of the check - 'QueryName' in 'tbl_QCQueries'
+        :param function: Check routine (queryDecrip_LU, yearlyRecDF, qcCheckInstance, dmInstance) returning the final
+         query SQL and the flag fields dictionary
+        :param tablesRead: Tables and queries read by the check SQL (e.g. 'qsel_QA_Control', 'tbl_Events')
+        :param flagTable: Table the QC flag is applied to, None if no flag is applied - checked against the
+         'tbl_QCQueries' FlagTable the flags are written to (qcRegistryClass.validateChecks)
+        :param appliesFlags: True if the check applies QC flags
+        :param dependsOn: Query names of checks which must be processed before the check
+
+        :return: instantiated self object
+        """
+
+        self.protocol = protocol
+        self.queryName = queryName
+        self.function = function
+        self.tablesRead = tuple(tablesRead)
+        self.flagTable = flagTable if appliesFlags else None
+        self.appliesFlags = appliesFlags
+        self.dependsOn = tuple(dependsOn)
+
+    def __repr__(self):
+        return f"<QC check '{self.queryName}' ({self.protocol}) - flag table {self.flagTable}>"
+
+class qcRegistryClass:
+    """
+    Registry of the QC protocols and checks, used as a namespace - the registry is shared by the run
+    """
+
+    # Registered protocol classes - protocol: protocol class
+    protocols = {}
+
+    # Registered checks - protocol: {query name: qcCheckSpecClass}
+    checks = {}
+
+    # Protocol module file name pattern, the protocol name is the file name suffix (e.g. QC_Checks_SNPLPORE.py)
+    protocolModulePrefix = 'QC_Checks_'
+
+    # Discovered protocol modules - protocol: module name, defined on first use
+    protocolModules = None
+
+    lock = threading.RLock()
+
+    def protocolKey(protocol):
+        """
+        Registry key for the protocol name (case insensitive)
+
+        :param protocol: Name of the Protocol (e.g. 'SNPLPORE')
+
+        :return: protocolKey: Upper case protocol name
+        """
+
+        return str(protocol).upper()
+
+    def registerProtocol(protocol):
+        """
+        Class decorator registering the protocol class for the protocol
+
+        :param protocol: Name of the Protocol (e.g. 'SNPLPORE')
+
+        :return: decorator
+        """
+
+        def decorator(protocolClass):
+            with qcRegistryClass.lock:
+                qcRegistryClass.protocols[qcRegistryClass.protocolKey(protocol)] = protocolClass
+            return protocolClass
+
+        return decorator
+
+    def registerCheck(protocol, queryName, tablesRead=(), flagTable=None, appliesFlags=True, dependsOn=()):
+        """
+        Decorator registering a QC check routine for the query name, the routine is returned unchanged
+
+        :param protocol: Name of the Protocol (e.g. 'SNPLPORE')
+        :param queryName: Query name of the check - 'QueryName' in 'tbl_QCQueries'
+        :param tablesRead: Tables and queries read by the check SQL
+        :param flagTable: Table the QC flag is applied to
+        :param appliesFlags: True if the check applies QC flags
+        :param dependsOn: Query names of checks which must be processed before the check
+
+        :return: decorator
+        """
+
+        def decorator(function):
+            checkSpec = qcCheckSpecClass(protocol, queryName, function, tablesRead=tablesRead, flagTable=flagTable,
+                                         appliesFlags=appliesFlags, dependsOn=dependsOn)
+            with qcRegistryClass.lock:
+                protocolChecks = qcRegistryClass.checks.setdefault(qcRegistryClass.protocolKey(protocol), {})
+                if queryName in protocolChecks:
+                    raise ValueError(f"QC check '{queryName}' is already registered for protocol {protocol}")
+                protocolChecks[queryName] = checkSpec
+            return function
+
+        return decorator
+
+    def discoverProtocols():
+        """
+        Find the protocol modules by file name (QC_Checks_{PROTOCOL}.py) in the script directory, the modules are not
+        imported
+
+        :return: protocolModules: Dictionary - protocol: module name
+        """
+
+        with qcRegistryClass.lock:
+            if qcRegistryClass.protocolModules is None:
+                moduleDir = os.path.dirname(os.path.abspath(__file__))
+                protocolModules = {}
+                modulePattern = os.path.join(moduleDir, f'{qcRegistryClass.protocolModulePrefix}*.py')
+                for modulePath in sorted(glob.glob(modulePattern)):
+                    moduleName = os.path.splitext(os.path.basename(modulePath))[0]
+                    protocol = moduleName[len(qcRegistryClass.protocolModulePrefix):]
+                    protocolModules[qcRegistryClass.protocolKey(protocol)] = moduleName
+                qcRegistryClass.protocolModules = protocolModules
+
+            return qcRegistryClass.protocolModules
+
+    def loadProtocol(protocol):
+        """
+        Import the protocol module on first use (registering the protocol class and checks) and return the protocol
+        class
+
+        :param protocol: Name of the Protocol (e.g. 'SNPLPORE')
+
+        :return: protocolClass: Registered protocol class, None if no protocol module is defined for the protocol
+        """
+
+        protocolKey = qcRegistryClass.protocolKey(protocol)
+        with qcRegistryClass.lock:
+            if protocolKey not in qcRegistryClass.protocols:
+                moduleName = qcRegistryClass.discoverProtocols().get(protocolKey)
+                if moduleName is None:
+                    return None
+                importlib.import_module(moduleName)
+
+            return qcRegistryClass.protocols.get(protocolKey)
+
+    def getCheck(protocol, queryName):
+        """
+        Registered check for the query name
+
+        :param protocol: Name of the Protocol (e.g. 'SNPLPORE')
+        :param queryName: Query name of the check - 'QueryName' in 'tbl_QCQueries'
+
+        :return: checkSpec: qcCheckSpecClass instance, None if no check is registered for the query name
+        """
+
+        return qcRegistryClass.protocolChecks(protocol).get(queryName)
+
+    def protocolChecks(protocol):
+        """
+        Registered checks of the protocol, the protocol module is imported if not already
+
+        :param protocol: Name of the Protocol (e.g. 'SNPLPORE')
+
+        :return: checks: Dictionary - query name: qcCheckSpecClass
+        """
+
+        qcRegistryClass.loadProtocol(protocol)
+
+        return qcRegistryClass.checks.get(qcRegistryClass.protocolKey(protocol), {})
+
+    def validateChecks(protocol, querySpecs):
+        """
+        Compare the registered check metadata with the query definitions read from 'tbl_QCQueries' - the registered
+        flag table must match 'FlagTable' and the 'FlagTable' must be read by the check (tables read, queries resolved
+        via the protocol 'queryTables'), else the write ordering and incremental fingerprints do not cover the table
+        the flags are applied to.  'tbl_QCQueries' is used for the run.
+
+        :param protocol: Name of the Protocol (e.g. 'SNPLPORE')
+        :param querySpecs: Dictionary - query name: query definition (QC_Checks.qcQuerySpecClass)
+
+        :return: mismatches: List of mismatch messages, empty if the metadata agrees
+        """
+
+        protocolChecks = qcRegistryClass.protocolChecks(protocol)
+        queryTables = getattr(qcRegistryClass.protocols.get(qcRegistryClass.protocolKey(protocol)), 'queryTables', {})
+
+        mismatches = []
+        for queryName, querySpec in querySpecs.items():
+            checkSpec = protocolChecks.get(queryName)
+            if checkSpec is None or not checkSpec.appliesFlags:
+                continue
+
+            if checkSpec.flagTable != querySpec.flagTable:
+                mismatches.append(f"QC check '{queryName}' is registered with flag table {checkSpec.flagTable}, "
+                                  f"tbl_QCQueries FlagTable is {querySpec.flagTable}")
+
+            tablesRead = set()
+            for tableName in checkSpec.tablesRead:
+                tablesRead.add(tableName)
+                tablesRead.update(queryTables.get(tableName, ()))
+            if querySpec.flagTable is not None and querySpec.flagTable not in tablesRead:
+                mismatches.append(f"QC check '{queryName}' tbl_QCQueries FlagTable {querySpec.flagTable} is not in "
+                                  f"the registered tables read {checkSpec.tablesRead}")
+
+        return mismatches
+
+if __name__ == "__name__":
+    logger.info("Running QC_Registry.py")
@@ -0,0 +1,203 @@
+"""
+QC_Scheduler.py
+Scheduler for the QC checks of a protocol.  The checks defined in 'tbl_QCQueries' are run concurrently on a bounded
+worker pool (--jobs), ordered by their write groups and any declared check dependencies.
+
+Ordering:
+ - Check dependencies: a check declaring 'dependsOn' (registered check metadata, QC_Registry.py) runs after those
+   checks have finished.  No SNPLPORE check declares one - each check pushes the sub queries (e.g. 'qasub_j162_...')
+   it reads itself, and all checks read the yearly filter query (e.g. 'qsel_QA_Control') which is pushed before the
+   checks are scheduled.
+ - Write order: checks applying flags to the same table (registered flag table) form a write group.  The flag write
+   phase of a check ('writeTurn') waits on the write phase of the previous check in the group, keeping the flag values
+   (e.g. 'DFO;LESPC') identical to a sequential run.  The remaining work of the checks (building and pushing the
+   queries, record counts) runs concurrently, the 'tbl_QA_Results' summaries are written once all checks have run.
+
+A check is only submitted to the pool once its check dependencies have finished and the previous check in its write
+group has been submitted, a worker waiting on a write turn is therefore always waiting on a check already running.
+
+Errors: any exception of a check (the protocol 'processQuery' logs and raises the check error, SystemExit included)
+stops the run - no further checks are submitted, the submitted checks not yet started are cancelled and the error is
+raised in the calling thread once the running checks have finished.
+"""
+import logging
+import threading
+from time import perf_counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+class qcSchedulerClass:
+    """
+    QC checks of a run, runs the checks in write group and dependency order on 'jobs' worker threads
+    """
+
+    def __init__(self, checkNames, dependencies=None, writeGroups=None, jobs=1):
+        """
+        Define the instantiated scheduler attributes
+
+        :param checkNames: List of the QC check names in processing order (i.e. 'tbl_QCQueries' order)
+        :param dependencies: Dictionary - check name: sequence of check names which must finish before the check
+         starts.  Dependencies on checks not in 'checkNames' are ignored.
+        :param writeGroups: Dictionary - check name: write group (e.g. flag table), checks in the same group run their
+         write phase in 'checkNames' order.  Checks without a group (None) are not ordered.
+        :param jobs: Maximum number of checks run concurrently
+
+        :return: instantiated self object
+        """
+
+        self.checkNames = list(checkNames)
+        self.jobs = max(1, int(jobs))
+
+        dependencies = dependencies or {}
+        self.dependencies = {checkName: set(dependencies.get(checkName, ())) & set(self.checkNames)
+                             for checkName in self.checkNames}
+
+        # Previous check in the same write group - check name: check name or None
+        writeGroups = writeGroups or {}
+        self.writePredecessor = {}
+        lastInGroup = {}
+        for checkName in self.checkNames:
+            writeGroup = writeGroups.get(checkName)
+            self.writePredecessor[checkName] = lastInGroup.get(writeGroup) if writeGroup is not None else None
+            if writeGroup is not None:
+                lastInGroup[writeGroup] = checkName
+
+        # Set once the write phase of the check has finished (or the check ended without reaching it or was cancelled)
+        self.writeDone = {checkName: threading.Event() for checkName in self.checkNames}
+
+        # Set once a check has failed
+        self.failed = threading.Event()
+
+        # Check name: elapsed seconds, per processed check
+        self.checkSeconds = {}
+
+        self.runOrder = qcSchedulerClass.topologicalOrder(self.checkNames, self.dependencies)
+
+    def topologicalOrder(checkNames, dependencies):
+        """
+        Order the checks so each check follows its dependencies, otherwise retaining the 'checkNames' order
+
+        :param checkNames: List of the QC check names in processing order
+        :param dependencies: Dictionary - check name: set of check names which must finish before the check
+
+        :return: runOrder: List of the check names in dependency order
+        """
+
+        runOrder = []
+        placed = set()
+        remaining = list(checkNames)
+        while remaining:
+            readyName = next((checkName for checkName in remaining if dependencies[checkName] <= placed), None)
+            if readyName is None:
+                raise ValueError(f'Circular QC check dependencies between - {", ".join(remaining)}')
+            runOrder.append(readyName)
+            placed.add(readyName)
+            remaining.remove(readyName)
+
+        return runOrder
+
+    @contextmanager
+    def writeTurn(self, checkName):
+        """
+        Context manager for the write phase of a check - waits until the previous check in the write group has
+        finished its write phase, the turn is passed on when the block exits (including on error)
+
+        :param checkName: Name of the check
+
+        :return:
+        """
+
+        predecessor = self.writePredecessor.get(checkName)
+        if predecessor is not None:
+            self.writeDone[predecessor].wait()
+        try:
+            yield
+        finally:
+            self.writeDone[checkName].set()
+
+    def runCheck(self, checkName, checkFunction):
+        """
+        Run the check function and record the elapsed time, the write turn is released if the check did not reach
+        or failed before its write phase.  Any exception (including SystemExit) marks the run as failed and is raised.
+
+        :param checkName: Name of the check
+        :param checkFunction: Function called with the check name
+
+        :return:
+        """
+
+        startTime = perf_counter()
+        try:
+            checkFunction(checkName)
+        except BaseException:
+            self.failed.set()
+            raise
+        finally:
+            self.writeDone[checkName].set()
+            self.checkSeconds[checkName] = perf_counter() - startTime
+
+    def run(self, checkFunction):
+        """
+        Run all checks, sequentially in the calling thread if 'jobs' is 1 else on a pool of 'jobs' worker threads.
+        After a check fails (any exception, including SystemExit) no further checks are started, the submitted checks
+        not yet started are cancelled, the checks already running are finished and the error is raised.
+
+        :param checkFunction: Function called with the check name, processes the check
+
+        :return: runSeconds: Wall time in seconds for all checks
+        """
+
+        startTime = perf_counter()
+
+        if self.jobs == 1:
+            for checkName in self.runOrder:
+                self.runCheck(checkName, checkFunction)
+            return perf_counter() - startTime
+
+        pending = list(self.runOrder)
+        submitted = set()
+        finished = set()
+        running = {}
+        firstError = None
+        with ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix='QCCheck') as executor:
+            while pending or running:
+                # Submit the ready checks - dependencies finished and write predecessor submitted
+                if firstError is None:
+                    for checkName in list(pending):
+                        predecessor = self.writePredecessor[checkName]
+                        if self.dependencies[checkName] <= finished and (predecessor is None or
+                                                                         predecessor in submitted):
+                            future = executor.submit(self.runCheck, checkName, checkFunction)
+                            running[future] = checkName
+                            submitted.add(checkName)
+                            pending.remove(checkName)
+                else:
+                    pending = []
+
+                if not running:
+                    break
+
+                doneFutures, notDone = wait(running, return_when=FIRST_COMPLETED)
+                for future in doneFutures:
+                    checkName = running.pop(future)
+                    finished.add(checkName)
+                    if future.cancelled():
+                        continue
+                    error = future.exception()
+                    if error is not None and firstError is None:
+                        firstError = error
+                        # Cancel the checks waiting for a worker, their write turn is released for the checks
+                        # already running in the same write group
+                        for queuedFuture, queuedName in running.items():
+                            if queuedFuture.cancel():
+                                self.writeDone[queuedName].set()
+
+        if firstError is not None:
+            raise firstError
+
+        return perf_counter() - startTime
+
+if __name__ == "__name__":
+    logger.info("Running QC_Scheduler.py")
@@ -0,0 +1,266 @@
+"""
+QC_Snapshot.py
+Year scoped snapshot cache of the backend tables on local disk ('snapshotCache' parameter in SFAN_AccessQCChecks.py or
+--snapshot-cache on the command line).  The tables read by the in-memory evaluation engine (QC_Engine.py), subset to the
+events of the year, are written to a local columnar file (Parquet if pyarrow is installed, else pickle) and read from
+the local file on the following runs for the year rather than from the (network) backend database.
+
+Snapshots are keyed by the backend path, year, table, the events of the year and the change stamp of the table
+(generalDMClass.tableChangeStamp - row count, maximum 'Updated_Date', QC flag field lengths).  A changed stamp or event
+set invalidates the snapshot, snapshots older than 'maxAgeHours' are refreshed (edits not setting 'Updated_Date') and
+the least recently used snapshots are evicted once the cache exceeds 'maxCacheBytes'.  The last use of each snapshot is
+recorded in the cache index file ('snapshotIndex.json') - file access times are not maintained on most Windows volumes.
+"""
+import os
+import json
+import hashlib
+import threading
+import logging
+import tempfile
+import importlib.util
+from time import time
+import generalDM as dm
+from lazyImports import lazyModuleClass
+
+# pandas is imported on first use
+pd = lazyModuleClass('pandas')
+
+logger = logging.getLogger(__name__)
+
+class qcSnapshotClass:
+    """
+    Local snapshot cache of the backend tables for one backend database and year
+    """
+
+    # Local cache directory - can be set in SFAN_AccessQCChecks.py ('snapshotDir')
+    cacheDir = os.path.join(tempfile.gettempdir(), 'SFAN_QC_Snapshots')
+    # Maximum size of the cache directory, least recently used snapshots are evicted above
+    maxCacheBytes = 1024 ** 3
+    # Maximum age of a snapshot in hours before it is read again from the backend
+    maxAgeHours = 24
+    # Cache index - snapshot file name: last use time (epoch seconds), ranks the snapshots for the eviction
+    indexFile = 'snapshotIndex.json'
+    indexLock = threading.Lock()
+
+    def __init__(self, inDBBE, yearLU):
+        """
+        Define the instantiated snapshot cache attributes
+
+        :param inDBBE: Protocol Backend Access database full path
+        :param yearLU: Year being processed
+
+        :return: instantiated self object
+        """
+
+        self.inDBBE = inDBBE
+        self.yearLU = yearLU
+        self.fileFormat = 'parquet' if importlib.util.find_spec('pyarrow') is not None else 'pickle'
+        self.cacheHits = 0
+        self.cacheMisses = 0
+
+    def keyHash(*values):
+        """
+        Short hash of the key values
+
+        :param values: Key values, converted to strings
+
+        :return: hash: Hexadecimal string
+        """
+
+        return hashlib.sha1('|'.join(str(value) for value in values).encode('utf-8')).hexdigest()[:16]
+
+    def snapshotPrefix(self, tableName):
+        """
+        File name prefix of the snapshots of a table for the backend database and year
+
+        :param tableName: Name of the table
+
+        :return: prefix: File name prefix
+        """
+
+        dbPath = os.path.normcase(os.path.abspath(self.inDBBE))
+
+        return f'{tableName}_{qcSnapshotClass.keyHash(dbPath, self.yearLU)}_'
+
+    def readTable(self, tableName, readFun, scope=None, dmInstance=None):
+        """
+        Table dataframe from the local snapshot if current, else read via 'readFun' and written to the snapshot cache.
+        If the change stamp is not available the table is read without the cache.
+
+        :param tableName: Name of the table
+        :param readFun: Function without arguments returning the table dataframe read from the backend
+        :param scope: Values the table is subset to (e.g. the Event_IDs of the year), part of the snapshot key
+        :param dmInstance: Data Management Instance, optional
+
+        :return: tableDF: Table dataframe
+        """
+
+        try:
+            changeStamp = dm.generalDMClass.tableChangeStamp(tableName, self.inDBBE)
+        except Exception as e:
+            logMsg = f'WARNING - No change stamp for table - {tableName} - snapshot cache not used: {e}'
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.warning(logMsg)
+            return readFun()
+
+        scopeHash = qcSnapshotClass.keyHash(*sorted(str(value) for value in scope)) if scope is not None else ''
+        prefix = self.snapshotPrefix(tableName)
+        extension = 'parquet' if self.fileFormat == 'parquet' else 'pkl'
+        snapshotFile = os.path.join(qcSnapshotClass.cacheDir,
+                                    f'{prefix}{qcSnapshotClass.keyHash(changeStamp, scopeHash)}.{extension}')
+
+        maxAgeSeconds = qcSnapshotClass.maxAgeHours * 3600
+        if os.path.exists(snapshotFile) and time() - os.path.getmtime(snapshotFile) < maxAgeSeconds:
+            try:
+                tableDF = self.readSnapshot(snapshotFile)
+                qcSnapshotClass.recordUse(os.path.basename(snapshotFile))
+                self.cacheHits += 1
+                return tableDF
+            except Exception as e:
+                logMsg = f'WARNING - Snapshot of table - {tableName} - not readable, reading the backend: {e}'
+                dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+                logging.warning(logMsg)
+
+        tableDF = readFun()
+        self.cacheMisses += 1
+
+        try:
+            os.makedirs(qcSnapshotClass.cacheDir, exist_ok=True)
+            # Written to a temporary file and renamed, a concurrent reader never sees a partial snapshot
+            tempFile = f'{snapshotFile}.{os.getpid()}.tmp'
+            self.writeSnapshot(tableDF, tempFile)
+            os.replace(tempFile, snapshotFile)
+
+            # Invalidated snapshots of the table for the backend and year
+            for fileName in os.listdir(qcSnapshotClass.cacheDir):
+                filePath = os.path.join(qcSnapshotClass.cacheDir, fileName)
+                if fileName.startswith(prefix) and filePath != snapshotFile and not fileName.endswith('.tmp'):
+                    os.remove(filePath)
+
+            qcSnapshotClass.recordUse(os.path.basename(snapshotFile))
+            qcSnapshotClass.evict()
+
+        except Exception as e:
+            logMsg = f'WARNING - Snapshot of table - {tableName} - not written: {e}'
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.warning(logMsg)
+
+        return tableDF
+
+    def readSnapshot(self, snapshotFile):
+        """
+        Read a snapshot file
+
+        :param snapshotFile: Full path of the snapshot file
+
+        :return: tableDF: Table dataframe
+        """
+
+        if self.fileFormat == 'parquet':
+            return pd.read_parquet(snapshotFile, engine='pyarrow')
+
+        return pd.read_pickle(snapshotFile)
+
+    def writeSnapshot(self, tableDF, snapshotFile):
+        """
+        Write a snapshot file
+
+        :param tableDF: Table dataframe
+        :param snapshotFile: Full path of the snapshot file
+
+        :return:
+        """
+
+        if self.fileFormat == 'parquet':
+            tableDF.to_parquet(snapshotFile, engine='pyarrow')
+        else:
+            tableDF.to_pickle(snapshotFile)
+
+    def readIndex():
+        """
+        Read the cache index
+
+        :return: index: Dictionary - snapshot file name: last use time, empty if the index is missing or not readable
+        """
+
+        try:
+            with open(os.path.join(qcSnapshotClass.cacheDir, qcSnapshotClass.indexFile)) as indexFile:
+                index = json.load(indexFile)
+        except (OSError, ValueError):
+            return {}
+
+        return index if isinstance(index, dict) else {}
+
+    def writeIndex(index):
+        """
+        Write the cache index - written to a temporary file and renamed
+
+        :param index: Dictionary - snapshot file name: last use time
+
+        :return:
+        """
+
+        indexPath = os.path.join(qcSnapshotClass.cacheDir, qcSnapshotClass.indexFile)
+        tempFile = f'{indexPath}.{os.getpid()}.tmp'
+        with open(tempFile, 'w') as indexFile:
+            json.dump(index, indexFile)
+        os.replace(tempFile, indexPath)
+
+    def recordUse(fileName):
+        """
+        Record the use (read or write) of a snapshot in the cache index
+
+        :param fileName: Snapshot file name
+
+        :return:
+        """
+
+        with qcSnapshotClass.indexLock:
+            index = qcSnapshotClass.readIndex()
+            index[fileName] = time()
+            qcSnapshotClass.writeIndex(index)
+
+    def evict():
+        """
+        Delete the least recently used snapshots (last use in the cache index, the file modification time if not in the
+        index) until the cache directory is within 'maxCacheBytes'.  Index entries of deleted snapshots are dropped.
+
+        :return: evicted: Number of snapshots deleted
+        """
+
+        with qcSnapshotClass.indexLock:
+            index = qcSnapshotClass.readIndex()
+            snapshots = []
+            for fileName in os.listdir(qcSnapshotClass.cacheDir):
+                filePath = os.path.join(qcSnapshotClass.cacheDir, fileName)
+                if os.path.isfile(filePath) and not fileName.endswith('.tmp') and fileName != qcSnapshotClass.indexFile:
+                    fileStat = os.stat(filePath)
+                    snapshots.append((index.get(fileName, fileStat.st_mtime), fileStat.st_size, fileName))
+
+            cacheBytes = sum(fileSize for _, fileSize, _ in snapshots)
+            evicted = 0
+            for _, fileSize, fileName in sorted(snapshots):
+                if cacheBytes <= qcSnapshotClass.maxCacheBytes:
+                    break
+                os.remove(os.path.join(qcSnapshotClass.cacheDir, fileName))
+                cacheBytes -= fileSize
+                evicted += 1
+
+            cachedFiles = {fileName for _, _, fileName in snapshots}
+            qcSnapshotClass.writeIndex({fileName: lastUse for fileName, lastUse in index.items() if fileName in
+                                        cachedFiles and os.path.exists(os.path.join(qcSnapshotClass.cacheDir,
+                                                                                    fileName))})
+
+        return evicted
+
+    def cacheStats(self):
+        """
+        Snapshot cache usage of the run
+
+        :return: statsDic: Dictionary with the snapshot hits and misses
+        """
+
+        return {'snapshotHits': self.cacheHits, 'snapshotMisses': self.cacheMisses}
+
+if __name__ == "__name__":
+    logger.info("Running QC_Snapshot.py")
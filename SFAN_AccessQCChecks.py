@@ -13,16 +13,22 @@ Created By - Kirk Sherrill - Data Scientist/Manager San Francisco Bay Area Netwo
 """
 
 # Import Libraries
-import pandas as pd
-import pyodbc
 import sys
 import os
+import argparse
 import traceback
 from datetime import datetime
 import QC_Checks as qc
 import generalDM as dm
+import dbBackends as dbb
+import QC_Snapshot as qsn
+import QC_Batch as qcb
 import logging
 import log_config  # Import the logging configuration
+from lazyImports import lazyModuleClass
+
+# pandas is imported on first use, pyodbc/pywin32 are imported by the Access backend when first used
+pd = lazyModuleClass('pandas')
 
 # Get the logger
 logger = logging.getLogger(__name__)
@@ -35,8 +41,37 @@ inDBBE = r'C:\Users\KSherrill\OneDrive - DOI\SFAN\VitalSigns\SnowyPlovers_PORE\S
 inDBFE = r'C:\Users\KSherrill\OneDrive - DOI\SFAN\VitalSigns\SnowyPlovers_PORE\SNPLOVER\SNPL_IM\Data\Database\PORE_SNPL_FrontEnd_20241219.accdb'
 # Year Being Processed
 inYear = 2023
+# Database backend (Access|SQLite). SQLite runs the workflow against a local SQLite copy of the protocol databases
+# (e.g. for profiling/benchmarking off Windows), the Front End and Back End paths both resolve to 'inDBSQLite'
+dbBackend = 'Access'
+# SQLite database used when dbBackend = 'SQLite'
+inDBSQLite = r'C:\Users\KSherrill\OneDrive - DOI\SFAN\VitalSigns\SnowyPlovers_PORE\SNPLOVER\SNPL_IM\Data\Database\PORE_SNPL.sqlite'
 # NPS User Name of person running the QC script.  This will be populated in the 'QA_USer' field of the 'tbl_QA_Results
 inUser = 'ksherrill'
+# Number of QC checks processed concurrently (QC_Scheduler.py), 1 processes the checks sequentially. Can be overridden
+# on the command line (--jobs)
+jobs = 1
+# Incremental mode - QC checks whose source tables are unchanged since the last run for the year are skipped and their
+# 'tbl_QA_Results' record reused (QC_Incremental.py). Can be set on the command line (--incremental)
+incremental = False
+# QC evaluation engine (sql|pandas). 'pandas' reads the source tables of the year once and evaluates the QC checks in
+# memory (QC_Engine.py), the QC queries are still pushed to the Front End. Can be set on the command line (--engine)
+engine = 'sql'
+# With engine 'pandas' compare each engine result with the pushed QC query, the QC query is used on a mismatch. Can be
+# set on the command line (--engine-parity)
+engineParity = False
+# With engine 'pandas' cache the tables of the year as local snapshots, unchanged tables are read from the snapshots on
+# the following runs (QC_Snapshot.py). Can be set on the command line (--snapshot-cache)
+snapshotCache = False
+# Local snapshot cache directory, None uses the temp directory
+snapshotDir = None
+# Multi-year batch mode - year range processed in one run (e.g. '2019-2023' or '2019,2021'), sharing the database
+# session and 'tbl_QCQueries' (QC_Batch.py). None processes 'inYear'. Can be set on the command line (--years)
+batchYears = None
+# Maximum number of flagged keys applied with keyed 'IN' list updates, larger key sets use the temp table join update.
+# None uses the QC_Checks default (200), which is not tuned for Access - run QC_Benchmarks.py against a scratch copy of
+# the Access Back End to choose a value. Can be set on the command line (--flag-keyed-max-keys)
+flagKeyedMaxKeys = None
 
 # Output Name, OutDir, Workspace and Logfile Name
 outDir = r'C:\Users\KSherrill\OneDrive - DOI\SFAN\VitalSigns\SnowyPlovers_PORE\SNPLOVER\SNPL_IM\Data\QC'  # Directory Output Location
@@ -53,37 +88,74 @@ def main():
         # Set option in pandas to not allow chaining (views) of dataframes, instead force copy to be performed.
         pd.options.mode.copy_on_write = True
 
-        #Close any open Access Databases on the computer
-        outClose = dm.generalDMClass.closeAccessDB()
-
-        ###############
-        # Define the qcCheckInstance and dmInstance instances
-        ################
-
-        # Create the qcChecks instance
-        qcCheckInstance = qc.qcChecks(protocol=protocol, inDBBE=inDBBE, inDBFE=inDBFE, yearLU= inYear, inUser = inUser)
-
-        # Print out the name space of the instance
-        print(qcCheckInstance.__dict__)
+        # Define the database backend for the run
+        if dbBackend == 'SQLite':
+            dm.generalDMClass.setBackend(dbb.sqliteBackendClass(defaultDB=inDBSQLite))
+        else:
+            #Close the Access sessions holding the protocol Front End/Back End databases open
+            outClose = dm.generalDMClass.closeAccessDB(dbPaths=[inDBFE, inDBBE])
 
-        # Logfile will be saved in the workspace directory which is child of the fileDir - this is in addition to the
-        # logger file 'ScriptProcessingError.log being created by the 'logger' configuration file via python.
-        logFile = dm.generalDMClass.createLogFile(logFilePrefix=outName, workspaceParent=outDir)
+        # Local snapshot cache directory (snapshotCache)
+        if snapshotDir is not None:
+            qsn.qcSnapshotClass.cacheDir = snapshotDir
 
-        # Create the data management instance to  be used to define the logfile path and other general DM attributes
-        dmInstance = dm.generalDMClass(logFile)
+        # Keyed flag update threshold (flagKeyedMaxKeys)
+        if flagKeyedMaxKeys is not None:
+            qc.qcChecks.flagKeyedMaxKeys = flagKeyedMaxKeys
 
         ###############
-        # Proceed to the Workflow to process the defined data validation routines
+        # Define the qcCheckInstance and dmInstance instances
         ################
 
-        # Go to QC Processing Routines
-        qc.qcChecks.process_QCRequest(qcCheckInstance=qcCheckInstance, dmInstance=dmInstance)
+        # Multi-year batch mode - one log file for the batch
+        processed = True
+        if batchYears is not None:
+            years = qcb.qcBatchClass.parseYears(batchYears)
+            logFile = dm.generalDMClass.createLogFile(logFilePrefix=f'{protocol}_{years[0]}_{years[-1]}',
+                                                      workspaceParent=outDir)
+            dmInstance = dm.generalDMClass(logFile)
+
+            # Go to QC Processing Routines for all years of the batch
+            qcBatchInstance = qcb.qcBatchClass(protocol=protocol, inDBBE=inDBBE, inDBFE=inDBFE, years=years,
+                                               inUser=inUser)
+            qcBatchInstance.run(dmInstance, jobs=jobs, incremental=incremental, engine=engine,
+                                engineParity=engineParity, snapshotCache=snapshotCache)
+            processed = not qcBatchInstance.failedYears
+
+        else:
+            # Create the qcChecks instance
+            qcCheckInstance = qc.qcChecks(protocol=protocol, inDBBE=inDBBE, inDBFE=inDBFE, yearLU= inYear,
+                                          inUser = inUser)
+
+            # Print out the name space of the instance
+            print(qcCheckInstance.__dict__)
+
+            # Logfile will be saved in the workspace directory which is child of the fileDir - this is in addition to
+            # the logger file 'ScriptProcessingError.log being created by the 'logger' configuration file via python.
+            logFile = dm.generalDMClass.createLogFile(logFilePrefix=outName, workspaceParent=outDir)
+
+            # Create the data management instance to  be used to define the logfile path and other general DM
+            # attributes
+            dmInstance = dm.generalDMClass(logFile)
+
+            ###############
+            # Proceed to the Workflow to process the defined data validation routines
+            ################
+
+            # Go to QC Processing Routines
+            processed = qc.qcChecks.process_QCRequest(qcCheckInstance=qcCheckInstance, dmInstance=dmInstance,
+                                                      jobs=jobs, incremental=incremental, engine=engine,
+                                                      engineParity=engineParity, snapshotCache=snapshotCache)
 
         # Message Script Completed
-        logMsg = f'Successfully Finished All QC Checks for - {protocol}'
-        dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
-        logging.info(logMsg)
+        if processed:
+            logMsg = f'Successfully Finished All QC Checks for - {protocol}'
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.info(logMsg)
+        else:
+            logMsg = f'ERROR - QC Checks for - {protocol} - stopped on an error, see the logfile'
+            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.critical(logMsg)
 
     except Exception as e:
 
@@ -93,6 +165,9 @@ def main():
         traceback.print_exc(file=sys.stdout)
 
     finally:
+        # Close the pooled ODBC connections, reports the number of connects saved by the pool
+        logMsg = dm.generalDMClass.closeConnections()
+        print(logMsg)
         exit()
 
 def timeFun():
@@ -107,6 +182,30 @@ def timeFun():
 
 if __name__ == '__main__':
 
+    # Command line overrides of the script parameters
+    parser = argparse.ArgumentParser(description='SFAN Access QC Checks')
+    parser.add_argument('--jobs', type=int, default=jobs, help='Number of QC checks processed concurrently')
+    parser.add_argument('--incremental', action='store_true', default=incremental,
+                        help='Only re-run QC checks whose source tables changed since the last run for the year')
+    parser.add_argument('--engine', choices=['sql', 'pandas'], default=engine,
+                        help='Evaluate the QC checks from the pushed QC queries (sql) or in memory (pandas)')
+    parser.add_argument('--engine-parity', action='store_true', default=engineParity,
+                        help='Compare the in memory QC check results with the pushed QC queries')
+    parser.add_argument('--snapshot-cache', action='store_true', default=snapshotCache,
+                        help='Read unchanged tables of the year from the local snapshot cache (engine pandas)')
+    parser.add_argument('--years', default=batchYears,
+                        help="Process a range of years in one run, e.g. '2019-2023' or '2019,2021' (batch mode)")
+    parser.add_argument('--flag-keyed-max-keys', type=int, default=flagKeyedMaxKeys,
+                        help='Maximum number of flagged keys applied with keyed updates (default 200, not tuned)')
+    args = parser.parse_args()
+    jobs = args.jobs
+    incremental = args.incremental
+    engine = args.engine
+    engineParity = args.engine_parity
+    snapshotCache = args.snapshot_cache
+    batchYears = args.years
+    flagKeyedMaxKeys = args.flag_keyed_max_keys
+
     #################################
     # Checking for Out Directories and Log File
     ##################################
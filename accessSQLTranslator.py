@@ -0,0 +1,395 @@
+"""
+accessSQLTranslator.py
+Translation of Access (Jet/ACE) SQL as written in the QC check routines to SQLite SQL, allowing the check SQL to be
+executed by the SQLite reference backend (dbBackends.sqliteBackendClass).  Translated statements are cached keyed by
+the source SQL.
+
+Constructs translated:
+Bracketed identifiers [Field] - "Field"
+Double quoted string literals "abc" - 'abc'
+Date literals #mm/dd/yy hh:nn:ss# - 'yyyy-mm-dd hh:nn:ss'
+String concatenation & - ||
+IIf(c, a, b) - CASE WHEN c THEN a ELSE b END
+IsNull(x) - (x IS NULL)
+Nz(x, y) - COALESCE(x, y)
+Year/Month/Day(x) - CAST(strftime(...) AS INTEGER)
+Len(x) - length(x)
+InStr(x, y) - instr(upper(x), upper(y)) (Access text comparison is case insensitive)
+= True - <> 0 (Access stores True as -1)
+UPDATE a INNER JOIN b ON cond SET b.f = ... - UPDATE b SET f = ... FROM a WHERE cond
+UPDATE t SET t.f = ... - UPDATE t SET f = ...
+
+Functions without a SQLite equivalent (e.g. DateDiff, which counts interval boundaries crossed) are passed through and
+are registered as SQLite functions by the SQLite backend.
+"""
+import re
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+class accessSQLTranslatorClass:
+    """
+    Access SQL to SQLite SQL translator with a cache of translated statements keyed by the source SQL
+    """
+
+    # Tokenizer - string literals, bracketed identifiers, date literals, words, numbers, whitespace and punctuation
+    tokenPattern = re.compile(r"""
+        (?P<string>'(?:[^']|'')*')
+        |(?P<dstring>"(?:[^"]|"")*")
+        |(?P<bracket>\[[^\]]*\])
+        |(?P<date>\#[^\#]*\#)
+        |(?P<word>[A-Za-z_][A-Za-z0-9_]*)
+        |(?P<number>\d+(?:\.\d+)?)
+        |(?P<space>\s+)
+        |(?P<op><>|<=|>=|\|\||.)
+        """, re.VERBOSE | re.DOTALL)
+
+    # Formats accepted for the Access #date# literals
+    dateFormats = ['%m/%d/%y %H:%M:%S', '%m/%d/%Y %H:%M:%S', '%m/%d/%y %H:%M', '%m/%d/%Y %H:%M', '%m/%d/%y',
+                   '%m/%d/%Y', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
+
+    # Access functions rewritten to SQLite expressions
+    translatedFunctions = ('IIF', 'ISNULL', 'NZ', 'YEAR', 'MONTH', 'DAY', 'LEN', 'INSTR')
+
+    def __init__(self):
+        """
+        Define the instantiated translator attributes
+
+        :return: instantiated self object
+        """
+
+        # Dictionary of source SQL - translated SQL
+        self.translationCache = {}
+        self.lock = threading.Lock()
+        self.cacheHits = 0
+        self.cacheMisses = 0
+
+    def translate(self, sql):
+        """
+        Translate the passed Access SQL statement, returning the cached translation if previously translated
+
+        :param sql: Access SQL statement
+
+        :return: translatedSQL: SQLite SQL statement
+        """
+
+        with self.lock:
+            translatedSQL = self.translationCache.get(sql)
+            if translatedSQL is not None:
+                self.cacheHits += 1
+                return translatedSQL
+
+        translatedSQL = accessSQLTranslatorClass.translateStatement(sql)
+
+        with self.lock:
+            self.translationCache[sql] = translatedSQL
+            self.cacheMisses += 1
+
+        return translatedSQL
+
+    def cacheStats(self):
+        """
+        Translation cache usage
+
+        :return: statsDic: Dictionary with the cached statements, hits and misses
+        """
+
+        with self.lock:
+            statsDic = {'cachedStatements': len(self.translationCache), 'cacheHits': self.cacheHits,
+                        'cacheMisses': self.cacheMisses}
+
+        return statsDic
+
+    def tokenize(sql):
+        """
+        Split the SQL into (kind, text) tokens
+
+        :param sql: SQL statement
+
+        :return: tokens: list of (kind, text) tuples
+        """
+
+        tokens = []
+        for match in accessSQLTranslatorClass.tokenPattern.finditer(sql):
+            tokens.append((match.lastgroup, match.group()))
+
+        return tokens
+
+    def isWord(token, word):
+        return token[0] == 'word' and token[1].upper() == word
+
+    def nextSignificant(tokens, index):
+        """
+        Index of the next non whitespace token at or after 'index', len(tokens) if none
+        """
+
+        while index < len(tokens) and tokens[index][0] == 'space':
+            index += 1
+        return index
+
+    def splitArguments(tokens, openIndex):
+        """
+        Split the function arguments starting at the '(' token at 'openIndex' on the top level commas
+
+        :param tokens: list of tokens
+        :param openIndex: index of the opening parenthesis
+
+        :return: arguments: list of token lists, closeIndex: index of the closing parenthesis
+        """
+
+        arguments = [[]]
+        depth = 0
+        index = openIndex
+        while index < len(tokens):
+            kind, text = tokens[index]
+            if text == '(':
+                depth += 1
+                if depth > 1:
+                    arguments[-1].append(tokens[index])
+            elif text == ')':
+                depth -= 1
+                if depth == 0:
+                    return arguments, index
+                arguments[-1].append(tokens[index])
+            elif text == ',' and depth == 1:
+                arguments.append([])
+            else:
+                arguments[-1].append(tokens[index])
+            index += 1
+
+        raise ValueError('Unbalanced parenthesis in SQL function call')
+
+    def dateLiteral(text):
+        """
+        Convert an Access #date# literal to a quoted ISO date string
+        """
+
+        value = text.strip('#').strip()
+        for dateFormat in accessSQLTranslatorClass.dateFormats:
+            try:
+                dateValue = datetime.strptime(value, dateFormat)
+                return f"'{dateValue.isoformat(sep=' ')}'"
+            except ValueError:
+                continue
+
+        raise ValueError(f'Unrecognized Access date literal - {text}')
+
+    def translateFunction(name, arguments):
+        """
+        Translate an Access function call, arguments are already translated
+
+        :param name: Upper case function name
+        :param arguments: list of translated argument strings
+
+        :return: translated SQL expression or None if the function is not translated
+        """
+
+        if name == 'IIF' and len(arguments) == 3:
+            return f"(CASE WHEN {arguments[0]} THEN {arguments[1]} ELSE {arguments[2]} END)"
+        if name == 'ISNULL' and len(arguments) == 1:
+            return f"({arguments[0]} IS NULL)"
+        if name == 'NZ' and len(arguments) in (1, 2):
+            valueIfNull = arguments[1] if len(arguments) == 2 else "0"
+            return f"COALESCE({arguments[0]}, {valueIfNull})"
+        if name in ('YEAR', 'MONTH', 'DAY') and len(arguments) == 1:
+            part = {'YEAR': '%Y', 'MONTH': '%m', 'DAY': '%d'}[name]
+            return f"CAST(strftime('{part}', {arguments[0]}) AS INTEGER)"
+        if name == 'LEN' and len(arguments) == 1:
+            return f"length({arguments[0]})"
+        if name == 'INSTR' and len(arguments) == 2:
+            return f"instr(upper({arguments[0]}), upper({arguments[1]}))"
+        return None
+
+    def translateTokens(tokens):
+        """
+        Translate the passed token list to SQLite SQL
+
+        :param tokens: list of (kind, text) tokens
+
+        :return: translated SQL string
+        """
+
+        outParts = []
+        index = 0
+        while index < len(tokens):
+            kind, text = tokens[index]
+
+            if kind == 'word' and text.upper() in accessSQLTranslatorClass.translatedFunctions:
+                openIndex = accessSQLTranslatorClass.nextSignificant(tokens, index + 1)
+                if openIndex < len(tokens) and tokens[openIndex][1] == '(':
+                    arguments, closeIndex = accessSQLTranslatorClass.splitArguments(tokens, openIndex)
+                    translatedArgs = [accessSQLTranslatorClass.translateTokens(argument).strip() for argument in
+                                      arguments]
+                    translatedCall = accessSQLTranslatorClass.translateFunction(text.upper(), translatedArgs)
+                    if translatedCall is None:
+                        translatedCall = f"{text}({', '.join(translatedArgs)})"
+                    outParts.append(translatedCall)
+                    index = closeIndex + 1
+                    continue
+
+            if kind == 'word':
+                if text.upper() == 'TRUE':
+                    # Access True is -1, compare as not 0
+                    previousParts = [part for part in outParts if part.strip()]
+                    if previousParts and previousParts[-1].strip() == '=':
+                        while not outParts[-1].strip():
+                            outParts.pop()
+                        outParts[-1] = '<>'
+                        outParts.append(' 0')
+                    else:
+                        outParts.append('-1')
+                elif text.upper() == 'FALSE':
+                    outParts.append('0')
+                else:
+                    outParts.append(text)
+
+            elif kind == 'bracket':
+                outParts.append('"' + text[1:-1].replace('"', '""') + '"')
+            elif kind == 'dstring':
+                outParts.append("'" + text[1:-1].replace('""', '"').replace("'", "''") + "'")
+            elif kind == 'date':
+                outParts.append(accessSQLTranslatorClass.dateLiteral(text))
+            elif kind == 'op' and text == '&':
+                outParts.append('||')
+            else:
+                outParts.append(text)
+
+            index += 1
+
+        return ''.join(outParts)
+
+    def topLevelIndexes(tokens):
+        """
+        Dictionary of upper case keyword - list of indexes where the keyword occurs outside of parenthesis
+        """
+
+        keywordIndexes = {}
+        depth = 0
+        for index, (kind, text) in enumerate(tokens):
+            if text == '(':
+                depth += 1
+            elif text == ')':
+                depth -= 1
+            elif kind == 'word' and depth == 0:
+                keywordIndexes.setdefault(text.upper(), []).append(index)
+
+        return keywordIndexes
+
+    def splitTopLevel(tokens, separator):
+        """
+        Split the token list on the top level separator token
+        """
+
+        parts = [[]]
+        depth = 0
+        for token in tokens:
+            if token[1] == '(':
+                depth += 1
+            elif token[1] == ')':
+                depth -= 1
+            if token[1] == separator and depth == 0:
+                parts.append([])
+            else:
+                parts[-1].append(token)
+
+        return parts
+
+    def stripQualifier(tokens):
+        """
+        Strip a 'table.' qualifier from the passed assignment target tokens
+        """
+
+        significant = [token for token in tokens if token[0] != 'space']
+        if len(significant) == 3 and significant[1][1] == '.':
+            return [significant[2]], significant[0][1].strip('[]')
+
+        return significant, None
+
+    def translateUpdate(tokens, keywordIndexes):
+        """
+        Restructure an Access UPDATE statement - joined updates to UPDATE ... FROM ... WHERE and qualified SET targets
+        to unqualified column names.
+
+        :param tokens: list of (kind, text) tokens of the UPDATE statement
+        :param keywordIndexes: top level keyword indexes
+
+        :return: translated SQL string
+        """
+
+        # Drop the statement terminator, re-added to the translated statement
+        while tokens and (tokens[-1][0] == 'space' or tokens[-1][1] == ';'):
+            tokens = tokens[:-1]
+
+        setIndex = keywordIndexes['SET'][0]
+        whereIndexes = [index for index in keywordIndexes.get('WHERE', []) if index > setIndex]
+        whereIndex = whereIndexes[0] if whereIndexes else len(tokens)
+
+        # Strip the qualifier on the assignment targets
+        assignments = []
+        targetTable = None
+        for assignment in accessSQLTranslatorClass.splitTopLevel(tokens[setIndex + 1:whereIndex], ','):
+            equalsIndex = [index for index, token in enumerate(assignment) if token[1] == '='][0]
+            targetTokens, qualifier = accessSQLTranslatorClass.stripQualifier(assignment[:equalsIndex])
+            targetTable = targetTable or qualifier
+            assignments.append(accessSQLTranslatorClass.translateTokens(targetTokens).strip() + ' = ' +
+                               accessSQLTranslatorClass.translateTokens(assignment[equalsIndex + 1:]).strip())
+
+        whereSQL = accessSQLTranslatorClass.translateTokens(tokens[whereIndex + 1:]).strip() \
+            if whereIndex < len(tokens) else ''
+
+        joinIndexes = [index for index in keywordIndexes.get('JOIN', []) if index < setIndex]
+        if not joinIndexes:
+            updateTable = accessSQLTranslatorClass.translateTokens(tokens[1:setIndex]).strip()
+            translatedSQL = f"UPDATE {updateTable} SET {', '.join(assignments)}"
+            if whereSQL:
+                translatedSQL = f"{translatedSQL} WHERE {whereSQL}"
+            return translatedSQL + ';'
+
+        # Joined update - UPDATE a INNER JOIN b ON cond SET ...
+        joinIndex = joinIndexes[0]
+        onIndex = [index for index in keywordIndexes.get('ON', []) if joinIndex < index < setIndex][0]
+        joinTypeIndex = joinIndex - 1
+        while tokens[joinTypeIndex][0] == 'space':
+            joinTypeIndex -= 1
+        if tokens[joinTypeIndex][1].upper() not in ('INNER', 'LEFT', 'RIGHT'):
+            joinTypeIndex = joinIndex
+
+        firstTable = accessSQLTranslatorClass.translateTokens(tokens[1:joinTypeIndex]).strip()
+        secondTable = accessSQLTranslatorClass.translateTokens(tokens[joinIndex + 1:onIndex]).strip()
+        joinCondition = accessSQLTranslatorClass.translateTokens(tokens[onIndex + 1:setIndex]).strip()
+
+        targetQuoted = None if targetTable is None else f'"{targetTable}"'
+        if targetTable is not None and secondTable in (targetTable, targetQuoted):
+            updateTable, fromTable = secondTable, firstTable
+        else:
+            updateTable, fromTable = firstTable, secondTable
+
+        whereClause = f"({joinCondition})"
+        if whereSQL:
+            whereClause = f"{whereClause} AND ({whereSQL})"
+
+        return f"UPDATE {updateTable} SET {', '.join(assignments)} FROM {fromTable} WHERE {whereClause};"
+
+    def translateStatement(sql):
+        """
+        Translate a single Access SQL statement
+
+        :param sql: Access SQL statement
+
+        :return: translatedSQL: SQLite SQL statement
+        """
+
+        tokens = accessSQLTranslatorClass.tokenize(sql)
+        significant = [token for token in tokens if token[0] != 'space']
+
+        if significant and accessSQLTranslatorClass.isWord(significant[0], 'UPDATE'):
+            keywordIndexes = accessSQLTranslatorClass.topLevelIndexes(tokens)
+            if 'SET' in keywordIndexes:
+                return accessSQLTranslatorClass.translateUpdate(tokens, keywordIndexes)
+
+        return accessSQLTranslatorClass.translateTokens(tokens)
+
+if __name__ == "__name__":
+    logger.info("accessSQLTranslator.py")
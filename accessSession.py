@@ -0,0 +1,708 @@
+"""
+accessSession.py
+Long-lived Access COM session used for the DAO metadata operations (QueryDefs/TableDefs/Properties) in the QC
+workflow.  Each Access database is opened once per run and all metadata operations are served from the open
+'CurrentDb()' instead of launching and quitting MSACCESS.EXE for every operation.
+
+Object names (queries with their SQL text, and tables) are cached per database in an 'accessCatalogClass' loaded once
+per run, existence checks are answered from the catalog and it is kept current as objects are created and dropped.
+Objects created, edited or dropped outside of the session (e.g. in the open Access Front End) are picked up by
+'refreshCatalog', a drop or create failing on a stale catalog entry reloads the catalog.
+
+The COM layer is behind the 'accessCOMBackendClass' interface: 'win32AccessBackendClass' drives Access via pywin32,
+'fakeAccessBackendClass' is an in-memory stand in allowing the session to be exercised on Linux.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class accessCOMBackendClass:
+    """
+    Interface for the COM backend used by 'accessSessionClass'.  A backend launches an Access application with a
+    database opened as the current database and closes it again.
+    """
+
+    def initializeThread(self):
+        """
+        Called once on the session worker thread before any COM call (e.g. COM apartment initialization)
+
+        :return:
+        """
+        pass
+
+    def uninitializeThread(self):
+        """
+        Called once on the session worker thread after the last COM call
+
+        :return:
+        """
+        pass
+
+    def openApplication(self, inDBPath):
+        """
+        Launch an Access application and open the passed database as the current database
+
+        :param inDBPath: path to database
+
+        :return: accessApp: Access Application object with the database open
+        """
+        raise NotImplementedError
+
+    def closeApplication(self, accessApp):
+        """
+        Close the current database and quit the Access application
+
+        :param accessApp: Access Application object returned by 'openApplication'
+
+        :return:
+        """
+        raise NotImplementedError
+
+class win32AccessBackendClass(accessCOMBackendClass):
+    """
+    COM backend using pywin32 to drive Microsoft Access.  A separate Access instance (DispatchEx) is launched per
+    database, an Access application can only have one current database.
+    """
+
+    def initializeThread(self):
+        import pythoncom
+        pythoncom.CoInitialize()
+
+    def uninitializeThread(self):
+        import pythoncom
+        pythoncom.CoUninitialize()
+
+    def openApplication(self, inDBPath):
+        import win32com.client
+
+        # Initialize the Access application
+        accessApp = win32com.client.DispatchEx('Access.Application')
+
+        # Open the Access database
+        accessApp.OpenCurrentDatabase(inDBPath)
+
+        return accessApp
+
+    def closeApplication(self, accessApp):
+        # Close the database and quit Access
+        accessApp.CloseCurrentDatabase()
+        accessApp.Quit()
+
+class fakeProperty:
+    """
+    Fake DAO Property
+    """
+
+    def __init__(self, name, propType, value):
+        self.Name = name
+        self.Type = propType
+        self.Value = value
+
+class fakePropertiesCollection:
+    """
+    Fake DAO Properties collection, missing properties raise as in DAO
+    """
+
+    def __init__(self):
+        self.items = {}
+
+    def __call__(self, name):
+        if name not in self.items:
+            raise KeyError(f"Property not found - {name}")
+        return self.items[name]
+
+    def __iter__(self):
+        return iter(list(self.items.values()))
+
+    def Append(self, prop):
+        self.items[prop.Name] = prop
+
+class fakeDAOObject:
+    """
+    Fake DAO QueryDef/TableDef
+    """
+
+    def __init__(self, name, sql=''):
+        self.Name = name
+        self.SQL = sql
+        self.Properties = fakePropertiesCollection()
+
+    def CreateProperty(self, name, propType, value):
+        return fakeProperty(name, propType, value)
+
+class fakeDAOCollection:
+    """
+    Fake DAO QueryDefs/TableDefs collection - iterable, indexable by name and supporting Delete/Refresh
+    """
+
+    def __init__(self, items):
+        self.items = items
+
+    def __call__(self, name):
+        if name not in self.items:
+            raise KeyError(f"Item not found in this collection - {name}")
+        return self.items[name]
+
+    def __iter__(self):
+        return iter(list(self.items.values()))
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def Count(self):
+        return len(self.items)
+
+    def Delete(self, name):
+        if name not in self.items:
+            raise KeyError(f"Item not found in this collection - {name}")
+        del self.items[name]
+
+    def Refresh(self):
+        pass
+
+class fakeDAODatabase:
+    """
+    Fake DAO Database returned by 'CurrentDb()'
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.QueryDefs = fakeDAOCollection(state['queries'])
+        self.TableDefs = fakeDAOCollection(state['tables'])
+
+    def CreateQueryDef(self, name, sql):
+        if name in self.state['queries']:
+            raise ValueError(f"Object '{name}' already exists")
+        queryDef = fakeDAOObject(name, sql)
+        self.state['queries'][name] = queryDef
+        return queryDef
+
+class fakeAccessApplication:
+    """
+    Fake Access.Application
+    """
+
+    def __init__(self, state):
+        self.state = state
+        self.isOpen = True
+
+    def CurrentDb(self):
+        return fakeDAODatabase(self.state)
+
+    def CloseCurrentDatabase(self):
+        self.isOpen = False
+
+    def Quit(self):
+        self.isOpen = False
+
+class fakeAccessBackendClass(accessCOMBackendClass):
+    """
+    In-memory COM backend standing in for Microsoft Access.  Database state (queries and tables) is kept per database
+    path so it survives across sessions, and the number of application launches is counted.
+    """
+
+    def __init__(self):
+        # Dictionary of database path - {'queries': {name: fakeDAOObject}, 'tables': {name: fakeDAOObject}}
+        self.databases = {}
+        self.launchCount = 0
+
+    def databaseState(self, inDBPath):
+        return self.databases.setdefault(inDBPath, {'queries': {}, 'tables': {}})
+
+    def addQuery(self, inDBPath, queryName, sql=''):
+        self.databaseState(inDBPath)['queries'][queryName] = fakeDAOObject(queryName, sql)
+
+    def addTable(self, inDBPath, tableName):
+        self.databaseState(inDBPath)['tables'][tableName] = fakeDAOObject(tableName)
+
+    def openApplication(self, inDBPath):
+        self.launchCount += 1
+        return fakeAccessApplication(self.databaseState(inDBPath))
+
+    def closeApplication(self, accessApp):
+        accessApp.CloseCurrentDatabase()
+        accessApp.Quit()
+
+class accessCatalogClass:
+    """
+    Catalog of the objects in an Access database - query names with their SQL text, description and push hash
+    ('pushHashProperty') and table names.  Loaded once from
+    the DAO QueryDefs/TableDefs collections and then maintained as the QC workflow creates and drops objects, allowing
+    O(1) existence checks without iterating the COM collections.  Access object names are case-insensitive so names are
+    keyed in lower case.
+    """
+
+    # QueryDef property holding the hashes of the SQL the query was pushed from and of the SQL as stored by Access
+    # ('sourceHash:storedHash'), set by 'accessSessionClass.recordPushHash' when the query is pushed
+    pushHashProperty = 'QC_PushHash'
+
+    def __init__(self, inDBPath):
+        """
+        Define the instantiated catalog attributes
+
+        :param inDBPath: path to database
+
+        :return: instantiated self object
+        """
+
+        self.inDBPath = inDBPath
+        # Dictionary of lower case query name - (query name, SQL, description, push hash)
+        self.queries = {}
+        # Dictionary of lower case table name - table name
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def queryProperty(queryDef, propertyName):
+        """
+        Value of the QueryDef property, None if the property is not defined for the query
+
+        :param queryDef: DAO QueryDef object
+        :param propertyName: Name of the property
+
+        :return: Property value or None
+        """
+
+        try:
+            return queryDef.Properties(propertyName).Value
+        except Exception:
+            return None
+
+    def load(self, db):
+        """
+        Load the catalog with a single pass over the DAO QueryDefs and TableDefs collections
+
+        :param db: DAO Database object
+
+        :return:
+        """
+
+        queries = {}
+        for queryDef in db.QueryDefs:
+            queryName = queryDef.Name
+            description = accessCatalogClass.queryProperty(queryDef, "Description")
+            pushHash = accessCatalogClass.queryProperty(queryDef, accessCatalogClass.pushHashProperty)
+            queries[queryName.lower()] = (queryName, queryDef.SQL, description, pushHash)
+
+        tables = {}
+        for tableDef in db.TableDefs:
+            tableName = tableDef.Name
+            tables[tableName.lower()] = tableName
+
+        with self.lock:
+            self.queries = queries
+            self.tables = tables
+
+        logMsg = (f"Loaded Object Catalog for database - {self.inDBPath} - {len(queries)} queries - {len(tables)}"
+                  f" tables")
+        logging.info(logMsg)
+
+    def queryExists(self, queryName):
+        with self.lock:
+            return queryName.lower() in self.queries
+
+    def querySQL(self, queryName):
+        """
+        SQL text of the passed query
+
+        :param queryName: Name of the query
+
+        :return: SQL text of the query, None if the query is not in the catalog
+        """
+
+        with self.lock:
+            queryEntry = self.queries.get(queryName.lower())
+        return queryEntry[1] if queryEntry else None
+
+    def queryDefinitions(self):
+        """
+        SQL text, description and push hash of all queries in the catalog
+
+        :return: Dictionary - query name: (SQL, description, push hash)
+        """
+
+        with self.lock:
+            return {queryName: (sql, description, pushHash) for queryName, sql, description, pushHash in
+                    self.queries.values()}
+
+    def tableExists(self, tableName):
+        with self.lock:
+            return tableName.lower() in self.tables
+
+    def addQuery(self, queryName, sql):
+        with self.lock:
+            self.queries[queryName.lower()] = (queryName, sql, None, None)
+
+    def setQueryDescription(self, queryName, description):
+        with self.lock:
+            queryEntry = self.queries.get(queryName.lower())
+            if queryEntry is not None:
+                self.queries[queryName.lower()] = (queryEntry[0], queryEntry[1], description, queryEntry[3])
+
+    def setQueryPushHash(self, queryName, sql, pushHash):
+        with self.lock:
+            queryEntry = self.queries.get(queryName.lower())
+            description = queryEntry[2] if queryEntry is not None else None
+            self.queries[queryName.lower()] = (queryName, sql, description, pushHash)
+
+    def removeQuery(self, queryName):
+        with self.lock:
+            self.queries.pop(queryName.lower(), None)
+
+    def addTable(self, tableName):
+        with self.lock:
+            self.tables[tableName.lower()] = tableName
+
+    def removeTable(self, tableName):
+        with self.lock:
+            self.tables.pop(tableName.lower(), None)
+
+class accessSessionClass:
+    """
+    Access COM session opening each database once and serving all DAO metadata operations from the open database.
+    All COM calls run on a single dedicated worker thread, COM objects are bound to the thread that created them.
+    Use as a context manager, on exit all opened Access applications are closed.
+    """
+
+    # Session active for the run, used by the generalDMClass metadata routines when set
+    activeSession = None
+
+    def __init__(self, backend=None):
+        """
+        Define the instantiated Access session attributes
+
+        :param backend: COM backend (accessCOMBackendClass), defaults to the pywin32 backend
+
+        :return: instantiated self object
+        """
+
+        if backend is None:
+            backend = win32AccessBackendClass()
+        self.backend = backend
+
+        # Dictionary of database path - Access Application object
+        self.applications = {}
+        # Dictionary of database path - accessCatalogClass
+        self.catalogs = {}
+        self.catalogLock = threading.Lock()
+        self.executor = None
+        self.previousSession = None
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        self.previousSession = accessSessionClass.activeSession
+        accessSessionClass.activeSession = self
+        return self
+
+    def __exit__(self, excType, excValue, excTraceback):
+        accessSessionClass.activeSession = self.previousSession
+        self.previousSession = None
+        self.close()
+        return False
+
+    def run(self, function, *args):
+        """
+        Run the passed function on the session COM thread and return its result
+
+        :param function: function to be run
+        :param args: arguments passed to the function
+
+        :return: function return value
+        """
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='AccessCOM',
+                                                   initializer=self.backend.initializeThread)
+            executor = self.executor
+
+        return executor.submit(function, *args).result()
+
+    def currentDb(self, inDBPath):
+        """
+        Get the current database object for the passed database, opening the database on first use.  Must be called
+        from the session COM thread.
+
+        :param inDBPath: path to database
+
+        :return: db: DAO Database object
+        """
+
+        accessApp = self.applications.get(inDBPath)
+        if accessApp is None:
+            accessApp = self.backend.openApplication(inDBPath)
+            self.applications[inDBPath] = accessApp
+            logMsg = f"Opened Access session for database - {inDBPath}"
+            logging.info(logMsg)
+
+        return accessApp.CurrentDb()
+
+    def catalog(self, inDBPath):
+        """
+        Get the object catalog for the passed database, loading it on first use
+
+        :param inDBPath: path to database
+
+        :return: catalog: accessCatalogClass for the database
+        """
+
+        with self.catalogLock:
+            catalog = self.catalogs.get(inDBPath)
+            if catalog is None:
+                catalog = accessCatalogClass(inDBPath)
+                self.run(lambda: catalog.load(self.currentDb(inDBPath)))
+                self.catalogs[inDBPath] = catalog
+
+        return catalog
+
+    def refreshCatalog(self, inDBPath):
+        """
+        Reload the object catalog for the passed database from the DAO collections - picks up objects created, edited
+        or dropped outside of the session
+
+        :param inDBPath: path to database
+
+        :return: catalog: accessCatalogClass for the database
+        """
+
+        with self.catalogLock:
+            catalog = self.catalogs.get(inDBPath)
+            if catalog is None:
+                catalog = accessCatalogClass(inDBPath)
+            self.run(lambda: catalog.load(self.currentDb(inDBPath)))
+            self.catalogs[inDBPath] = catalog
+
+        return catalog
+
+    def loadedCatalog(self, inDBPath):
+        """
+        Get the object catalog for the passed database only if already loaded, used to register objects created
+        outside of the session (e.g. views created via ODBC) without forcing a catalog load.
+
+        :param inDBPath: path to database
+
+        :return: catalog: accessCatalogClass for the database or None
+        """
+
+        return self.catalogs.get(inDBPath)
+
+    def registerQuery(self, queryName, inQuerySel, inDBPath):
+        """
+        Register a query created outside of the session (e.g. 'CREATE VIEW' via ODBC) in the database catalog
+
+        :param queryName: Name of the query created
+        :param inQuerySel: SQL of the query created
+        :param inDBPath: path to database
+
+        :return:
+        """
+
+        catalog = self.loadedCatalog(inDBPath)
+        if catalog is not None:
+            catalog.addQuery(queryName, inQuerySel)
+
+    def registerTable(self, tableName, inDBPath):
+        """
+        Register a table created outside of the session (e.g. 'CREATE TABLE' via ODBC) in the database catalog
+
+        :param tableName: Name of the table created
+        :param inDBPath: path to database
+
+        :return:
+        """
+
+        catalog = self.loadedCatalog(inDBPath)
+        if catalog is not None:
+            catalog.addTable(tableName)
+
+    def queryExists(self, queryName, inDBPath):
+        return self.catalog(inDBPath).queryExists(queryName)
+
+    def tableExists(self, tableName, inDBPath):
+        return self.catalog(inDBPath).tableExists(tableName)
+
+    def queryExistsDelete(self, queryName, inDBPath):
+        """
+        Delete the query in the passed database if it exists
+
+        :param queryName: Name of query to be deleted
+        :param inDBPath: path to database
+
+        :return: queryExists: True if the query existed and was deleted, else False
+        """
+
+        catalog = self.catalog(inDBPath)
+        if not catalog.queryExists(queryName):
+            return False
+
+        def deleteQuery():
+            db = self.currentDb(inDBPath)
+            db.QueryDefs.Delete(queryName)
+
+        try:
+            self.run(deleteQuery)
+        except Exception:
+            # Stale catalog - the query was dropped outside of the session
+            if self.refreshCatalog(inDBPath).queryExists(queryName):
+                raise
+            return False
+        catalog.removeQuery(queryName)
+
+        return True
+
+    def pushQuery(self, inQuerySel, queryName, inDBPath):
+        """
+        Create the query 'queryName' with SQL 'inQuerySel' in the passed database, a query of the same name created
+        outside of the session (not in the catalog) is replaced
+
+        :param inQuerySel: SQL Query defining the query to be created
+        :param queryName: Name of query being created
+        :param inDBPath: path to database
+
+        :return:
+        """
+
+        catalog = self.catalog(inDBPath)
+
+        def createQuery():
+            db = self.currentDb(inDBPath)
+            db.CreateQueryDef(queryName, inQuerySel)
+
+        try:
+            self.run(createQuery)
+        except Exception:
+            # Stale catalog - the query was created outside of the session, replaced by the pushed query
+            if not self.refreshCatalog(inDBPath).queryExists(queryName):
+                raise
+            self.queryExistsDelete(queryName, inDBPath)
+            self.run(createQuery)
+        catalog.addQuery(queryName, inQuerySel)
+
+    def queryDesc(self, queryName, queryDescription, inDBPath):
+        """
+        Add or update the 'Description' property of the passed query
+
+        :param queryName: Name of the query
+        :param queryDescription: Query description to be added to the query
+        :param inDBPath: path to database
+
+        :return:
+        """
+
+        def describeQuery():
+            db = self.currentDb(inDBPath)
+            db.QueryDefs.Refresh()
+            queryDef = db.QueryDefs(queryName)
+
+            # Add the description property if it doesn't exist, or update it if it does
+            try:
+                queryDef.Properties("Description").Value = queryDescription
+            except Exception:
+                # If the property does not exist, create it - 10 is the constant for dbText
+                newProp = queryDef.CreateProperty("Description", 10, queryDescription)
+                queryDef.Properties.Append(newProp)
+
+        self.run(describeQuery)
+
+        catalog = self.loadedCatalog(inDBPath)
+        if catalog is not None:
+            catalog.setQueryDescription(queryName, queryDescription)
+
+    def recordPushHash(self, queryName, sourceHash, hashFunction, inDBPath):
+        """
+        Record the push hash on the just pushed query - the SQL as stored by Access (rewritten on save) is read back
+        and the 'pushHashProperty' QueryDef property set to 'sourceHash:storedHash' in one COM call
+
+        :param queryName: Name of the pushed query
+        :param sourceHash: Hash of the SQL the query was pushed from
+        :param hashFunction: Function returning the hash of an SQL text (generalDMClass.sqlHash)
+        :param inDBPath: path to database
+
+        :return: pushHash: Value of the push hash property
+        """
+
+        def markQuery():
+            db = self.currentDb(inDBPath)
+            db.QueryDefs.Refresh()
+            queryDef = db.QueryDefs(queryName)
+            storedSQL = queryDef.SQL
+            pushHash = f'{sourceHash}:{hashFunction(storedSQL)}'
+
+            # Add the property if it doesn't exist, or update it if it does - 10 is the constant for dbText
+            try:
+                queryDef.Properties(accessCatalogClass.pushHashProperty).Value = pushHash
+            except Exception:
+                newProp = queryDef.CreateProperty(accessCatalogClass.pushHashProperty, 10, pushHash)
+                queryDef.Properties.Append(newProp)
+
+            return storedSQL, pushHash
+
+        storedSQL, pushHash = self.run(markQuery)
+
+        catalog = self.loadedCatalog(inDBPath)
+        if catalog is not None:
+            catalog.setQueryPushHash(queryName, storedSQL, pushHash)
+
+        return pushHash
+
+    def tableExistsDelete(self, tableName, inDBPath):
+        """
+        Delete the table in the passed database if it exists
+
+        :param tableName: Name of table to be deleted
+        :param inDBPath: path to database
+
+        :return: tableExists: True if the table existed and was deleted, else False
+        """
+
+        catalog = self.catalog(inDBPath)
+        if not catalog.tableExists(tableName):
+            return False
+
+        def deleteTable():
+            db = self.currentDb(inDBPath)
+            db.TableDefs.Delete(tableName)
+
+        try:
+            self.run(deleteTable)
+        except Exception:
+            # Stale catalog - the table was dropped outside of the session
+            if self.refreshCatalog(inDBPath).tableExists(tableName):
+                raise
+            return False
+        catalog.removeTable(tableName)
+
+        return True
+
+    def close(self):
+        """
+        Close all databases opened in the session and quit their Access applications
+
+        :return:
+        """
+
+        with self.lock:
+            executor = self.executor
+            self.executor = None
+
+        if executor is None:
+            return
+
+        def closeApplications():
+            for inDBPath, accessApp in list(self.applications.items()):
+                try:
+                    self.backend.closeApplication(accessApp)
+                except Exception as e:
+                    logMsg = f"WARNING - Failed closing Access session for database - {inDBPath}: {e}"
+                    logging.warning(logMsg)
+            self.applications = {}
+            self.catalogs = {}
+            self.backend.uninitializeThread()
+
+        executor.submit(closeApplications).result()
+        executor.shutdown(wait=True)
+
+if __name__ == "__name__":
+    logger.info("accessSession.py")
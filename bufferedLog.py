@@ -0,0 +1,196 @@
+"""
+bufferedLog.py
+Buffered, non-blocking log writer.  Log lines from 'generalDMClass.messageLogFile' (text logfile) and the python
+'logging' records configured in log_config.py are put on a queue and written by a single background writer thread.  The
+writer drains the queue in batches, keeps the log files open and flushes once per batch.  Pending lines are flushed on
+exit (atexit), including exits after an unhandled exception.
+
+The console echo of 'messageLogFile' is written synchronously in the calling thread, keeping its order with the print
+calls and tracebacks written directly to stdout.
+
+bufferedLogWriterClass - queue and background writer thread
+bufferedLogHandler - logging handler (QueueHandler style) formatting records onto the writer queue
+logWriter - shared writer instance used by both log sinks
+"""
+import sys
+import atexit
+import queue
+import logging
+import threading
+
+class bufferedLogWriterClass:
+    """
+    Background writer thread for log lines
+    """
+
+    def __init__(self, maxBatch=500):
+        """
+        Define the instantiated log writer attributes
+
+        :param maxBatch: Maximum number of lines written per batch/flush
+
+        :return: instantiated self object
+        """
+
+        self.maxBatch = maxBatch
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        # Dictionary of log file path - open file object, retained open across batches
+        self.files = {}
+        self.linesWritten = 0
+        self.batchesWritten = 0
+
+    def start(self):
+        """
+        Start the writer thread if not running
+
+        :return:
+        """
+
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='LogWriter', daemon=True)
+                self.thread.start()
+
+    def write(self, logFilePath, line, echo=False):
+        """
+        Queue a line to be written to the log file, returns without waiting on the file I/O.  The console echo is
+        written in the calling thread.
+
+        :param logFilePath: Path of the log file to append the line to, None for console only
+        :param line: Line to be written (without line terminator)
+        :param echo: Also write the line to the console (stdout)
+
+        :return:
+        """
+
+        if echo:
+            print(line, flush=True)
+        if logFilePath is None:
+            return
+
+        if self.thread is None or not self.thread.is_alive():
+            self.start()
+
+        self.queue.put((logFilePath, line))
+
+    def run(self):
+        """
+        Writer thread loop - block for the next line, drain up to 'maxBatch' queued lines, write them and flush once
+
+        :return:
+        """
+
+        while True:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < self.maxBatch:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            stopWriter = self.writeBatch(batch)
+
+            for _ in batch:
+                self.queue.task_done()
+
+            if stopWriter:
+                break
+
+    def writeBatch(self, batch):
+        """
+        Write and flush the batch of queued lines
+
+        :param batch: List of (logFilePath, line) tuples, a None item is the stop sentinel
+
+        :return: stopWriter: True if the stop sentinel was in the batch
+        """
+
+        stopWriter = False
+        touched = set()
+        for item in batch:
+            if item is None:
+                stopWriter = True
+                continue
+
+            logFilePath, line = item
+            try:
+                stream = self.files.get(logFilePath)
+                if stream is None:
+                    stream = open(logFilePath, "a")
+                    self.files[logFilePath] = stream
+                stream.write(line + "\n")
+                touched.add(stream)
+                self.linesWritten += 1
+            except Exception:
+                # Logging must never take down the run, report to stderr and continue
+                print(f'WARNING - failed writing log line to {logFilePath}', file=sys.stderr)
+
+        for stream in touched:
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        self.batchesWritten += 1
+
+        return stopWriter
+
+    def flush(self):
+        """
+        Block until all queued lines are written and flushed
+
+        :return:
+        """
+
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.join()
+
+    def stop(self):
+        """
+        Write all queued lines, stop the writer thread and close the log files
+
+        :return:
+        """
+
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+        for stream in self.files.values():
+            try:
+                stream.close()
+            except Exception:
+                pass
+        self.files = {}
+
+class bufferedLogHandler(logging.Handler):
+    """
+    Logging handler formatting records in the calling thread and queueing the text on the log writer
+    """
+
+    def __init__(self, writer, logFilePath, mode='a'):
+        """
+        :param writer: bufferedLogWriterClass instance
+        :param logFilePath: Path of the log file
+        :param mode: 'w' truncates the log file at setup, 'a' appends
+        """
+
+        logging.Handler.__init__(self)
+        self.writer = writer
+        self.logFilePath = logFilePath
+        if mode == 'w':
+            open(logFilePath, 'w').close()
+
+    def emit(self, record):
+        try:
+            self.writer.write(self.logFilePath, self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.writer.flush()
+
+# Shared writer used by messageLogFile and the logging configuration, flushed on interpreter exit
+logWriter = bufferedLogWriterClass()
+atexit.register(logWriter.stop)
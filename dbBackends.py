@@ -0,0 +1,1088 @@
+"""
+dbBackends.py
+Pluggable database backends for the QC workflow data access.  All data access in 'generalDMClass' goes through the
+backend set via 'generalDMClass.setBackend' (default Access):
+
+dbBackendClass - interface: read to dataframe, read in dataframe chunks, columnar read into typed arrays, execute,
+                 execute a batch of statements in one transaction, create view, drop object, create table from
+                 dataframe and set object description.
+accessBackendClass - Microsoft Access via PYODBC (pooled connections) and the Access COM session.
+sqliteBackendClass - SQLite reference backend allowing the QC workflow to be run, profiled and benchmarked off Windows.
+"""
+import re
+import logging
+import sqlite3
+import threading
+from time import perf_counter
+from contextlib import contextmanager
+from datetime import datetime, date, time
+from decimal import Decimal
+import generalDM as dm
+import accessSQLTranslator as sqt
+from lazyImports import lazyModuleClass
+
+# pandas/numpy are imported on first use
+np = lazyModuleClass('numpy')
+pd = lazyModuleClass('pandas')
+
+logger = logging.getLogger(__name__)
+
+class dbBackendClass:
+    """
+    Interface for the database backends serving the 'generalDMClass' data access routines
+    """
+
+    # Name of the backend
+    name = 'Interface'
+
+    def __init__(self):
+        """
+        Define the instantiated backend attributes - the prepared statement cache
+
+        :return: instantiated self object
+        """
+
+        # Prepared statement cache - connection: {SQL: cursor}.  Re-executing the same parameterized SQL on the same
+        # cursor reuses the prepared statement (PYODBC only re-prepares when the SQL changes, SQLite via its per
+        # connection statement cache) - one parse/plan per statement per connection for the run.
+        self.preparedCursors = {}
+        # SQL: {'Prepares': count, 'Executions': count}
+        self.statementStats = {}
+        self.statementLock = threading.Lock()
+
+    def readDF(self, query, inDB):
+        """
+        Perform the defined query and return the result in a dataframe, errors (e.g. a missing table) are raised
+
+        :param query: query to be processed
+        :param inDB: path to the database being hit
+
+        :return: queryDf: query output dataframe
+        """
+        raise NotImplementedError
+
+    @contextmanager
+    def queryCursor(self, query, inDB):
+        """
+        Context manager yielding a cursor with the defined select query executed, the cursor (and any pooled
+        connection) is released on exit.
+
+        :param query: query to be processed
+        :param inDB: path to the database being hit
+
+        :return: cursor with the executed query
+        """
+        raise NotImplementedError
+        yield
+
+    def readChunks(self, query, inDB, chunkSize):
+        """
+        Perform the defined query and yield the result in dataframe chunks of at most 'chunkSize' rows fetched via
+        'cursor.fetchmany', only one chunk is held in memory at a time.  The connection is held until the generator is
+        exhausted or closed.
+
+        :param query: query to be processed
+        :param inDB: path to the database being hit
+        :param chunkSize: Maximum number of rows per chunk
+
+        :return: generator of dataframe chunks
+        """
+
+        with self.queryCursor(query, inDB) as cursor:
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunkSize)
+                if not rows:
+                    break
+                yield pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+
+    def readColumnar(self, query, inDB, chunkSize, categoricalColumns=None, parseDates=None):
+        """
+        Perform the defined query and return the result in a dataframe built column wise.  The values of each column
+        of a 'cursor.fetchmany' batch are copied straight into a typed NumPy buffer (and null mask) for the column,
+        the column type is taken from the 'cursor.description' type code, or inferred from all values of the batch
+        when the driver does not report one (mixed int/float values - float64, other mixes - object, a later batch not
+        fitting the type widens the column): integers - int32 (int64 if out of range), floats/decimals - float64,
+        dates - datetime64, booleans - bool.  Columns with nulls are returned as pandas masked arrays (Int32, boolean).
+        No row wise buffer, per row dataframe construction or dtype inference is performed.
+
+        :param query: query to be processed
+        :param inDB: path to the database being hit
+        :param chunkSize: Number of rows per fetchmany batch
+        :param categoricalColumns: List of text columns to be returned as pandas Categorical (e.g. 'Loc_Name')
+        :param parseDates: List of text columns holding dates to be returned as datetime64 (e.g. SQLite dates)
+
+        :return: queryDf: query output dataframe
+        """
+
+        categoricalColumns = set(categoricalColumns or [])
+        parseDates = set(parseDates or [])
+
+        with self.queryCursor(query, inDB) as cursor:
+            columns = [column[0] for column in cursor.description]
+            typeCodes = [column[1] for column in cursor.description]
+            kinds = [dbBackendClass.columnKind(typeCode) for typeCode in typeCodes]
+            # Typed value buffers and null masks per column, one per fetchmany batch
+            columnChunks = [[] for _ in columns]
+            while True:
+                rows = cursor.fetchmany(chunkSize)
+                if not rows:
+                    break
+                for index, values in enumerate(zip(*rows)):
+                    if typeCodes[index] is None:
+                        kind = dbBackendClass.widenKind(kinds[index], dbBackendClass.valuesKind(values))
+                        if kind != kinds[index]:
+                            columnChunks[index] = [dbBackendClass.castChunk(chunk, kind) for chunk in
+                                                   columnChunks[index]]
+                            kinds[index] = kind
+                    columnChunks[index].append(dbBackendClass.typedChunk(values, kinds[index]))
+
+        columnDic = {}
+        for column, kind, chunks in zip(columns, kinds, columnChunks):
+            columnDic[column] = dbBackendClass.columnArray(chunks, kind, categorical=column in categoricalColumns,
+                                                           parseDate=column in parseDates)
+
+        queryDf = pd.DataFrame(columnDic, columns=columns)
+
+        return queryDf
+
+    def columnKind(typeCode):
+        """
+        Column type of the 'cursor.description' type code
+
+        :param typeCode: Python type reported by the driver or None
+
+        :return: kind: 'bool'|'int'|'float'|'date'|'object', None if not reported
+        """
+
+        if typeCode is None:
+            return None
+        if issubclass(typeCode, bool):
+            return 'bool'
+        if issubclass(typeCode, int):
+            return 'int'
+        if issubclass(typeCode, (float, Decimal)):
+            return 'float'
+        if issubclass(typeCode, date):
+            return 'date'
+
+        return 'object'
+
+    def valuesKind(values):
+        """
+        Column type inferred from all non null values of a batch - mixed int/float values are float, other mixes object
+
+        :param values: Column values of the batch
+
+        :return: kind: 'bool'|'int'|'float'|'date'|'object', None if all values are null
+        """
+
+        kinds = {dbBackendClass.columnKind(valueType) for valueType in {type(value) for value in values if
+                                                                         value is not None}}
+        if not kinds:
+            return None
+        if len(kinds) == 1:
+            return kinds.pop()
+
+        return 'float' if kinds == {'int', 'float'} else 'object'
+
+    def widenKind(kind, batchKind):
+        """
+        Column type holding the values of both types
+
+        :param kind: Column type so far or None
+        :param batchKind: Type of the batch values or None
+
+        :return: kind
+        """
+
+        if kind is None or kind == batchKind:
+            return batchKind if kind is None else kind
+        if batchKind is None:
+            return kind
+
+        return 'float' if {kind, batchKind} == {'int', 'float'} else 'object'
+
+    def typedChunk(values, kind):
+        """
+        Copy the column values of a batch into a typed buffer
+
+        :param values: Column values of the batch
+        :param kind: Column type, None if all values so far are null
+
+        :return: (buffer, mask) - NumPy array of the values (0/NaN/False for nulls in the typed buffers) and null mask
+        """
+
+        count = len(values)
+        mask = np.fromiter((value is None for value in values), dtype=bool, count=count)
+        if kind == 'bool':
+            buffer = np.fromiter((bool(value) if value is not None else False for value in values), dtype=bool,
+                                 count=count)
+        elif kind == 'int':
+            buffer = np.fromiter((value if value is not None else 0 for value in values), dtype=np.int64, count=count)
+        elif kind == 'float':
+            buffer = np.fromiter((float(value) if value is not None else np.nan for value in values), dtype=np.float64,
+                                 count=count)
+        else:
+            buffer = np.empty(count, dtype=object)
+            buffer[:] = values
+
+        return buffer, mask
+
+    def castChunk(chunk, kind):
+        """
+        Cast a typed buffer of an earlier batch to the widened column type
+
+        :param chunk: (buffer, mask)
+        :param kind: Widened column type ('float'|'object')
+
+        :return: (buffer, mask)
+        """
+
+        buffer, mask = chunk
+        if kind == 'float' and buffer.dtype != object:
+            buffer = buffer.astype(np.float64)
+            buffer[mask] = np.nan
+        else:
+            buffer = buffer.astype(object)
+            buffer[mask] = None
+
+        return buffer, mask
+
+    def columnArray(chunks, kind, categorical=False, parseDate=False):
+        """
+        Join the typed buffers of a single column into the column array
+
+        :param chunks: List of (buffer, mask) per batch
+        :param kind: Column type, None if all values are null (object)
+        :param categorical: Return text values as a pandas Categorical
+        :param parseDate: Parse text values as dates
+
+        :return: NumPy array, pandas extension array or Categorical
+        """
+
+        if chunks:
+            buffer = np.concatenate([chunkBuffer for chunkBuffer, chunkMask in chunks])
+            mask = np.concatenate([chunkMask for chunkBuffer, chunkMask in chunks])
+        else:
+            buffer = np.empty(0, dtype=object if kind in (None, 'date', 'object') else
+                              {'bool': bool, 'int': np.int64, 'float': np.float64}[kind])
+            mask = np.zeros(0, dtype=bool)
+        hasNulls = bool(mask.any())
+
+        if parseDate or kind == 'date':
+            if buffer.dtype != object:
+                buffer, mask = dbBackendClass.castChunk((buffer, mask), 'object')
+            return pd.to_datetime(pd.Series(buffer, dtype=object)).to_numpy(dtype='datetime64[ns]')
+
+        if kind == 'bool':
+            return pd.arrays.BooleanArray(buffer, mask) if hasNulls else buffer
+
+        if kind == 'int':
+            if len(buffer) == 0 or (buffer.min() >= np.iinfo(np.int32).min and
+                                    buffer.max() <= np.iinfo(np.int32).max):
+                buffer = buffer.astype(np.int32)
+            return pd.arrays.IntegerArray(buffer, mask) if hasNulls else buffer
+
+        if kind == 'float':
+            return buffer
+
+        if categorical:
+            return pd.Categorical(buffer)
+
+        return np.ascontiguousarray(buffer)
+
+    def execute(self, inQuery, inDB, params=None):
+        """
+        Execute and commit an action query (e.g. 'Update', 'Append' or 'Make Table'), query is not retained
+
+        :param inQuery: SQL action query
+        :param inDB: path to the database being hit
+        :param params: Optional sequence of parameter values for the '?' markers in the query
+
+        :return:
+        """
+        raise NotImplementedError
+
+    @contextmanager
+    def connectionContext(self, inDB):
+        """
+        Context manager yielding a connection to the database, released on exit (e.g. back to the connection pool)
+
+        :param inDB: path to the database being hit
+
+        :return: cnxn: database connection
+        """
+        raise NotImplementedError
+        yield
+
+    def prepareSQL(self, query):
+        """
+        Prepare the passed SQL for execution by the backend, SQL is written for Access
+
+        :param query: SQL as written for Access
+
+        :return: SQL to be executed
+        """
+        return query
+
+    def reusePreparedCursors(self, cnxn):
+        """
+        Check if prepared statements on the connection survive the end of a transaction
+
+        :param cnxn: database connection
+
+        :return: True if cached prepared cursors can be reused
+        """
+        return True
+
+    def preparedCursor(self, cnxn, sql):
+        """
+        Get the cached cursor for the parameterized SQL on the connection, creating (preparing) it on first use
+
+        :param cnxn: database connection
+        :param sql: parameterized SQL, '?' parameter markers
+
+        :return: cursor: cursor to execute the SQL on
+        """
+
+        with self.statementLock:
+            statDic = self.statementStats.setdefault(sql, {'Prepares': 0, 'Executions': 0})
+            statDic['Executions'] += 1
+            cursors = self.preparedCursors.setdefault(cnxn, {})
+            cursor = cursors.get(sql)
+            if cursor is None or not self.reusePreparedCursors(cnxn):
+                cursor = cnxn.cursor()
+                cursors[sql] = cursor
+                statDic['Prepares'] += 1
+
+        return cursor
+
+    def readPrepared(self, query, params, inDB):
+        """
+        Perform the parameterized select query via the prepared statement cache and return the result in a dataframe
+
+        :param query: parameterized query, '?' parameter markers
+        :param params: Sequence of parameter values
+        :param inDB: path to the database being hit
+
+        :return: queryDf: query output dataframe
+        """
+
+        with self.connectionContext(inDB) as cnxn:
+            cursor = self.preparedCursor(cnxn, query)
+            cursor.execute(self.prepareSQL(query), params)
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+
+        queryDf = pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+
+        return queryDf
+
+    def executeBatch(self, statements, inDB):
+        """
+        Execute the batch of action queries on one connection in a single transaction.  The transaction is committed
+        once all statements succeed, on failure it is rolled back and the error raised.  Parameterized statements are
+        executed via the prepared statement cache.
+
+        :param statements: List of (inQuery, params) tuples, params None or a sequence of '?' parameter values
+        :param inDB: path to the database being hit
+
+        :return: elapsedList: Elapsed seconds per statement
+        """
+
+        elapsedList = []
+        with self.connectionContext(inDB) as cnxn:
+            try:
+                for inQuery, params in statements:
+                    start = perf_counter()
+                    if params is None:
+                        cursor = cnxn.cursor()
+                        cursor.execute(self.prepareSQL(inQuery))
+                        cursor.close()
+                    else:
+                        self.preparedCursor(cnxn, inQuery).execute(self.prepareSQL(inQuery), params)
+                    elapsedList.append(perf_counter() - start)
+                cnxn.commit()
+            except Exception:
+                cnxn.rollback()
+                raise
+
+        return elapsedList
+
+    def statementCacheStats(self):
+        """
+        Prepared statement cache usage for the run
+
+        :return: statsDF: Dataframe with the SQL, number of prepares and number of executions per statement
+        """
+
+        with self.statementLock:
+            statsDF = pd.DataFrame([{'SQL': sql, **statDic} for sql, statDic in self.statementStats.items()],
+                                   columns=['SQL', 'Prepares', 'Executions'])
+
+        return statsDF
+
+    def evictPreparedCursors(self, cnxn):
+        """
+        Close and drop the cached prepared cursors of a connection, called when the connection is closed (e.g. discarded
+        by the connection pool)
+
+        :param cnxn: database connection
+
+        :return:
+        """
+
+        with self.statementLock:
+            cursors = self.preparedCursors.pop(cnxn, {})
+
+        for cursor in cursors.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+    def clearPreparedCursors(self):
+        """
+        Close and drop the cached prepared cursors, called at teardown
+
+        :return:
+        """
+
+        with self.statementLock:
+            preparedCursors = self.preparedCursors
+            self.preparedCursors = {}
+
+        for cursors in preparedCursors.values():
+            for cursor in cursors.values():
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    def createView(self, inQuerySel, queryName, inDB):
+        """
+        Create the select query/view 'queryName' defined by 'inQuerySel'
+
+        :param inQuerySel: SQL Query defining the view
+        :param queryName: Name of view being created
+        :param inDB: path to the database being hit
+
+        :return:
+        """
+        raise NotImplementedError
+
+    def queryDefinitions(self, inDB):
+        """
+        Stored SQL, description and push hash ('recordPushHash') of all queries (views) in the database, read in one
+        pass
+
+        :param inDB: path to the database being hit
+
+        :return: Dictionary - query name: (SQL, description, push hash or None)
+        """
+        raise NotImplementedError
+
+    def recordPushHash(self, queryName, sourceHash, inDB):
+        """
+        Record the push hash on the just created query - 'sourceHash:storedHash', the hash of the SQL the query was
+        pushed from and of the SQL as stored by the database (read back once created).  Kept with the query (for Access
+        a QueryDef property), dropped with the query.
+
+        :param queryName: Name of the query
+        :param sourceHash: Hash of the SQL the query was pushed from (generalDMClass.sqlHash)
+        :param inDB: path to the database being hit
+
+        :return: pushHash: Recorded push hash
+        """
+        raise NotImplementedError
+
+    def objectExists(self, objectName, inDB, objectType):
+        """
+        Check if the query (view) or table exists in the database
+
+        :param objectName: Name of the object
+        :param inDB: path to the database being hit
+        :param objectType: Type of object ('query'|'table')
+
+        :return: True if the object exists, else False
+        """
+        raise NotImplementedError
+
+    def dropObject(self, objectName, inDB, objectType):
+        """
+        Drop the query or table if it exists
+
+        :param objectName: Name of the object
+        :param inDB: path to the database being hit
+        :param objectType: Type of object ('query'|'table')
+
+        :return: objectExists: True if the object existed and was dropped, else False
+        """
+        raise NotImplementedError
+
+    def createTableFromDF(self, df, tableName, inDB, batchSize, fastExecuteMany):
+        """
+        Create a new table from the passed dataframe, rows are loaded in batches in a single transaction
+
+        :param df: Data Frame to be created
+        :param tableName: Name of table to be created
+        :param inDB: path to the database being hit
+        :param batchSize: Number of rows sent per batch
+        :param fastExecuteMany: Use driver parameter arrays where supported
+
+        :return: recordCount: Number of records loaded
+        """
+        raise NotImplementedError
+
+    def setDescription(self, queryName, description, inDB):
+        """
+        Add or update the description of the passed query
+
+        :param queryName: Name of the query
+        :param description: Description to be set
+        :param inDB: path to the database being hit
+
+        :return:
+        """
+        raise NotImplementedError
+
+    @contextmanager
+    def session(self):
+        """
+        Context manager holding any per-run backend session open (e.g. the Access COM session)
+
+        :return: session object or None
+        """
+        yield None
+
+    def close(self):
+        """
+        Teardown of the backend connections at the end of the run
+
+        :return: logMsg: String summarizing the teardown
+        """
+        return f'Closed {self.name} backend'
+
+class accessBackendClass(dbBackendClass):
+    """
+    Microsoft Access backend.  Reads, action queries and view creation use PYODBC connections from the per-run
+    connection pool, DAO metadata operations (drop, description) use the Access COM session.
+    """
+
+    name = 'Access'
+
+    # ODBC 'SQLGetInfo' cursor commit behavior info type and the value denoting prepared statements are deleted on
+    # commit/rollback
+    odbcCursorCommitBehavior = 23
+    odbcCBDelete = 0
+
+    @contextmanager
+    def connectionContext(self, inDB):
+
+        with dm.generalDMClass.pooledConnection(inDB) as cnxn:
+            yield cnxn
+
+    def reusePreparedCursors(self, cnxn):
+
+        try:
+            return cnxn.getinfo(accessBackendClass.odbcCursorCommitBehavior) != accessBackendClass.odbcCBDelete
+        except Exception:
+            return False
+
+    def readDF(self, query, inDB):
+
+        with dm.generalDMClass.pooledConnection(inDB) as cnxn:
+            try:
+                queryDf = pd.read_sql(query, cnxn)
+
+            except Exception as e:
+                # 'pd.read_sql' is not able to create the dataframe for some Access results - import the query via the
+                # PYODBC cursor, an error of the cursor import (e.g. a missing table) is raised
+                logMsg = f"WARNING - 'pd.read_sql' failed for - {query} - {e} - importing via PYODBC cursor"
+                logging.warning(logMsg)
+
+                cursor = cnxn.cursor()
+                try:
+                    cursor.execute(query)
+                    columns = [column[0] for column in cursor.description]
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+
+                queryDf = pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+
+        return queryDf
+
+    @contextmanager
+    def queryCursor(self, query, inDB):
+
+        with dm.generalDMClass.pooledConnection(inDB) as cnxn:
+            cursor = cnxn.cursor()
+            try:
+                cursor.execute(query)
+                yield cursor
+            finally:
+                cursor.close()
+
+    def execute(self, inQuery, inDB, params=None):
+
+        with dm.generalDMClass.pooledConnection(inDB) as cnxn:
+            cursor = cnxn.cursor()
+            try:
+                if params is None:
+                    cursor.execute(inQuery)
+                else:
+                    cursor.execute(inQuery, params)
+                cnxn.commit()
+            finally:
+                cursor.close()
+
+    def createView(self, inQuerySel, queryName, inDB):
+
+        #Define the full query
+        fullQuery = f"CREATE VIEW {queryName} AS {inQuerySel}"
+        self.execute(fullQuery, inDB)
+
+        # Keep the object catalog of the Access COM session current
+        session = dm.acs.accessSessionClass.activeSession
+        if session is not None:
+            session.registerQuery(queryName, inQuerySel, inDB)
+
+    def queryDefinitions(self, inDB):
+
+        # Served from the object catalog of the Access COM session (loaded once per database)
+        with dm.generalDMClass.comSession() as session:
+            return session.catalog(inDB).queryDefinitions()
+
+    def recordPushHash(self, queryName, sourceHash, inDB):
+
+        # QueryDef property set via the Access COM session, the catalog is updated with the stored SQL
+        with dm.generalDMClass.comSession() as session:
+            return session.recordPushHash(queryName, sourceHash, dm.generalDMClass.sqlHash, inDB)
+
+    def objectExists(self, objectName, inDB, objectType):
+
+        # Tables via the ODBC catalog functions (also tables created via ODBC), queries from the Access COM session
+        # object catalog
+        if objectType == 'table':
+            with dm.generalDMClass.pooledConnection(inDB) as cnxn:
+                cursor = cnxn.cursor()
+                try:
+                    tableNames = [row.table_name for row in cursor.tables(tableType='TABLE')]
+                finally:
+                    cursor.close()
+
+            return objectName.lower() in {tableName.lower() for tableName in tableNames}
+
+        with dm.generalDMClass.comSession() as session:
+            return session.queryExists(objectName, inDB)
+
+    def dropObject(self, objectName, inDB, objectType):
+
+        with dm.generalDMClass.comSession() as session:
+            if objectType == 'table':
+                objectExists = session.tableExistsDelete(objectName, inDB)
+            else:
+                objectExists = session.queryExistsDelete(objectName, inDB)
+
+        return objectExists
+
+    def createTableFromDF(self, df, tableName, inDB, batchSize, fastExecuteMany):
+
+        # Get column names and types
+        col_defs = []
+        for column, dtype in zip(df.columns, df.dtypes):
+            columnType = dm.generalDMClass.accessColumnType(dtype)
+            col_defs.append(f"[{column}] {columnType}")
+
+        col_defs_str = ", ".join(col_defs)
+
+        create_table_query = f"CREATE TABLE {tableName} ({col_defs_str})"
+        insert_query = f"INSERT INTO {tableName} VALUES ({', '.join(['?' for _ in df.columns])})"
+
+        records = dm.generalDMClass.frameToRecords(df)
+
+        # Pooled ODBC connection to Access Database
+        with dm.generalDMClass.pooledConnection(inDB) as cnxn:
+            # Create a cursor object
+            cursor = cnxn.cursor()
+            try:
+                cursor.execute(create_table_query)
+
+                # Bulk insert the dataframe (i.e. df) records in batches
+                cursor.fast_executemany = fastExecuteMany
+                for start in range(0, len(records), batchSize):
+                    cursor.executemany(insert_query, records[start:start + batchSize])
+
+                # Commit the transaction
+                cnxn.commit()
+
+            except Exception:
+                cnxn.rollback()
+                raise
+
+            finally:
+                cursor.close()
+
+        # Keep the object catalog of the Access COM session current
+        session = dm.acs.accessSessionClass.activeSession
+        if session is not None:
+            session.registerTable(tableName, inDB)
+
+        return len(records)
+
+    def setDescription(self, queryName, description, inDB):
+
+        with dm.generalDMClass.comSession() as session:
+            session.queryDesc(queryName, description, inDB)
+
+    @contextmanager
+    def session(self):
+        with dm.generalDMClass.comSession() as session:
+            yield session
+
+    def close(self):
+
+        self.clearPreparedCursors()
+        statsDic = dm.generalDMClass.connectionPool.closeAll()
+
+        logMsg = (f"Closed ODBC Connection Pool - connects opened: {statsDic['connectsOpened']} - connects saved: "
+                  f"{statsDic['connectsSaved']} - stale connections discarded: {statsDic['connectsDiscarded']}")
+
+        return logMsg
+
+class sqliteBackendClass(dbBackendClass):
+    """
+    SQLite reference backend.  The protocol Front End and Back End database paths are resolved to SQLite database files
+    via 'pathMap', paths not in the map resolve to 'defaultDB' (or are used as the SQLite file path when no default is
+    defined).  Mapping the Front End and Back End to the same SQLite file mirrors the Front End linked tables.
+
+    The Access SQL is translated to SQLite SQL via accessSQLTranslator.py, Access functions without a SQLite equivalent
+    (DateDiff) are registered as SQLite functions.  Query descriptions and push hashes are stored in table
+    'tsys_ObjectDescriptions'.
+    """
+
+    name = 'SQLite'
+
+    # Table holding the query descriptions and push hashes (Access stores these as QueryDef properties)
+    descriptionTable = 'tsys_ObjectDescriptions'
+
+    def __init__(self, defaultDB=None, pathMap=None):
+        """
+        Define the instantiated SQLite backend attributes
+
+        :param defaultDB: SQLite database file used for any database path not in 'pathMap'
+        :param pathMap: Dictionary of protocol database path (e.g. inDBBE, inDBFE) - SQLite database file
+
+        :return: instantiated self object
+        """
+
+        dbBackendClass.__init__(self)
+        self.defaultDB = defaultDB
+        self.pathMap = pathMap or {}
+        # Connections are per thread, list of all connections opened is retained for teardown
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        # Access SQL to SQLite SQL translator
+        self.translator = sqt.accessSQLTranslatorClass()
+
+    def resolvePath(self, inDB):
+        """
+        Resolve the passed protocol database path to the SQLite database file
+
+        :param inDB: path to the database being hit
+
+        :return: dbFile: SQLite database file
+        """
+
+        if inDB in self.pathMap:
+            return self.pathMap[inDB]
+        if self.defaultDB is not None:
+            return self.defaultDB
+        return inDB
+
+    def connection(self, inDB):
+        """
+        Get the connection for the calling thread to the SQLite database resolved for 'inDB', opening it on first use
+
+        :param inDB: path to the database being hit
+
+        :return: cnxn: sqlite3 connection
+        """
+
+        dbFile = self.resolvePath(inDB)
+        threadConnections = getattr(self.local, 'connections', None)
+        if threadConnections is None:
+            threadConnections = {}
+            self.local.connections = threadConnections
+
+        cnxn = threadConnections.get(dbFile)
+        if cnxn is None:
+            cnxn = sqlite3.connect(dbFile, timeout=30, check_same_thread=False)
+            sqliteBackendClass.registerAccessFunctions(cnxn)
+            threadConnections[dbFile] = cnxn
+            with self.lock:
+                self.connections.append(cnxn)
+
+        return cnxn
+
+    @contextmanager
+    def connectionContext(self, inDB):
+
+        yield self.connection(inDB)
+
+    def accessDateValue(value):
+        """
+        Convert a SQLite stored date/time value to a python datetime, time only values are placed on the Access zero
+        date (12/30/1899).
+
+        :param value: Date value (datetime, date, time or ISO formatted string)
+
+        :return: python datetime or None
+        """
+
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, date):
+            return datetime(value.year, value.month, value.day)
+        if isinstance(value, time):
+            return datetime.combine(date(1899, 12, 30), value)
+        value = str(value)
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return datetime.combine(date(1899, 12, 30), time.fromisoformat(value))
+
+    def accessDateDiff(interval, startValue, endValue):
+        """
+        Access 'DateDiff' for the intervals used in the QC SQL - 's', 'n', 'h', 'd', 'ww', 'm', 'yyyy'
+
+        :return: Difference in whole intervals or None
+        """
+
+        startDate = sqliteBackendClass.accessDateValue(startValue)
+        endDate = sqliteBackendClass.accessDateValue(endValue)
+        if startDate is None or endDate is None:
+            return None
+
+        interval = interval.lower()
+        if interval == 'yyyy':
+            return endDate.year - startDate.year
+        if interval == 'm':
+            return (endDate.year - startDate.year) * 12 + endDate.month - startDate.month
+
+        seconds = {'s': 1, 'n': 60, 'h': 3600, 'd': 86400, 'ww': 604800}[interval]
+        if interval in ('d', 'ww'):
+            # Access counts day boundaries crossed, not elapsed time
+            delta = datetime.combine(endDate.date(), time()) - datetime.combine(startDate.date(), time())
+        else:
+            delta = endDate.replace(microsecond=0) - startDate.replace(microsecond=0)
+        return int(delta.total_seconds() // seconds)
+
+    def registerAccessFunctions(cnxn):
+        """
+        Register the Access expression functions used in the QC SQL which are not translated to SQLite expressions
+        by the translator as SQLite functions.
+
+        :param cnxn: sqlite3 connection
+
+        :return:
+        """
+
+        cnxn.create_function('DateDiff', 3, sqliteBackendClass.accessDateDiff, deterministic=True)
+
+    def prepareSQL(self, query):
+        """
+        Prepare the passed SQL for execution in SQLite - Access SQL is translated to SQLite SQL, translations are cached
+        keyed by the source SQL.
+
+        :param query: SQL as written for Access
+
+        :return: SQL to be executed
+        """
+
+        return self.translator.translate(query)
+
+    def readDF(self, query, inDB):
+
+        cnxn = self.connection(inDB)
+        queryDf = pd.read_sql(self.prepareSQL(query), cnxn)
+
+        return queryDf
+
+    @contextmanager
+    def queryCursor(self, query, inDB):
+
+        cursor = self.connection(inDB).cursor()
+        try:
+            cursor.execute(self.prepareSQL(query))
+            yield cursor
+        finally:
+            cursor.close()
+
+    def execute(self, inQuery, inDB, params=None):
+
+        cnxn = self.connection(inDB)
+        try:
+            if params is None:
+                cnxn.execute(self.prepareSQL(inQuery))
+            else:
+                cnxn.execute(self.prepareSQL(inQuery), params)
+            cnxn.commit()
+        except Exception:
+            cnxn.rollback()
+            raise
+
+    def createView(self, inQuerySel, queryName, inDB):
+
+        fullQuery = f"CREATE VIEW {queryName} AS {self.prepareSQL(inQuerySel)}"
+
+        cnxn = self.connection(inDB)
+        cnxn.execute(fullQuery)
+        cnxn.commit()
+
+    def queryDefinitions(self, inDB):
+
+        cnxn = self.connection(inDB)
+        definitions = {}
+        for viewName, viewSQL in cnxn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'view'"):
+            # Stored as issued by 'createView' - 'CREATE VIEW name AS ...'
+            definitions[viewName] = (sqliteBackendClass.viewSelectSQL(viewSQL), None, None)
+
+        if self.objectExists(sqliteBackendClass.descriptionTable, inDB, 'table'):
+            self.descriptionTableReady(cnxn)
+            for objectName, description, pushHash in cnxn.execute(f"SELECT Object_Name, Description, Push_Hash FROM "
+                                                                  f"{sqliteBackendClass.descriptionTable}"):
+                if objectName in definitions:
+                    definitions[objectName] = (definitions[objectName][0], description, pushHash)
+
+        return definitions
+
+    def descriptionTableReady(self, cnxn):
+        """
+        Create the description table if it does not exist, a table created without the 'Push_Hash' column is altered
+
+        :param cnxn: sqlite3 connection
+
+        :return:
+        """
+
+        descriptionTable = sqliteBackendClass.descriptionTable
+        cnxn.execute(f"CREATE TABLE IF NOT EXISTS {descriptionTable} (Object_Name TEXT PRIMARY KEY, Description TEXT,"
+                     f" Push_Hash TEXT)")
+        columns = [record[1] for record in cnxn.execute(f"PRAGMA table_info({descriptionTable})")]
+        if 'Push_Hash' not in columns:
+            cnxn.execute(f"ALTER TABLE {descriptionTable} ADD COLUMN Push_Hash TEXT")
+
+    def recordPushHash(self, queryName, sourceHash, inDB):
+
+        cnxn = self.connection(inDB)
+        row = cnxn.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ? COLLATE NOCASE",
+                           (queryName,)).fetchone()
+        storedSQL = sqliteBackendClass.viewSelectSQL(row[0])
+        pushHash = f'{sourceHash}:{dm.generalDMClass.sqlHash(storedSQL)}'
+
+        self.descriptionTableReady(cnxn)
+        cnxn.execute(f"INSERT INTO {sqliteBackendClass.descriptionTable} (Object_Name, Push_Hash) VALUES (?, ?) ON "
+                     f"CONFLICT(Object_Name) DO UPDATE SET Push_Hash = excluded.Push_Hash", (queryName, pushHash))
+        cnxn.commit()
+
+        return pushHash
+
+    def viewSelectSQL(viewSQL):
+        """
+        Select statement of a view as stored in 'sqlite_master' - 'CREATE VIEW name AS ...' as issued by 'createView'
+
+        :param viewSQL: Stored view SQL
+
+        :return: selectSQL: Select statement of the view
+        """
+
+        return re.sub(r'^CREATE VIEW\s+\S+\s+AS\s+', '', viewSQL, flags=re.IGNORECASE)
+
+    def objectExists(self, objectName, inDB, objectType):
+
+        # Checked in 'sqlite_master'
+        sqliteType = 'table' if objectType == 'table' else 'view'
+        cnxn = self.connection(inDB)
+        row = cnxn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = ? AND name = ? COLLATE NOCASE",
+                           (sqliteType, objectName)).fetchone()
+
+        return row[0] > 0
+
+    def dropObject(self, objectName, inDB, objectType):
+
+        if not self.objectExists(objectName, inDB, objectType):
+            return False
+
+        sqliteType = 'TABLE' if objectType == 'table' else 'VIEW'
+        cnxn = self.connection(inDB)
+        cnxn.execute(f"DROP {sqliteType} [{objectName}]")
+        # The description and push hash are dropped with the query (as the Access QueryDef properties)
+        if objectType != 'table' and self.objectExists(sqliteBackendClass.descriptionTable, inDB, 'table'):
+            cnxn.execute(f"DELETE FROM {sqliteBackendClass.descriptionTable} WHERE Object_Name = ? COLLATE NOCASE",
+                         (objectName,))
+        cnxn.commit()
+
+        return True
+
+    def createTableFromDF(self, df, tableName, inDB, batchSize, fastExecuteMany):
+
+        col_defs = [f"[{column}] {dm.generalDMClass.accessColumnType(dtype)}" for column, dtype in
+                    zip(df.columns, df.dtypes)]
+        create_table_query = f"CREATE TABLE {tableName} ({', '.join(col_defs)})"
+        insert_query = f"INSERT INTO {tableName} VALUES ({', '.join(['?' for _ in df.columns])})"
+
+        records = dm.generalDMClass.frameToRecords(df)
+
+        cnxn = self.connection(inDB)
+        try:
+            cnxn.execute(create_table_query)
+            for start in range(0, len(records), batchSize):
+                cnxn.executemany(insert_query, records[start:start + batchSize])
+            cnxn.commit()
+        except Exception:
+            cnxn.rollback()
+            raise
+
+        return len(records)
+
+    def setDescription(self, queryName, description, inDB):
+
+        cnxn = self.connection(inDB)
+        self.descriptionTableReady(cnxn)
+        cnxn.execute(f"INSERT INTO {sqliteBackendClass.descriptionTable} (Object_Name, Description) VALUES (?, ?) ON "
+                     f"CONFLICT(Object_Name) DO UPDATE SET Description = excluded.Description", (queryName, description))
+        cnxn.commit()
+
+    def close(self):
+
+        self.clearPreparedCursors()
+        with self.lock:
+            connections = self.connections
+            self.connections = []
+        self.local = threading.local()
+
+        for cnxn in connections:
+            try:
+                cnxn.close()
+            except Exception:
+                pass
+
+        statsDic = self.translator.cacheStats()
+        logMsg = (f"Closed SQLite backend - {len(connections)} connections closed - SQL translations cached: "
+                  f"{statsDic['cachedStatements']} - translation cache hits: {statsDic['cacheHits']}")
+
+        return logMsg
+
+# Store python dates/times as ISO text in SQLite (default adapters are deprecated as of Python 3.12)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(time, lambda value: value.isoformat())
+
+if __name__ == "__name__":
+    logger.info("dbBackends.py")
@@ -6,18 +6,258 @@ import os.path
 import sys
 from datetime import datetime
 import traceback
-import pyodbc
-import pandas as pd
-import win32com.client
+import hashlib
 import logging
-import psutil
+import threading
+from contextlib import contextmanager
+import accessSession as acs
+import dbBackends as dbb
+import bufferedLog as bl
+from lazyImports import lazyModuleClass
+
+# Heavy and platform specific dependencies are imported on first use
+pd = lazyModuleClass('pandas')
+pyodbc = lazyModuleClass('pyodbc', installHint='install pyodbc and the Microsoft Access ODBC driver')
+psutil = lazyModuleClass('psutil', installHint='install psutil')
 
 logger = logging.getLogger(__name__)
 
+class connectionPoolClass:
+    """
+    Per-run pool of PYODBC connections to Access databases keyed by the full database path.  Opening an Access ODBC
+    connection on a network share is expensive, so connections are handed back to the pool after each call and reused
+    by the next call against the same database.  Connections are health checked before being reused and are closed
+    when 'closeAll' is called at the end of the run.  The prepared cursors the backend cached for a connection are
+    evicted when the pool closes the connection.
+    """
+
+    # ODBC 'SQLGetInfo' DBMS name info type (pyodbc.SQL_DBMS_NAME) used as the health check
+    odbcDBMSName = 17
+
+    def __init__(self, maxIdlePerDB=4):
+        """
+        Define the instantiated connection pool attributes
+
+        :param maxIdlePerDB: Maximum number of idle connections retained per database path
+
+        :return: instantiated self object
+        """
+
+        self.maxIdlePerDB = maxIdlePerDB
+        # Dictionary of database path - list of idle connections
+        self.idleConnections = {}
+        self.lock = threading.Lock()
+
+        # Counters used to report how many ODBC connects were saved by the pool
+        self.connectsOpened = 0
+        self.connectsReused = 0
+        self.connectsDiscarded = 0
+
+    def acquire(self, inDB):
+        """
+        Get a healthy connection for the passed database from the pool, opening a new connection if none are idle
+
+        :param inDB: Full path and name to access database
+
+        :return: cnxn: ODBC connection to access database
+        """
+
+        while True:
+            with self.lock:
+                idleList = self.idleConnections.get(inDB, [])
+                cnxn = idleList.pop() if idleList else None
+
+            if cnxn is None:
+                break
+
+            if connectionPoolClass.isHealthy(cnxn):
+                with self.lock:
+                    self.connectsReused += 1
+                return cnxn
+
+            # Stale connection - drop it and try the next idle connection
+            connectionPoolClass.discard(cnxn)
+            with self.lock:
+                self.connectsDiscarded += 1
+
+        cnxn = generalDMClass.connect_DB_Access(inDB)
+        with self.lock:
+            self.connectsOpened += 1
+
+        return cnxn
+
+    def release(self, inDB, cnxn):
+        """
+        Return a connection to the pool.  Any open transaction is rolled back so the next caller starts clean, and the
+        connection is closed instead if it is no longer healthy or the pool for the database is full.
+
+        :param inDB: Full path and name to access database
+        :param cnxn: ODBC connection to access database being returned
+
+        :return:
+        """
+
+        try:
+            cnxn.rollback()
+        except Exception:
+            connectionPoolClass.discard(cnxn)
+            with self.lock:
+                self.connectsDiscarded += 1
+            return
+
+        with self.lock:
+            idleList = self.idleConnections.setdefault(inDB, [])
+            if len(idleList) < self.maxIdlePerDB:
+                idleList.append(cnxn)
+                return
+
+        connectionPoolClass.discard(cnxn)
+
+    def isHealthy(cnxn):
+        """
+        Health check of a pooled connection prior to reuse
+
+        :param cnxn: ODBC connection to access database
+
+        :return: True if the connection is open and responds to the driver, else False
+        """
+
+        try:
+            if getattr(cnxn, 'closed', False):
+                return False
+            cnxn.getinfo(connectionPoolClass.odbcDBMSName)
+            return True
+        except Exception:
+            return False
+
+    def closeQuietly(cnxn):
+        """
+        Close a connection ignoring errors (i.e. connection already closed or the database has gone away)
+
+        :param cnxn: ODBC connection to access database
+
+        :return:
+        """
+
+        try:
+            cnxn.close()
+        except Exception:
+            pass
+
+    def discard(cnxn):
+        """
+        Close a connection leaving the pool - the prepared cursors cached for the connection by the run database
+        backend are evicted first
+
+        :param cnxn: ODBC connection to access database
+
+        :return:
+        """
+
+        generalDMClass.getBackend().evictPreparedCursors(cnxn)
+        connectionPoolClass.closeQuietly(cnxn)
+
+    def poolStats(self):
+        """
+        Summary of the pool usage for the run
+
+        :return: statsDic: Dictionary with the connects opened, reused (i.e. connects saved), discarded and idle
+        """
+
+        with self.lock:
+            idleCount = sum(len(idleList) for idleList in self.idleConnections.values())
+            statsDic = {'connectsOpened': self.connectsOpened,
+                        'connectsSaved': self.connectsReused,
+                        'connectsDiscarded': self.connectsDiscarded,
+                        'idleConnections': idleCount}
+
+        return statsDic
+
+    def closeAll(self):
+        """
+        Teardown - close all idle connections in the pool
+
+        :return: statsDic: Dictionary with the pool usage summary at the time of teardown
+        """
+
+        statsDic = self.poolStats()
+
+        with self.lock:
+            idleConnections = self.idleConnections
+            self.idleConnections = {}
+
+        for idleList in idleConnections.values():
+            for cnxn in idleList:
+                connectionPoolClass.discard(cnxn)
+
+        return statsDic
+
+class statementBatchClass:
+    """
+    Batch of write statements (with parameters) to be executed against one database in a single connection and
+    transaction via 'generalDMClass.executeBatch'.  Allows the writes of a QC check (or a full run) to be grouped
+    rather than each statement paying a connect/commit cycle.
+    """
+
+    def __init__(self, inDB):
+        """
+        Define the instantiated statement batch attributes
+
+        :param inDB: path to the database the statements are executed against
+
+        :return: instantiated self object
+        """
+
+        self.inDB = inDB
+        # List of (inQuery, params, label) tuples
+        self.statements = []
+
+    def add(self, inQuery, params=None, label=None):
+        """
+        Add a statement to the batch
+
+        :param inQuery: SQL action query
+        :param params: Optional sequence of parameter values for the '?' markers in the query
+        :param label: Label reported with the statement timing, defaults to the start of the SQL
+
+        :return:
+        """
+
+        if label is None:
+            label = inQuery[:60]
+        self.statements.append((inQuery, params, label))
+
+    def __len__(self):
+        return len(self.statements)
+
 class generalDMClass:
 
     dateNow = datetime.now().strftime('%Y%m%d')
 
+    # Per-run ODBC connection pool used by all the generalDMClass ODBC routines
+    connectionPool = connectionPoolClass()
+
+    # Database backend (dbBackends.dbBackendClass) serving the data access routines, Access backend if not set
+    backend = None
+
+    # Bulk load settings used by 'createTableFromDF'
+    bulkLoadBatchSize = 1000
+    fastExecuteMany = False
+
+    # Rows per chunk fetched by 'readChunksDF'
+    readChunkSize = 10000
+
+    # Per database locks serializing the object (query/table) creates and deletes when QC checks run concurrently -
+    # normalized database path: lock
+    objectLocks = {}
+    objectLocksLock = threading.Lock()
+
+    # Query fingerprint cache - normalized database path: {lower case query name: (source SQL hash, description)}.
+    # Read from the database once per run ('queryFingerprintCache') and kept current as queries are pushed, described
+    # and deleted, allows pushing an unchanged query to be skipped ('queryUpToDate')
+    queryFingerprints = {}
+    queryFingerprintsLock = threading.RLock()
+
     def __init__(self, logFile):
         """
         Define the instantiated general Data Management instantiation attributes
@@ -64,7 +304,8 @@ class generalDMClass:
     def messageLogFile(self, logMsg):
 
         """
-        Write Message to Logfile - routine add a date/time Now string time stamp
+        Write Message to Logfile - routine add a date/time Now string time stamp.  The message is echoed to the
+        console and queued on the background log writer (bufferedLog.py) which appends it to the logfile.
 
         :param self:  dmInstance
         :param logMsg: String with the logfile message to be appended to the Self.logFileName
@@ -78,11 +319,9 @@ class generalDMClass:
             #Get Current Time
             messageTime = generalDMClass.timeFun()
             logMsg = f'{logMsg} - {messageTime}'
-            print(logMsg)
 
-            logFile = open(logFileName_LU, "a")
-            logFile.write(logMsg + "\n")
-            logFile.close()
+            # Console echo, logfile append queued for the background log writer
+            bl.logWriter.write(logFileName_LU, logMsg, echo=True)
         except:
             traceback.print_exc(file=sys.stdout)
 
@@ -114,6 +353,113 @@ class generalDMClass:
         cnxn = pyodbc.connect(connStr)
         return cnxn
 
+    @contextmanager
+    def pooledConnection(inDB):
+        """
+        Context manager checking out a connection for the passed database from the per-run connection pool, the
+        connection is returned to the pool on exit.
+
+        :param inDB: Full path and name to access database
+
+        :return: cnxn: ODBC connection to access database
+        """
+
+        cnxn = generalDMClass.connectionPool.acquire(inDB)
+        try:
+            yield cnxn
+        finally:
+            generalDMClass.connectionPool.release(inDB, cnxn)
+
+    def closeConnections():
+        """
+        Close the run database backend connections (for Access all pooled ODBC connections), to be called once at the
+        end of the run.  For Access reports the number of ODBC connects saved by the pool.
+
+        :return: logMsg: String summarizing the connection usage for the run
+        """
+
+        logMsg = generalDMClass.getBackend().close()
+        logging.info(logMsg)
+
+        with generalDMClass.queryFingerprintsLock:
+            generalDMClass.queryFingerprints = {}
+
+        return logMsg
+
+    def getBackend():
+        """
+        Get the database backend serving the data access routines, defaults to the Access backend
+
+        :return: backend: dbBackends.dbBackendClass instance
+        """
+
+        if generalDMClass.backend is None:
+            generalDMClass.backend = dbb.accessBackendClass()
+
+        return generalDMClass.backend
+
+    def setBackend(backend):
+        """
+        Define the database backend serving the data access routines for the run (e.g. dbBackends.sqliteBackendClass)
+
+        :param backend: dbBackends.dbBackendClass instance
+
+        :return:
+        """
+
+        generalDMClass.backend = backend
+
+        with generalDMClass.queryFingerprintsLock:
+            generalDMClass.queryFingerprints = {}
+
+    @contextmanager
+    def backendSession():
+        """
+        Context manager holding the run database backend session open (for Access the COM session)
+
+        :return: session: backend session object
+        """
+
+        with generalDMClass.getBackend().session() as session:
+            yield session
+
+    @contextmanager
+    def objectLock(inDBPath):
+        """
+        Context manager holding the object lock of the database - query/table creates and deletes (i.e. changes to the
+        database object catalog) are serialized per database, reads and updates are not blocked.  Re-entrant.
+
+        :param inDBPath: path to database
+
+        :return:
+        """
+
+        lockKey = os.path.normcase(os.path.abspath(inDBPath))
+        with generalDMClass.objectLocksLock:
+            dbLock = generalDMClass.objectLocks.get(lockKey)
+            if dbLock is None:
+                dbLock = threading.RLock()
+                generalDMClass.objectLocks[lockKey] = dbLock
+
+        with dbLock:
+            yield
+
+    @contextmanager
+    def comSession():
+        """
+        Context manager returning the Access COM session active for the run.  When no session is active (i.e. a
+        routine called outside of 'process_QCRequest') a session is opened for the call and closed on exit.
+
+        :return: session: accessSessionClass instance
+        """
+
+        session = acs.accessSessionClass.activeSession
+        if session is not None:
+            yield session
+        else:
+            with acs.accessSessionClass() as session:
+                yield session
+
     def getLookUpValueAccess(self, cnxn, lookupTable, lookupField, lookupValue, lookupFieldValueFrom):
         """
         Find value in a lookup table using the passed variables, using a distinct clause expecting this to be used for
@@ -149,94 +495,278 @@ class generalDMClass:
 
         return lookupValueOut
 
-    def connect_to_AcessDB_DF(query, inDB):
+    def connect_to_AcessDB_DF(query, inDB, params=None):
 
         """
-        Connect to Access DB via PYODBC and perform defined query via pyodbc - return query in a dataframe
+        Perform defined query via the run database backend (default Access via pyodbc) - return query in a dataframe
 
         :param query: query to be processed
         :param inDB: path to the access database being hit
+        :param params: Optional sequence of parameter values for the '?' markers in the query, parameterized queries
+         are executed via the backend prepared statement cache
 
         :return: queryDf: query output dataframe
         """
-        connStr = (r"DRIVER={Microsoft Access Driver (*.mdb, *.accdb)};DBQ=" + inDB + ";")
-        cnxn = pyodbc.connect(connStr)
 
-        try:
-            queryDf = pd.read_sql(query, cnxn)
+        if params is None:
+            queryDf = generalDMClass.getBackend().readDF(query, inDB)
+        else:
+            queryDf = generalDMClass.getBackend().readPrepared(query, params, inDB)
 
+        return queryDf
 
-        except Exception as e:
 
-            # Check if 'queryDf' imported try and import via ODBC cursor
-            if 'queryDf' in locals() or 'queryDf' in globals():
-                print("Variable 'queryDf' exists - imported via read_sql")
-            else:
-                print("Variable 'queryDf' does not exist - try and import query via pyodbc cursor")
-                cursor = cnxn.cursor()
+    def readChunksDF(query, inDB, chunkSize=None):
 
-                # Execute the query
-                cursor.execute(query)
+        """
+        Perform defined query via the run database backend - yield the query output in dataframe chunks fetched via
+        'cursor.fetchmany'.  Peak memory is bounded by the chunk size rather than the size of the query output.
 
-                # Fetch all rows from the query
-                rows = cursor.fetchall()
+        :param query: query to be processed
+        :param inDB: path to the access database being hit
+        :param chunkSize: Maximum rows per chunk, defaults to 'generalDMClass.readChunkSize'
 
-                # Fetch the column names from the cursor description
-                columns = [column[0] for column in cursor.description]
+        :return: generator of query output dataframe chunks
+        """
 
-                # Create a DataFrame from the fetched rows and column names
-                queryDf = pd.DataFrame.from_records(rows, columns=columns)
-                cursor.close()
-                logMsg = "Import query - {query} via PYODBC - Cursor rather then pd.read_sql"
-                logging.info(logMsg, exc_info=True)
+        if chunkSize is None:
+            chunkSize = generalDMClass.readChunkSize
 
+        yield from generalDMClass.getBackend().readChunks(query, inDB, chunkSize)
 
-            print(f"WARNING Error in 'connect_to_AccessDB_DF' for - {query} - {e}")
-            logging.critical(logMsg, exc_info=True)
-            exit()
+    def readColumnarDF(query, inDB, categoricalColumns=None, parseDates=None, chunkSize=None):
 
+        """
+        Perform defined query via the run database backend - return query in a dataframe built column wise into typed
+        NumPy buffers (int32 IDs, datetime64 dates, categorical text) rather than row wise via 'pd.read_sql'
 
+        :param query: query to be processed
+        :param inDB: path to the access database being hit
+        :param categoricalColumns: List of text columns to be returned as pandas Categorical
+        :param parseDates: List of text columns holding dates to be returned as datetime64
+        :param chunkSize: Rows per fetchmany batch, defaults to 'generalDMClass.readChunkSize'
 
-        finally:
-            cnxn.close()
-            return queryDf
+        :return: queryDf: query output dataframe
+        """
+
+        if chunkSize is None:
+            chunkSize = generalDMClass.readChunkSize
+
+        queryDf = generalDMClass.getBackend().readColumnar(query, inDB, chunkSize,
+                                                           categoricalColumns=categoricalColumns,
+                                                           parseDates=parseDates)
 
+        return queryDf
+
+    def countQueryRecords(query, inDB, chunkSize=None):
 
-    def closeAccessDB():
         """
-        Closes any open Microsoft Access databases using pywin32 to hit the Access COM interface
+        Count the records returned by the defined query, streamed in chunks via 'readChunksDF'
+
+        :param query: query to be processed
+        :param inDB: path to the access database being hit
+        :param chunkSize: Maximum rows per chunk, defaults to 'generalDMClass.readChunkSize'
+
+        :return: recordCount: Number of records returned by the query
+        """
+
+        recordCount = 0
+        for chunkDF in generalDMClass.readChunksDF(query, inDB, chunkSize=chunkSize):
+            recordCount += len(chunkDF)
+
+        return recordCount
+
+    def tableFingerprint(tableName, inDB, dateField='Updated_Date', chunkSize=None):
+
+        """
+        Change fingerprint of a table - number of rows, maximum of the 'dateField' (if the table has the field) and an
+        order independent hash of all rows (sum of the pandas row hashes modulo 2^64).  The table is streamed in
+        chunks via 'readChunksDF'.
+
+        :param tableName: Name of the table
+        :param inDB: path to the access database being hit
+        :param dateField: Date field of the last record update
+        :param chunkSize: Maximum rows per chunk, defaults to 'generalDMClass.readChunkSize'
+
+        :return: fingerprint: Dictionary - Row_Count, Max_Updated_Date (ISO string or None), Row_Hash (string)
+        """
+
+        rowCount = 0
+        rowHash = 0
+        maxUpdated = None
+        for chunkDF in generalDMClass.readChunksDF(f'SELECT * FROM {tableName}', inDB, chunkSize=chunkSize):
+            rowCount += len(chunkDF)
+            if len(chunkDF) == 0:
+                continue
+
+            chunkHashes = pd.util.hash_pandas_object(chunkDF, index=False).to_numpy()
+            rowHash = (rowHash + int(chunkHashes.sum(dtype='uint64'))) % 2 ** 64
+
+            if dateField in chunkDF.columns:
+                chunkMax = pd.to_datetime(chunkDF[dateField], errors='coerce').max()
+                if pd.notna(chunkMax) and (maxUpdated is None or chunkMax > maxUpdated):
+                    maxUpdated = chunkMax
+
+        fingerprint = {'Row_Count': rowCount,
+                       'Max_Updated_Date': maxUpdated.isoformat() if maxUpdated is not None else None,
+                       'Row_Hash': str(rowHash)}
+
+        return fingerprint
+
+    def tableChangeStamp(tableName, inDB, dateField='Updated_Date', flagSuffix='QCFlag'):
+
+        """
+        Light weight change stamp of a table computed in the database with one aggregate query - number of rows,
+        maximum of the 'dateField' and the total length of the QC flag fields (fields ending with 'flagSuffix', changed
+        by the QC flag updates which do not set the 'dateField').  Unlike 'tableFingerprint' the table is not read,
+        edits not setting the 'dateField' are not detected.
+
+        :param tableName: Name of the table
+        :param inDB: path to the access database being hit
+        :param dateField: Date field of the last record update
+        :param flagSuffix: Suffix of the QC flag field names
+
+        :return: changeStamp: String of the aggregate values
+        """
+
+        columns = list(generalDMClass.connect_to_AcessDB_DF(f'SELECT * FROM {tableName} WHERE 1=0', inDB).columns)
+
+        aggregates = ['Count(*) AS Row_Count']
+        if dateField in columns:
+            aggregates.append(f'Max([{dateField}]) AS Max_Updated_Date')
+        for flagField in [column for column in columns if column.endswith(flagSuffix)]:
+            aggregates.append(f'Sum(Len([{flagField}])) AS [{flagField}_Length]')
+
+        stampDF = generalDMClass.connect_to_AcessDB_DF(f'SELECT {", ".join(aggregates)} FROM {tableName}', inDB)
+        changeStamp = '|'.join(str(value) for value in stampDF.iloc[0].tolist())
+
+        return changeStamp
+
+    def accessLockFile(inDBPath):
+        """
+        Path of the Access lock file for the passed database (.laccdb for .accdb, .ldb for .mdb)
+
+        :param inDBPath: Full path and name to access database
+
+        :return: lockFile: Full path of the lock file
+        """
+
+        root, extension = os.path.splitext(inDBPath)
+        lockFile = root + ('.ldb' if extension.lower() == '.mdb' else '.laccdb')
+
+        return lockFile
 
-        :return: outClose - string denoting successfully closing of all access DBs.
+    def closeAccessDB(dbPaths=None, deadline=10):
         """
+        Closes the Microsoft Access (MSACCESS.EXE) processes holding the passed databases open.  Only databases with an
+        Access lock file (.laccdb/.ldb) are checked; if none is present no processes are touched.  A process is
+        targeted if it has a database or its lock file open (open handles) or the database on its command line.
+        Unrelated Access sessions are left running.  Targeted processes are terminated concurrently with one overall
+        deadline, processes still running at the deadline are killed.  If 'dbPaths' is None all Access processes are
+        targeted (legacy behaviour).
+
+        :param dbPaths: List of Access database paths (e.g. [inDBFE, inDBBE]) or None for all Access processes
+        :param deadline: Overall seconds allowed for the targeted processes to exit before they are killed
+
+        :return: closeResult: Dictionary - lockFiles (lock files found), closed (pids exited after terminate),
+                 killed (pids killed at the deadline), failed (pid: error), skipped (pids of unrelated Access
+                 processes), lockFilesRemaining (lock files still present, e.g. held by another workstation),
+                 seconds (elapsed)
+        """
+
+        start = datetime.now()
+        closeResult = {'lockFiles': [], 'closed': [], 'killed': [], 'failed': {}, 'skipped': [],
+                       'lockFilesRemaining': [], 'seconds': 0.0}
 
         try:
-            # Find and close all Microsoft Access processes
-            for proc in psutil.process_iter(['pid', 'name']):
-                if proc.info['name'] and 'MSACCESS.EXE' in proc.info['name']:
-                    try:
-                        # Attempt to terminate the process
-                        p = psutil.Process(proc.info['pid'])
-                        p.terminate()
-                        p.wait(timeout=5)
-                        print(f"Closed Microsoft Access process with PID {proc.info['pid']}")
-                    except psutil.NoSuchProcess:
-                        print(f"No such process with PID {proc.info['pid']}")
-                    except psutil.AccessDenied:
-                        print(f"Access denied to terminate process with PID {proc.info['pid']}")
-                    except psutil.TimeoutExpired:
-                        print(f"Timeout expired while terminating process with PID {proc.info['pid']}")
-
-            outClose = "Successfully Closed All Access DB's"
-            return outClose
+            if dbPaths is None:
+                targetPaths = None
+            else:
+                lockFiles = [generalDMClass.accessLockFile(inDBPath) for inDBPath in dbPaths]
+                closeResult['lockFiles'] = [lockFile for lockFile in lockFiles if os.path.exists(lockFile)]
+                if not closeResult['lockFiles']:
+                    # No lock file - the databases are not open in Access
+                    return closeResult
+
+                targetPaths = {os.path.normcase(os.path.abspath(path)) for path in
+                               list(dbPaths) + closeResult['lockFiles']}
+
+            # Find the Access processes holding the databases
+            targets = []
+            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+                if not (proc.info['name'] and 'MSACCESS.EXE' in proc.info['name'].upper()):
+                    continue
+                if targetPaths is None or generalDMClass.processHoldsPaths(proc, targetPaths):
+                    targets.append(proc)
+                else:
+                    closeResult['skipped'].append(proc.pid)
+
+            # Terminate concurrently, one overall deadline for all processes to exit
+            for proc in targets:
+                try:
+                    proc.terminate()
+                except psutil.NoSuchProcess:
+                    pass
+                except psutil.AccessDenied as e:
+                    closeResult['failed'][proc.pid] = f'Access denied - {e}'
+
+            targets = [proc for proc in targets if proc.pid not in closeResult['failed']]
+            gone, alive = psutil.wait_procs(targets, timeout=deadline)
+            closeResult['closed'] = [proc.pid for proc in gone]
+
+            for proc in alive:
+                try:
+                    proc.kill()
+                    closeResult['killed'].append(proc.pid)
+                except psutil.NoSuchProcess:
+                    closeResult['closed'].append(proc.pid)
+                except psutil.AccessDenied as e:
+                    closeResult['failed'][proc.pid] = f'Access denied - {e}'
+            if closeResult['killed']:
+                psutil.wait_procs([proc for proc in alive if proc.pid in closeResult['killed']], timeout=5)
+
+            closeResult['lockFilesRemaining'] = [lockFile for lockFile in closeResult['lockFiles'] if
+                                                 os.path.exists(lockFile)]
+
+            logMsg = (f"closeAccessDB - Access processes closed: {closeResult['closed']} - killed: "
+                      f"{closeResult['killed']} - failed: {list(closeResult['failed'])} - unrelated left running: "
+                      f"{closeResult['skipped']}")
+            logging.info(logMsg)
 
         except Exception as e:
 
             logMsg = (f'ERROR - An error occurred generalDMClass.closeAccessDB: {e}')
-            dm.generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
             logging.critical(logMsg, exc_info=True)
             traceback.print_exc(file=sys.stdout)
 
+        finally:
+            closeResult['seconds'] = (datetime.now() - start).total_seconds()
+
+        return closeResult
 
+    def processHoldsPaths(proc, targetPaths):
+        """
+        Check if the process has any of the target paths open (open file handles) or on its command line
+
+        :param proc: psutil Process
+        :param targetPaths: Set of normalized (os.path.normcase/abspath) database and lock file paths
+
+        :return: True if the process holds any of the target paths, else False
+        """
+
+        cmdline = proc.info.get('cmdline') or []
+        for argument in cmdline:
+            if os.path.normcase(os.path.abspath(argument.strip('"'))) in targetPaths:
+                return True
+
+        try:
+            for openFile in proc.open_files():
+                if os.path.normcase(os.path.abspath(openFile.path)) in targetPaths:
+                    return True
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
+            pass
+
+        return False
 
     def queryExistsDeleteODBC(queryName, inDBPath):
         """
@@ -261,50 +791,130 @@ class generalDMClass:
 
     def queryExistsDelete(queryName, inDBPath):
         """
-        Check if query exists in the database if yes delete, using pywin32 to hit the Access COM interface, ODBC
-        doesn't have permissions to hit the 'MSYS' variables
+        Check if query exists in the database if yes delete, via the run database backend.  For Access uses pywin32 to
+        hit the Access COM interface (ODBC doesn't have permissions to hit the 'MSYS' variables) served from the run
+        Access COM session, existence is checked against the session object catalog.
 
         :param queryName: Name of query being pushed, will deleted first if exists
         :param inDBPath: path to database
 
         :return:
         """
-        # Initialize the Access application
-        access_app = win32com.client.Dispatch('Access.Application')
-
-        # Open the Access database
-        access_app.OpenCurrentDatabase(inDBPath)
-
-        # Get the current database object
-        db = access_app.CurrentDb()
 
         try:
-            # Check if the query exists before attempting to delete it
-            query_exists = False
-            for query in db.QueryDefs:
-                if query.Name == queryName:
-                    query_exists = True
-                    break
-
-            if query_exists:
-                # Delete the query
-                db.QueryDefs.Delete(queryName)
+            with generalDMClass.objectLock(inDBPath):
+                queryExists = generalDMClass.getBackend().dropObject(queryName, inDBPath, 'query')
+                generalDMClass.recordQueryFingerprint(queryName, inDBPath, dropped=True)
+
+            if queryExists:
                 print(f"Query '{queryName}' has been deleted from the database.")
             else:
                 print(f"Query '{queryName}' does not exist in the database.")
         except Exception as e:
             print(f"An error occurred: {e}")
-        finally:
-            # Close the database and quit Access
-            access_app.CloseCurrentDatabase()
-            access_app.Quit()
 
-        # Clean up COM objects
-        del access_app
+    def sqlHash(sql):
+        """
+        Hash of the normalized SQL text - whitespace collapsed, trailing semicolon removed, case insensitive
+
+        :param sql: SQL text
+
+        :return: sqlHash: Hex digest
+        """
+
+        normalizedSQL = ' '.join(str(sql).split()).rstrip('; ').lower()
+
+        return hashlib.sha1(normalizedSQL.encode('utf-8')).hexdigest()
+
+    def queryFingerprintCache(inDBPath):
+        """
+        Query fingerprints of the database, read from the database (via the run database backend) on first use.  The
+        fingerprint of a query is the hash of the SQL it was pushed from if the SQL stored by the database is unchanged
+        since the push, else None - queries edited outside of the workflow are pushed again.  Both hashes are recorded
+        with the query when pushed (push hash, for Access a QueryDef property) - Access rewrites the QueryDef SQL so
+        the stored SQL can not be compared with the source SQL.
+
+        :param inDBPath: path to database
+
+        :return: fingerprints: Dictionary - lower case query name: (source SQL hash or None, description)
+        """
+
+        cacheKey = os.path.normcase(os.path.abspath(inDBPath))
+        with generalDMClass.queryFingerprintsLock:
+            fingerprints = generalDMClass.queryFingerprints.get(cacheKey)
+            if fingerprints is None:
+                definitions = generalDMClass.getBackend().queryDefinitions(inDBPath)
+
+                fingerprints = {}
+                for queryName, (sql, description, pushHash) in definitions.items():
+                    sourceHash, _, recordedHash = (pushHash or '').partition(':')
+                    if not sourceHash or recordedHash != generalDMClass.sqlHash(sql):
+                        sourceHash = None
+                    fingerprints[queryName.lower()] = (sourceHash, description)
+
+                generalDMClass.queryFingerprints[cacheKey] = fingerprints
+
+        return fingerprints
+
+    def queryUpToDate(inQuerySel, queryName, inDBPath, description=None):
+        """
+        Check if the query exists in the database with the same (normalized) SQL and description
+
+        :param inQuerySel: SQL Query defining the query
+        :param queryName: Name of the query
+        :param inDBPath: path to database
+        :param description: Query description, None if the description is not compared
+
+        :return: upToDate: True if the query does not need to be pushed again
+        """
+
+        try:
+            with generalDMClass.queryFingerprintsLock:
+                fingerprint = generalDMClass.queryFingerprintCache(inDBPath).get(queryName.lower())
+        except Exception as e:
+            # Fingerprints not available (e.g. backend without query definitions) - push the query
+            logging.warning(f'Query fingerprints not available for - {inDBPath} - {e}')
+            return False
+
+        if fingerprint is None or fingerprint[0] != generalDMClass.sqlHash(inQuerySel):
+            return False
+
+        return description is None or fingerprint[1] == description
+
+    def recordQueryFingerprint(queryName, inDBPath, inQuerySel=None, description=None, pushed=False, dropped=False):
+        """
+        Keep the query fingerprint cache current after the query is pushed, described or deleted.  The cache is only
+        updated if already read from the database.
+
+        :param queryName: Name of the query
+        :param inDBPath: path to database
+        :param inQuerySel: SQL of the pushed query, None if the push hash was not recorded (no fingerprint)
+        :param description: Description set on the query
+        :param pushed: True if the query was pushed (the query has no description once pushed)
+        :param dropped: True if the query was deleted
+
+        :return:
+        """
+
+        cacheKey = os.path.normcase(os.path.abspath(inDBPath))
+        with generalDMClass.queryFingerprintsLock:
+            fingerprints = generalDMClass.queryFingerprints.get(cacheKey)
+            if fingerprints is None:
+                return
+
+            queryKey = queryName.lower()
+            if dropped:
+                fingerprints.pop(queryKey, None)
+            elif pushed:
+                sourceHash = generalDMClass.sqlHash(inQuerySel) if inQuerySel is not None else None
+                fingerprints[queryKey] = (sourceHash, None)
+            elif queryKey in fingerprints:
+                fingerprints[queryKey] = (fingerprints[queryKey][0], description)
 
     def pushQuery(inQuerySel, queryName, inDBPath):
         """
-        Push SQL query defined in 'inQuerySel' to the output query 'queryName'. Uses PyWin32 library.
+        Push SQL query defined in 'inQuerySel' to the output query 'queryName'. Uses PyWin32 library via the run Access
+        COM session.
 
         :param inQuerySel: SQL Query defining the query to be pushed back to the backend instance
         :param queryName: Name of query being pushed, will deleted first if exists
@@ -312,32 +922,19 @@ class generalDMClass:
 
         :return:
         """
-        # Initialize the Access application
-        access_app = win32com.client.Dispatch('Access.Application')
-
-        # Open the Access database
-        access_app.OpenCurrentDatabase(inDBPath)
-
-        # Get the current database object
-        db = access_app.CurrentDb()
 
         try:
-            # Create the new query
-            new_query = db.CreateQueryDef(queryName, inQuerySel)
+            with generalDMClass.comSession() as session:
+                session.pushQuery(inQuerySel, queryName, inDBPath)
             print(f"Query '{queryName}' has been created in the database.")
         except Exception as e:
             print(f"An error occurred: {e}")
-        finally:
-            # Close the database and quit Access
-            access_app.CloseCurrentDatabase()
-            access_app.Quit()
-
-        # Clean up COM objects
-        del access_app
 
     def pushQueryODBC (inQuerySel, queryName, inDBPath):
         """
-        Push SQL query defined in 'inQuerySel' to the output query 'queryName'. Using an ODBC Connection
+        Push SQL query defined in 'inQuerySel' to the output query 'queryName'. Using an ODBC Connection (via the run
+        database backend).  The push hash (hash of 'inQuerySel' and of the SQL as stored) is recorded with the query in
+        the same step, if it can not be recorded the query is pushed again on the next run.
 
         :param inQuerySel: SQL Query defining the query to be pushed back to the backend instance
         :param queryName: Name of query being pushed, will deleted first if exists
@@ -346,18 +943,16 @@ class generalDMClass:
         :return:
         """
 
-        # Connect via ODBC to Access Database
-        cnxn = generalDMClass.connect_DB_Access(inDBPath)
-
-        # Create a cursor object
-        cursor = cnxn.cursor()
-
-        #Define the full query
-        fullQuery = f"CREATE VIEW {queryName} AS {inQuerySel}"
-
         try:
-            cursor.execute(fullQuery)
-            cnxn.commit()
+            with generalDMClass.objectLock(inDBPath):
+                backend = generalDMClass.getBackend()
+                backend.createView(inQuerySel, queryName, inDBPath)
+                try:
+                    backend.recordPushHash(queryName, generalDMClass.sqlHash(inQuerySel), inDBPath)
+                except Exception as e:
+                    logging.warning(f'Push hash not recorded for - {queryName} - in {inDBPath} - {e}')
+                    inQuerySel = None
+                generalDMClass.recordQueryFingerprint(queryName, inDBPath, inQuerySel=inQuerySel, pushed=True)
             logMsg = f"Query '{queryName}' has been created in the database."
             print(logMsg)
             logging.info(logMsg, exc_info=True)
@@ -365,40 +960,90 @@ class generalDMClass:
         except Exception as e:
             print(f"Error: {e}")
 
-        # Close the connection
-        cnxn.close()
-
-    def excuteQuery(inQuery, inDBBE):
+    def excuteQuery(inQuery, inDBBE, params=None):
         """
         Routine runs a defined SQL Query in the passed database, Query will be performing an 'Update', 'Append'
         or 'Make Table'.  Query is not retained in the database only is executed.
-        Using PYODBC datbase connection
+        Using PYODBC datbase connection (via the run database backend)
 
         :param inQuery: SQL Query defining the query to be pushed back to the backend instance
         :param inDBBE: Path to access backend database
+        :param params: Optional sequence of parameter values for the '?' markers in the query, parameterized queries
+         are executed via the backend prepared statement cache
 
         :return:
         """
-        #Connect via ODBC to Access Database
-        cnxn = generalDMClass.connect_DB_Access(inDBBE)
 
         try:
-            # Create a cursor object
-            cursor = cnxn.cursor()
-            cursor.execute(inQuery)
-            cnxn.commit()
+            if params is None:
+                generalDMClass.getBackend().execute(inQuery, inDBBE)
+            else:
+                generalDMClass.getBackend().executeBatch([(inQuery, params)], inDBBE)
 
         except Exception as e:
             print(f"An error occurred in execute query {e}")
             traceback.print_exc(file=sys.stdout)
 
-        finally:
-            # Close the database and quit Access
-            cnxn.close()
+    def executeBatch(writeBatch, dmInstance=None):
+        """
+        Execute the statements in the batch on one connection in a single transaction via the run database backend,
+        rolling back all statements if any fail.  Per statement timing is written to the logfile (or logging if no
+        dmInstance).  The batch is emptied once executed.  A failed batch is logged, rolled back and the error raised,
+        callers must not treat the batch writes as committed.
+
+        :param writeBatch: statementBatchClass instance
+        :param dmInstance: Data Management Instance, optional
+
+        :return: timingDF: Dataframe with the Label and Seconds per statement
+        """
+
+        if len(writeBatch) == 0:
+            return pd.DataFrame(columns=['Label', 'Seconds'])
+
+        statements = writeBatch.statements
+        writeBatch.statements = []
+        try:
+            elapsedList = generalDMClass.getBackend().executeBatch([(inQuery, params) for inQuery, params, label in
+                                                                    statements], writeBatch.inDB)
+
+            timingDF = pd.DataFrame({'Label': [label for inQuery, params, label in statements],
+                                     'Seconds': elapsedList})
+            timingMsg = ', '.join(f'{label}: {seconds:.3f}s' for label, seconds in
+                                  zip(timingDF['Label'], timingDF['Seconds']))
+            logMsg = (f"Executed batch of {len(statements)} statements in one transaction - "
+                      f"{timingDF['Seconds'].sum():.3f}s - {timingMsg}")
+            if dmInstance is not None:
+                generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            logging.info(logMsg)
+
+            return timingDF
+
+        except Exception as e:
+            logMsg = f"ERROR - batch of {len(statements)} statements rolled back - {e}"
+            if dmInstance is not None:
+                generalDMClass.messageLogFile(dmInstance, logMsg=logMsg)
+            else:
+                print(logMsg)
+            logging.critical(logMsg, exc_info=True)
+            traceback.print_exc(file=sys.stdout)
+
+            raise
+
+    def statementCacheStats():
+        """
+        Prepared statement cache usage of the run database backend - parameterized statements, number of times each
+        was prepared and executed
+
+        :return: statsDF: Dataframe with the SQL, Prepares and Executions per statement
+        """
+
+        statsDF = generalDMClass.getBackend().statementCacheStats()
+
+        return statsDF
 
     def queryDesc(queryName_LU, queryDecrip_LU, qcCheckInstance):
         """
-        Add the query description to the passed query
+        Add the query description to the passed query, via the run database backend (Access COM session)
 
         :param queryName_LU: Name of query being pushed, will deleted first if exists
         :param queryDesc: Query description to be added to the query
@@ -408,18 +1053,7 @@ class generalDMClass:
         :return
         """
 
-        # Initialize the Access application
-        access_app = win32com.client.Dispatch('Access.Application')
-
         inDBPath = qcCheckInstance.inDBFE
-        # Open the Access database
-        access_app.OpenCurrentDatabase(inDBPath)
-
-        # Get the current database object
-        db = access_app.CurrentDb()
-
-        # Get the query definition
-        query_def = db.QueryDefs(queryName_LU)
 
         #Check that queryDescript_LU is less then 255 characters
         lenQueryDescription = len(queryDecrip_LU)
@@ -431,24 +1065,27 @@ class generalDMClass:
             exit()
 
         # Add the description property if it doesn't exist, or update it if it does
-        try:
-            query_def.Properties("Description").Value = queryDecrip_LU
-        except Exception as e:
-            # If the property does not exist, create it
-            new_prop = query_def.CreateProperty("Description", 10, queryDecrip_LU)  # 10 is the constant for dbText
-            query_def.Properties.Append(new_prop)
+        with generalDMClass.objectLock(inDBPath):
+            generalDMClass.getBackend().setDescription(queryName_LU, queryDecrip_LU, inDBPath)
+            generalDMClass.recordQueryFingerprint(queryName_LU, inDBPath, description=queryDecrip_LU)
+
+    def tableExists(tableName, inDBPath):
+        """
+        Check if the table exists in the database via the run database backend
 
-        # Clean up and close the database
-        access_app.CloseCurrentDatabase()
-        access_app.Quit()
+        :param tableName: Name of the table
+        :param inDBPath: path to database
 
-        # Clean up COM objects
-        del access_app
+        :return: True if the table exists, else False
+        """
+
+        return generalDMClass.getBackend().objectExists(tableName, inDBPath, 'table')
 
     def tableExistsDelete(tableName, inDBPath):
         """
-        Check if table exists in the database if yes delete, using pywin32 to hit the Access COM interface, ODBC
-        doesn't have permissions to hit the 'MSYS' variables
+        Check if table exists in the database if yes delete, via the run database backend.  For Access uses pywin32 to
+        hit the Access COM interface (ODBC doesn't have permissions to hit the 'MSYS' variables) served from the run
+        Access COM session, existence is checked against the session object catalog.
 
         :param tableName: Name of query being pushed, will deleted first if exists
         :param inDBPath: path to database
@@ -456,90 +1093,93 @@ class generalDMClass:
         :return:
         """
 
-        # Initialize the Access application
-        access_app = win32com.client.Dispatch('Access.Application')
-
-        # Open the Access database
-        access_app.OpenCurrentDatabase(inDBPath)
-
-        # Get the current database object
-        db = access_app.CurrentDb()
-
         try:
-            # Check if the query exists before attempting to delete it
-            tableExists = False
-            for table in db.TableDefs:
-                if table.Name == tableName:
-                    tableExists = True
-                    break
+            with generalDMClass.objectLock(inDBPath):
+                tableExists = generalDMClass.getBackend().dropObject(tableName, inDBPath, 'table')
 
             if tableExists:
-                # Delete the query
-                db.TableDefs.Delete(tableName)
                 print(f"Table '{tableName}' has been deleted from the database.")
             else:
                 print(f"Table '{tableName}' does not exist in the database.")
         except Exception as e:
             print(f"An error occurred: {e}")
-        finally:
-            # Close the database and quit Access
-            access_app.CloseCurrentDatabase()
-            access_app.Quit()
 
-        # Clean up COM objects
-        del access_app
+    def accessColumnType(dtype):
+        """
+        Define the Access column type for the passed pandas dtype.  Handles the numpy dtypes and the pandas nullable
+        extension dtypes (e.g. Int64, boolean, string, category).
+
+        :param dtype: pandas/numpy dtype of the dataframe column
 
-    def createTableFromDF(df, tableName, inDBPath):
+        :return: columnType: Access column type (INTEGER|DOUBLE|TEXT|DATETIME|YESNO)
         """
-        From Passed Dataframe create new table in Access DB
 
-        :param df: Data Frame to be created
-        :param tableName: Name of table to be created
-        :param inDBPath: Full path to backend database
+        # Categorical columns are typed on their categories
+        if isinstance(dtype, pd.CategoricalDtype):
+            return generalDMClass.accessColumnType(dtype.categories.dtype)
+
+        if pd.api.types.is_bool_dtype(dtype):
+            columnType = 'YESNO'
+        elif pd.api.types.is_integer_dtype(dtype):
+            columnType = 'INTEGER'
+        elif pd.api.types.is_float_dtype(dtype):
+            columnType = 'DOUBLE'
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            columnType = 'DATETIME'
+        elif pd.api.types.is_string_dtype(dtype) or pd.api.types.is_object_dtype(dtype):
+            columnType = 'TEXT'
+        else:
+            raise Exception(f"Unrecognized dtype: {dtype}")
 
-        :return:        """
-
-        cnxn = generalDMClass.connect_DB_Access(inDBPath)
-
-        # Get column names and types
-        columns = df.columns
-        dtypes = df.dtypes
-        col_defs = []
-
-        for column, dtype in zip(columns, dtypes):
-            if dtype == 'int64':
-                col_defs.append(f"[{column}] INTEGER")
-            elif dtype == 'float64':
-                col_defs.append(f"[{column}] DOUBLE")
-            elif dtype == 'object':
-                col_defs.append(f"[{column}] TEXT")
-            elif dtype == 'datetime64[ns]':
-                col_defs.append(f"[{column}] DATETIME")
-            elif dtype == 'bool':
-                col_defs.append(f"[{column}] YESNO")
-            else:
-                raise Exception(f"Unrecognized dtype: {dtype}")
+        return columnType
+
+    def frameToRecords(df):
+        """
+        Convert the passed dataframe to a list of row tuples of python values ready to be passed as ODBC parameters.
+        Missing values (NaN, NaT, pd.NA) are converted to None.
+
+        :param df: Data Frame to be converted
+
+        :return: records: list of row tuples
+        """
 
-        col_defs_str = ", ".join(col_defs)
+        outDF = df.astype(object).where(df.notna(), None)
 
-        create_table_query = f"CREATE TABLE {tableName} ({col_defs_str})"
-        # Create a cursor object
-        cursor = cnxn.cursor()
-        cursor.execute(create_table_query)
+        # Pass dates as python datetime rather than pandas Timestamp
+        for column, dtype in zip(df.columns, df.dtypes):
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                outDF[column] = pd.Series(df[column].dt.to_pydatetime(), index=df.index,
+                                          dtype=object).where(df[column].notna(), None)
 
-        # Insert data in the dataframe (i.e. df) into the created table
-        for index, row in df.iterrows():
-            insert_query = f"INSERT INTO {tableName} VALUES ({', '.join(['?' for _ in row])})"
-            cursor.execute(insert_query, tuple(row))
+        records = list(outDF.itertuples(index=False, name=None))
+
+        return records
+
+    def createTableFromDF(df, tableName, inDBPath, batchSize=None, fastExecuteMany=None):
+        """
+        From Passed Dataframe create new table in Access DB.  Rows are bulk loaded with 'executemany' in batches of
+        'batchSize' rows, the create and all inserts are committed as a single transaction (rolled back on failure).
+
+        :param df: Data Frame to be created
+        :param tableName: Name of table to be created
+        :param inDBPath: Full path to backend database
+        :param batchSize: Number of rows sent per executemany call, defaults to 'generalDMClass.bulkLoadBatchSize'
+        :param fastExecuteMany: Use the pyodbc 'fast_executemany' parameter arrays, defaults to
+         'generalDMClass.fastExecuteMany'.  Not all Access ODBC driver versions support parameter arrays.
+
+        :return:
+        """
 
-        # Commit the transaction
-        cnxn.commit()
+        if batchSize is None:
+            batchSize = generalDMClass.bulkLoadBatchSize
+        if fastExecuteMany is None:
+            fastExecuteMany = generalDMClass.fastExecuteMany
 
-        # Close the connection
-        cursor.close()
-        cnxn.close()
+        with generalDMClass.objectLock(inDBPath):
+            recordCount = generalDMClass.getBackend().createTableFromDF(df, tableName, inDBPath, batchSize,
+                                                                        fastExecuteMany)
 
-        print(f'Created Temp Table - {tableName}')
+        print(f'Created Temp Table - {tableName} - {recordCount} records')
 
     if __name__ == "__name__":
         logger.info("generalDM.py")
\ No newline at end of file
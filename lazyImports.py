@@ -0,0 +1,64 @@
+"""
+lazyImports.py
+Deferred imports for the heavy (pandas, numpy) and platform specific (pyodbc, psutil, pywin32) dependencies.  The
+module is imported on first attribute access rather than when the importing module is loaded, keeping the start up of
+the QC entry point fast and allowing the modules to be imported off Windows (e.g. for the SQLite backend).
+
+Usage: pd = lazyModuleClass('pandas') - 'pd.DataFrame' imports pandas on first use.
+"""
+import importlib
+import threading
+
+class lazyModuleClass:
+    """
+    Proxy for a module imported on first attribute access
+    """
+
+    def __init__(self, moduleName, installHint=None):
+        """
+        Define the instantiated lazy module attributes
+
+        :param moduleName: Name of the module to import on first use
+        :param installHint: Text added to the error raised if the module is not installed
+
+        :return: instantiated self object
+        """
+
+        self.__dict__['moduleName'] = moduleName
+        self.__dict__['installHint'] = installHint
+        self.__dict__['module'] = None
+        self.__dict__['lock'] = threading.Lock()
+
+    def load(self):
+        """
+        Import the module if not already imported
+
+        :return: module: The imported module
+        """
+
+        module = self.__dict__['module']
+        if module is not None:
+            return module
+
+        with self.__dict__['lock']:
+            if self.__dict__['module'] is None:
+                moduleName = self.__dict__['moduleName']
+                try:
+                    self.__dict__['module'] = importlib.import_module(moduleName)
+                except ImportError as e:
+                    installHint = self.__dict__['installHint']
+                    if installHint is None:
+                        raise
+                    raise ImportError(f"{e} - {installHint}") from e
+
+        return self.__dict__['module']
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self.load(), attribute, value)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__dict__['moduleName']}' ({state})>"
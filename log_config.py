@@ -1,18 +1,21 @@
 import logging
+import bufferedLog as bl
 """
 log_config.py
 log file configuration script
 
 """
 def setup_logging():
-    # Configure logging
+    # Configure logging - records are formatted and queued on the background log writer (bufferedLog.py), file I/O is
+    # performed by the writer thread in batches
+    logHandler = bl.bufferedLogHandler(bl.logWriter, 'ScriptProcessingLog.log',  # Log to a file
+                                       mode='w')        # Write to the file and truncate, option 'a' would append
+    logHandler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
     logging.basicConfig(level=logging.DEBUG,
-                        format='%(asctime)s - %(levelname)s - %(message)s',
-                        filename='ScriptProcessingLog.log',  # Log to a file
-                        filemode='w')        # Write to the file and truncate, option 'a' would append
+                        handlers=[logHandler])
 
 # Call the setup function to configure logging
 setup_logging()
 
 # Create a module-level logger
-logger = logging.getLogger(__name__)
\ No newline at end of file
+logger = logging.getLogger(__name__)
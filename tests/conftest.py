@@ -0,0 +1,190 @@
+"""
+conftest.py
+Shared pytest fixtures - a small Snowy Plover PORE database on the SQLite reference backend (dbBackends.py).  The
+Front End and Back End paths resolve to the same SQLite file, mirroring the Front End linked tables.
+"""
+import os
+import sys
+import random
+import sqlite3
+import datetime as dt
+import pytest
+
+# The QC modules are flat modules in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generalDM as dm
+import dbBackends as dbb
+import QC_Checks as qc
+
+# Year of the fixture QC runs
+fixtureYear = 2023
+
+# 'tbl_QCQueries' records - QueryName, QueryDescription, QCFlag, FlagFieldTable, FlagFieldQuery, FlagTable, JoinField
+qcQueries = [
+    ('qa_a102_Unverified_Events_X', 'Unverified events', None, None, None, None, None),
+    ('qa_f112_Incomplete_Weather_X', 'Incomplete weather', 'DFO', 'QCFlag', 'EventDetailsQCFlag', 'tbl_Event_Details',
+     'Event_ID'),
+    ('qa_f122_CompleteSurvey_IncompleteSNPL_X', 'Incomplete SNPL', 'DFO', 'QCFlag', 'EventDetailsQCFlag',
+     'tbl_Event_Details', 'Event_ID'),
+    ('qa_f132_MoreCheckedSNPL_ThanTotal_X', 'More checked', 'LESPC', 'QCFlag', 'EventDetailsQCFlag',
+     'tbl_Event_Details', 'Event_ID'),
+    ('qa_f142_MoreBandedSNPL_ThanChecked_X', 'More banded', 'LESPB', 'QCFlag', 'EventDetailsQCFlag',
+     'tbl_Event_Details', 'Event_ID'),
+    ('qa_f152_StopTime_MoreThanEvent_X', 'Stop time', 'LEPST', 'QCFlag', 'EventDetailsQCFlag', 'tbl_Event_Details',
+     'Event_ID'),
+    ('qa_h102_Missing_Observers_X', 'Missing observers', 'DFO', 'QCFlag', 'EventQCFlag', 'tbl_Events', 'Event_ID'),
+    ('qa_j102_SNPL_ObservationTime_Error_X', 'Observation time', 'LEOT', 'QCFlag', 'SNPLObsQCFlag',
+     'tbl_SNPL_Observations', 'SNPL_Data_ID'),
+    ('qa_j132_NestID_Year_Mismatch_X', 'Nest year', 'OEYDNM', 'QCFlag', 'SNPLObsQCFlag', 'tbl_SNPL_Observations',
+     'SNPL_Data_ID'),
+    ('qa_j142_Missing_Band_Totals_X', 'Missing band totals', 'ONBLE', 'QCFlag', 'SNPLObsQCFlag',
+     'tbl_SNPL_Observations', 'SNPL_Data_ID'),
+    ('qa_j152_Missing_Band_Data_X', 'Missing band data', 'SNBO', 'QCFlag', 'SNPLObsQCFlag', 'tbl_SNPL_Observations',
+     'SNPL_Data_ID'),
+    ('qa_j162_Mismatched_Band_Obs', 'Mismatched band observations', 'ONBM', 'QCFlag', 'SNPLObsQCFlag',
+     'tbl_SNPL_Observations', 'SNPL_Data_ID'),
+    ('qa_j172_Mismatched_Band_Summary', 'Mismatched band summary', 'ESBNA', 'QCFlag', 'EventDetailsQCFlag',
+     'tbl_Event_Details', 'Event_ID'),
+    ('qa_j182_Predator_ActivityType_X', 'Predator activity', 'PAVU', 'QCFlag', 'PredQCFlag', 'tbl_Predator_Survey',
+     'Predator_Data_ID')]
+
+fixtureSchema = '''
+CREATE TABLE tbl_Locations (Location_ID TEXT, Loc_Name TEXT);
+CREATE TABLE tbl_Events (Event_ID TEXT, Location_ID TEXT, Start_Date DATETIME, QCFlag TEXT, QCNotes TEXT,
+    Start_Time DATETIME, End_Time DATETIME, Created_Date DATETIME, Created_By TEXT, Verified_Date DATETIME,
+    Verified_By TEXT, Updated_Date DATETIME, Updated_By TEXT, DataProcessingLevelID INTEGER,
+    DataProcessingLevelDate DATETIME, DataProcessingLevelUser TEXT);
+CREATE TABLE tlu_Data_Processing_Level (DataProcessingLevelID INTEGER, Label TEXT);
+CREATE TABLE tbl_Event_Details (Event_ID TEXT, QCFlag TEXT, QCNotes TEXT, Incomplete_Survey YESNO, Wind_Spd DOUBLE,
+    Wind_Max DOUBLE, Wind_Dir TEXT, Air_Temp DOUBLE, Rel_Hum DOUBLE, Cloud_Cover DOUBLE, Event_Notes TEXT,
+    SNPL_Adults INTEGER, SNPL_Hatchlings INTEGER, SNPL_Fledglings INTEGER, SNPL_Checked_Bands INTEGER,
+    SNPL_Banded INTEGER, Predtor_Survey YESNO, Predator_Notes TEXT, PredatorStop INTEGER, Updated_Date DATETIME);
+CREATE TABLE xref_Event_Contacts (Event_ID TEXT, Contact_ID TEXT);
+CREATE TABLE tbl_SNPL_Observations (SNPL_Data_ID INTEGER, Event_ID TEXT, QCFlag TEXT, QCNotes TEXT,
+    SNPL_Time DATETIME, Nest_ID TEXT, SNPL_Bands INTEGER, SNPL_Male INTEGER, SNPL_Female INTEGER, SNPL_Unk INTEGER,
+    SNPL_Hatchlings INTEGER, SNPL_Fledglings INTEGER, Updated_Date DATETIME);
+CREATE TABLE tbl_SNPL_Banded (SNPL_Band_ID INTEGER, SNPL_Data_ID INTEGER, Left_Leg TEXT, Right_Leg TEXT,
+    Band_Notes TEXT);
+CREATE TABLE tbl_Nest_Master (Nest_ID TEXT, Year INTEGER);
+CREATE TABLE tbl_Predator_Survey (Predator_Data_ID INTEGER, Event_ID TEXT, QCFlag TEXT, QCNotes TEXT,
+    Predator_Type_ID INTEGER, GroupSize INTEGER, BinNumber INTEGER, ACT TEXT, Waypoint TEXT);
+CREATE TABLE tlu_Predator_Type (Predator_Type_ID INTEGER, Description TEXT);
+CREATE TABLE tlu_Predator_Actions (Predator_Action_ID TEXT);
+CREATE TABLE tbl_QCQueries (QueryName TEXT, QueryDescription TEXT, QCFlag TEXT, FlagFieldTable TEXT,
+    FlagFieldQuery TEXT, FlagTable TEXT, JoinField TEXT);
+CREATE TABLE tbl_QA_Results (Query_Name TEXT, Time_Frame TEXT, Query_Type INTEGER, Query_Result INTEGER,
+    Query_Run_Time DATETIME, Query_Description TEXT, QA_User TEXT, Is_Done INTEGER, Data_Scope INTEGER);
+'''
+
+def buildFixtureDB(dbPath, eventCount=60, seed=1):
+    """
+    Create the fixture database - random events over 2022 to 2024 with event details, observers, SNPL observations,
+    bands, nests and predator surveys, and the 'tbl_QCQueries' records of the SNPLPORE checks
+
+    :param dbPath: Path of the SQLite database file to be created
+    :param eventCount: Number of events
+    :param seed: Random seed
+
+    :return: dbPath
+    """
+
+    rnd = random.Random(seed)
+    cnxn = sqlite3.connect(dbPath)
+    cnxn.executescript(fixtureSchema)
+
+    locations = [('L1', 'Abbotts'), ('L2', 'Kehoe'), ('L3', 'Limantour')]
+    cnxn.executemany('INSERT INTO tbl_Locations VALUES (?, ?)', locations)
+    cnxn.executemany('INSERT INTO tlu_Data_Processing_Level VALUES (?, ?)', [(1, 'Raw'), (2, 'Accepted'),
+                                                                             (3, 'Certified')])
+    cnxn.executemany('INSERT INTO tlu_Predator_Type VALUES (?, ?)', [(1, 'Raven'), (2, 'Fox')])
+    cnxn.executemany('INSERT INTO tlu_Predator_Actions VALUES (?)', [('A',), ('F',), ('S',), ('W',)])
+
+    def nullable(value):
+        return None if rnd.random() < 0.1 else value
+
+    snplID = 1
+    bandID = 1
+    predatorID = 1
+    for eventIndex in range(eventCount):
+        eventID = f'E{eventIndex:04d}'
+        year = rnd.choice([2022, 2023, 2023, 2024])
+        startDate = dt.datetime(year, rnd.randint(3, 9), rnd.randint(1, 28))
+        startTime = dt.time(rnd.randint(6, 9), rnd.choice([0, 15, 30]))
+        endTime = dt.time(rnd.randint(10, 13), rnd.choice([0, 30]))
+        cnxn.execute('INSERT INTO tbl_Events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     (eventID, rnd.choice(locations)[0], startDate.isoformat(' '),
+                      rnd.choice([None, 'DFO', 'DFOX', 'LESPC;DFO']), None, f'1899-12-30 {startTime.isoformat()}',
+                      f'1899-12-30 {endTime.isoformat()}', None, None, None, None, startDate.isoformat(' '), None,
+                      rnd.choice([None, 1, 2, 3]), None, None))
+
+        cnxn.execute('INSERT INTO tbl_Event_Details VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     (eventID, rnd.choice([None, 'DFO', 'LESPC']), None, rnd.choice([0, 0, 0, -1]), nullable(3.0),
+                      nullable(5.0), nullable('N'), nullable(15.0), nullable(80.0), nullable(20.0), None,
+                      nullable(rnd.randint(0, 5)), nullable(rnd.randint(0, 2)), nullable(rnd.randint(0, 2)),
+                      nullable(rnd.randint(0, 8)), nullable(rnd.randint(0, 4)), 0, None, rnd.randint(0, 400), None))
+
+        if rnd.random() < 0.8:
+            cnxn.execute('INSERT INTO xref_Event_Contacts VALUES (?, ?)', (eventID, 'C1'))
+
+        for _ in range(rnd.randint(0, 3)):
+            snplTime = dt.time(rnd.randint(5, 14), rnd.randint(0, 59))
+            cnxn.execute('INSERT INTO tbl_SNPL_Observations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (snplID, eventID, rnd.choice([None, 'ONBM', 'LEOT']), None,
+                          f'1899-12-30 {snplTime.isoformat()}', rnd.choice([None, f'N{year}1', f'N{year - 1}2']),
+                          rnd.choice([None, 0, 1, 2]), 1, 1, 0, 0, 0, None))
+            for _ in range(rnd.choice([0, 1, 2])):
+                cnxn.execute('INSERT INTO tbl_SNPL_Banded VALUES (?, ?, ?, ?, ?)', (bandID, snplID, 'R', 'G', None))
+                bandID += 1
+            snplID += 1
+
+        if rnd.random() < 0.4:
+            cnxn.execute('INSERT INTO tbl_Predator_Survey VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (predatorID, eventID, None, None, rnd.choice([1, 2]), 1, 1, rnd.choice(['A', 'F', 'X', 'Z']),
+                          None))
+            predatorID += 1
+
+    for year in (2021, 2022, 2023, 2024):
+        cnxn.execute('INSERT INTO tbl_Nest_Master VALUES (?, ?)', (f'N{year}1', year))
+        cnxn.execute('INSERT INTO tbl_Nest_Master VALUES (?, ?)', (f'N{year}2', year + 1))
+
+    cnxn.executemany('INSERT INTO tbl_QCQueries VALUES (?, ?, ?, ?, ?, ?, ?)', qcQueries)
+    cnxn.commit()
+    cnxn.close()
+
+    return dbPath
+
+@pytest.fixture
+def sqliteBackend(tmp_path):
+    """
+    SQLite reference backend over the fixture database, the run backend is restored after the test.  The Front End
+    and Back End paths are unique per test (per path caches) and resolve to the fixture database.
+
+    :return: (inDBBE, inDBFE, dbPath)
+    """
+
+    dbPath = buildFixtureDB(str(tmp_path / 'SNPLPORE.sqlite'))
+    previousBackend = dm.generalDMClass.backend
+    dm.generalDMClass.setBackend(dbb.sqliteBackendClass(defaultDB=dbPath))
+    try:
+        yield str(tmp_path / 'SNPLPORE_BE.accdb'), str(tmp_path / 'SNPLPORE_FE.accdb'), dbPath
+    finally:
+        dm.generalDMClass.closeConnections()
+        dm.generalDMClass.setBackend(previousBackend)
+
+@pytest.fixture
+def qcCheckInstance(sqliteBackend):
+    """
+    QC Check Instance for the fixture year
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    return qc.qcChecks(protocol='SNPLPORE', inDBBE=inDBBE, inDBFE=inDBFE, yearLU=fixtureYear, inUser='tester')
+
+@pytest.fixture
+def dmInstance(tmp_path):
+    """
+    Data Management Instance logging to a file in the test directory
+    """
+
+    return dm.generalDMClass(str(tmp_path / 'QC_logFile.txt'))
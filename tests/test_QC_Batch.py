@@ -0,0 +1,76 @@
+"""
+test_QC_Batch.py
+Multi-year batch mode (QC_Batch.py) on the SQLite reference backend.
+"""
+import sqlite3
+import pytest
+import QC_Batch as qcb
+import QC_Registry as qcr
+import bufferedLog as bl
+
+@pytest.mark.parametrize('yearRange, expected', [
+    ('2023', [2023]),
+    ('2019-2021,2023', [2019, 2020, 2021, 2023]),
+    (' 2021 , 2019-2021 ', [2021, 2019, 2020]),
+    ('2023-2021', [2021, 2022, 2023]),
+    ('2022,2022,,2020-2020', [2022, 2020]),
+])
+def test_parseYears(yearRange, expected):
+    """
+    Year lists, ranges, duplicates (first occurrence kept) and reversed ranges
+    """
+
+    assert qcb.qcBatchClass.parseYears(yearRange) == expected
+
+def batchQAResults(dbPath):
+    """
+    Number of 'tbl_QA_Results' records per year
+
+    :return: Dictionary - Time_Frame: record count
+    """
+
+    cnxn = sqlite3.connect(dbPath)
+    records = cnxn.execute('SELECT Time_Frame, Count(*) FROM tbl_QA_Results GROUP BY Time_Frame').fetchall()
+    cnxn.close()
+    return {str(timeFrame): count for timeFrame, count in records}
+
+def test_batchRunsAllYears(dmInstance, sqliteBackend):
+    """
+    The QC checks of every year of the batch are processed and timed
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    batch = qcb.qcBatchClass(protocol='SNPLPORE', inDBBE=inDBBE, inDBFE=inDBFE, years=[2022, 2023], inUser='tester')
+
+    yearSeconds = batch.run(dmInstance, jobs=2)
+
+    assert list(yearSeconds) == [2022, 2023]
+    assert batch.failedYears == []
+    assert batchQAResults(dbPath) == {'2022': 14, '2023': 14}
+
+def test_batchContinuesAfterExit(dmInstance, sqliteBackend, monkeypatch, tmp_path):
+    """
+    A SystemExit from the prefetched yearly records of a year is recorded as a failed year, the following years are
+    processed and the batch times are reported
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    protocolClass = qcr.qcRegistryClass.loadProtocol('SNPLPORE')
+    createYearlyRecs = protocolClass.createYearlyRecs
+
+    def exitingYearlyRecs(qcCheckInstance):
+        if qcCheckInstance.yearLU == 2022:
+            raise SystemExit()
+        return createYearlyRecs(qcCheckInstance)
+
+    monkeypatch.setattr(protocolClass, 'createYearlyRecs', exitingYearlyRecs)
+    batch = qcb.qcBatchClass(protocol='SNPLPORE', inDBBE=inDBBE, inDBFE=inDBFE, years=[2022, 2023], inUser='tester')
+
+    yearSeconds = batch.run(dmInstance)
+
+    assert list(yearSeconds) == [2022, 2023]
+    assert batch.failedYears == [2022]
+    assert batchQAResults(dbPath) == {'2023': 14}
+    bl.logWriter.flush()
+    with open(tmp_path / 'QC_logFile.txt') as logFile:
+        assert 'failed years: [2022]' in logFile.read()
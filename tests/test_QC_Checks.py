@@ -0,0 +1,171 @@
+"""
+test_QC_Checks.py
+General QC routines (QC_Checks.py) on the SQLite reference backend.
+"""
+import sqlite3
+import pytest
+import pandas as pd
+import QC_Checks as qc
+import QC_Registry as qcr
+
+def flagTableRecords(dbPath, tableName):
+    """
+    Records of a flag table ordered by the join field
+
+    :return: List of (Event_ID, QCFlag)
+    """
+
+    cnxn = sqlite3.connect(dbPath)
+    records = cnxn.execute(f'SELECT Event_ID, QCFlag FROM {tableName} ORDER BY Event_ID').fetchall()
+    cnxn.close()
+    return records
+
+@pytest.mark.parametrize('keyCount', [1, 50, 123])
+@pytest.mark.parametrize('qcFlag', ['DFO', "O'BS"])
+def test_flagKeyedMatchesTempTable(keyCount, qcFlag, sqliteBackend):
+    """
+    The keyed 'IN' list flag update and the temp table join update flag the same records with the same flag value -
+    key counts not a multiple of the chunk size, records with and without an existing flag
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    existingFlags = [None, 'LESPC', 'LESPC;DFX']
+    records = [(f'EV{i:04d}', existingFlags[i % len(existingFlags)]) for i in range(200)]
+
+    cnxn = sqlite3.connect(dbPath)
+    for tableName in ['tbl_FlagKeyed', 'tbl_FlagTemp']:
+        cnxn.execute(f'CREATE TABLE {tableName} (Event_ID VARCHAR(50), QCFlag VARCHAR(255))')
+        cnxn.executemany(f'INSERT INTO {tableName} VALUES (?, ?)', records)
+    cnxn.commit()
+    cnxn.close()
+
+    keysDF = pd.DataFrame({'Event_ID': [record[0] for record in records[:keyCount]]})
+    for tableName, function in [('tbl_FlagKeyed', qc.qcChecks.applyFlagKeyed),
+                                ('tbl_FlagTemp', qc.qcChecks.applyFlagTempTable)]:
+        querySpec = qc.qcQuerySpecClass(queryName='qa_Test', qcFlag=qcFlag, flagFieldTable='QCFlag',
+                                        flagFieldQuery='QCFlag', flagTable=tableName, joinField='Event_ID')
+        function(querySpec, keysDF, inDBBE)
+
+    keyedRecords = flagTableRecords(dbPath, 'tbl_FlagKeyed')
+    assert keyedRecords == flagTableRecords(dbPath, 'tbl_FlagTemp')
+
+    expected = [(eventID, qcFlag if flag is None else f'{flag};{qcFlag}') if i < keyCount else (eventID, flag)
+                for i, (eventID, flag) in enumerate(records)]
+    assert keyedRecords == expected
+
+def test_flagCandidatesMatchTokenRule(qcCheckInstance, dmInstance, sqliteBackend, monkeypatch):
+    """
+    The flag candidate pushdown, the client side filter and 'hasQCFlag' apply the same flag code rule - exact,
+    untrimmed and case insensitive
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    flagValues = ['DFO', 'DFOX', 'A; DFO', 'dfo', 'LESPC;DFO', None, 'DFO ', ';;DFO;', 'XDFO', '', 'LESPC']
+    records = [(f'EV{i:04d}', value) for i, value in enumerate(flagValues)]
+
+    cnxn = sqlite3.connect(dbPath)
+    cnxn.execute('CREATE TABLE tbl_FlagValues (Event_ID VARCHAR(50), QCFlag VARCHAR(255))')
+    cnxn.executemany('INSERT INTO tbl_FlagValues VALUES (?, ?)', records)
+    cnxn.commit()
+    cnxn.close()
+
+    querySpec = qc.qcQuerySpecClass(queryName='tbl_FlagValues', qcFlag='DFO', flagFieldTable='QCFlag',
+                                    flagFieldQuery='QCFlag', flagTable='tbl_FlagValues', joinField='Event_ID')
+
+    hasFlag = qc.qcChecks.hasQCFlag(pd.Series(flagValues, dtype=object), 'DFO')
+    expected = [eventID for (eventID, value), flagged in zip(records, hasFlag) if not flagged]
+    assert expected == ['EV0001', 'EV0002', 'EV0005', 'EV0006', 'EV0008', 'EV0009', 'EV0010']
+
+    pushdownDF = qc.qcChecks.flagCandidateKeys(querySpec, qcCheckInstance, dmInstance)
+    monkeypatch.setattr(qc.qcChecks, 'flagCandidatePushdown', False)
+    clientDF = qc.qcChecks.flagCandidateKeys(querySpec, qcCheckInstance, dmInstance)
+
+    assert sorted(pushdownDF['Event_ID']) == expected
+    assert sorted(clientDF['Event_ID']) == expected
+
+def test_rolledBackCheckHasNoQAResult(qcCheckInstance, dmInstance, sqliteBackend):
+    """
+    A check whose flag batch is rolled back writes no 'tbl_QA_Results' record - the error is raised by the check
+    (no exit), the run stops and reports it, the summaries of the checks committed before it are written
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    cnxn = sqlite3.connect(dbPath)
+    cnxn.execute("CREATE TRIGGER trg_NoUpdate BEFORE UPDATE ON tbl_Event_Details BEGIN SELECT RAISE(ABORT, "
+                 "'tbl_Event_Details is read only'); END;")
+    cnxn.commit()
+
+    assert not qc.qcChecks.process_QCRequest(qcCheckInstance, dmInstance, jobs=1)
+
+    queryNames = {record[0] for record in cnxn.execute('SELECT Query_Name FROM tbl_QA_Results')}
+    cnxn.close()
+    assert queryNames == {'qa_a102_Unverified_Events_X'}
+
+def test_tempTablesDroppedAfterRun(qcCheckInstance, dmInstance, sqliteBackend, monkeypatch):
+    """
+    The temp tables of the temp table flag updates are dropped at the end of the run, the flags are applied
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    monkeypatch.setattr(qc.qcChecks, 'flagKeyedMaxKeys', 0)
+
+    qc.qcChecks.process_QCRequest(qcCheckInstance, dmInstance, jobs=1)
+
+    cnxn = sqlite3.connect(dbPath)
+    tempTables = cnxn.execute("SELECT name FROM sqlite_master WHERE name LIKE 'tmpQCTable%'").fetchall()
+    flagged = cnxn.execute("SELECT Count(*) FROM tbl_Event_Details WHERE QCFlag LIKE '%LEPST%'").fetchone()[0]
+    cnxn.close()
+    assert tempTables == []
+    assert flagged > 0
+    assert qcCheckInstance.tempTables == set()
+
+def test_unregisteredQueryRaises(qcCheckInstance, dmInstance, sqliteBackend):
+    """
+    A 'tbl_QCQueries' query without a registered QC check raises (no exit) and stops the run
+    """
+
+    protocolClass = qcr.qcRegistryClass.loadProtocol('SNPLPORE')
+    querySpec = qc.qcQuerySpecClass(queryName='qa_z999_Not_Registered')
+
+    with pytest.raises(ValueError, match='qa_z999_Not_Registered'):
+        protocolClass.processQuery(querySpec, None, qcCheckInstance, dmInstance)
+
+@pytest.mark.parametrize('functionName', ['qa_h102_Missing_Observers', 'qa_j102_SNPL_ObservationTime_Error',
+                                          'qa_j112_Mismatched_SNPL_Numbers_Adults',
+                                          'qa_j112_Mismatched_SNPL_Numbers_Fledglings',
+                                          'qa_j112_Mismatched_SNPL_Numbers_Hatchlings', 'qa_j132_NestID_Year_Mismatch',
+                                          'qa_j142_Missing_Band_Totals', 'qa_j152_Missing_Band_Data'])
+def test_recValueMatchesEventTable(functionName, qcCheckInstance, dmInstance, sqliteBackend):
+    """
+    'qsel_QA_Control.Event_ID AS RecValue' returns the same records as the previous 'tbl_Events.Event_ID AS RecValue'
+    (tbl_Events is not in the FROM clause - evaluated here as the tbl_Events record of the control query event)
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    # Nest years not matching the observation year (none in the fixture) for the j132 check
+    cnxn = sqlite3.connect(dbPath)
+    cnxn.execute("UPDATE tbl_Nest_Master SET Year = Year - 1 WHERE Nest_ID = 'N20231'")
+    cnxn.commit()
+    cnxn.close()
+
+    protocolClass = qcr.qcRegistryClass.loadProtocol('SNPLPORE')
+    yearlyRecDF, inQuerySel = protocolClass.createYearlyRecs(qcCheckInstance)
+    qc.qcChecks.pushQueryToDB(inQuerySel, 'qsel_QA_Control', qcCheckInstance, dmInstance)
+
+    if functionName.startswith('qa_j112'):
+        # Legacy routines reading the 'qasub_j112_Mismatched_SNPL_Numbers' summary pushed by the j122 routine
+        protocolClass.qa_j122_Mismatched_Banded_Numbers('Summary', yearlyRecDF, qcCheckInstance, dmInstance)
+
+    checkFunction = getattr(protocolClass, functionName)
+    newSQL = checkFunction('RecValue check', yearlyRecDF, qcCheckInstance, dmInstance)[0]
+    assert newSQL.count('qsel_QA_Control.Event_ID AS RecValue') == 1
+    oldSQL = newSQL.replace('qsel_QA_Control.Event_ID AS RecValue', '(SELECT tbl_Events.Event_ID FROM tbl_Events '
+                            'WHERE tbl_Events.Event_ID = qsel_QA_Control.Event_ID) AS RecValue')
+
+    newDF = qc.dm.generalDMClass.connect_to_AcessDB_DF(newSQL, qcCheckInstance.inDBFE)
+    oldDF = qc.dm.generalDMClass.connect_to_AcessDB_DF(oldSQL, qcCheckInstance.inDBFE)
+
+    assert len(newDF) > 0
+    assert list(newDF.columns) == list(oldDF.columns)
+    assert sorted(newDF.astype(str).itertuples(index=False)) == sorted(oldDF.astype(str).itertuples(index=False))
+    assert (newDF['RecValue'] == newDF['Event_ID']).all()
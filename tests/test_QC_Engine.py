@@ -0,0 +1,98 @@
+"""
+test_QC_Engine.py
+In-memory evaluation engine (QC_Engine.py, QC_Engine_SNPLPORE.py) against the pushed QC queries on the SQLite
+reference backend.
+"""
+import sqlite3
+import pytest
+import generalDM as dm
+import QC_Checks as qc
+import QC_Registry as qcr
+import QC_Engine as qe
+import QC_Engine_SNPLPORE as qce
+
+def loadEngine(qcCheckInstance, dmInstance):
+    """
+    Push the yearly filter query and load the protocol engine for the fixture year
+
+    :return: (engine, yearlyRecDF, querySpecs)
+    """
+
+    protocolClass = qcr.qcRegistryClass.loadProtocol('SNPLPORE')
+    yearlyRecDF, inQuerySel = protocolClass.createYearlyRecs(qcCheckInstance)
+    qc.qcChecks.pushQueryToDB(inQuerySel, 'qsel_QA_Control', qcCheckInstance, dmInstance)
+    querySpecs = qc.qcChecks.define_QuerySpecs(qc.qcChecks.define_QCQueries(qcCheckInstance))
+
+    engine = protocolClass.engineClass(qcCheckInstance, yearlyRecDF)
+    assert engine.load(dmInstance)
+
+    return engine, yearlyRecDF, querySpecs
+
+@pytest.mark.parametrize('queryName', sorted(qce.qcEngineSNPLPOREClass.evaluators))
+def test_evaluatorParity(queryName, qcCheckInstance, dmInstance):
+    """
+    Every evaluator returns the records of its pushed QC query - record count and distinct join field values
+    """
+
+    engine, yearlyRecDF, querySpecs = loadEngine(qcCheckInstance, dmInstance)
+    querySpec = querySpecs[queryName]
+
+    checkSpec = qcr.qcRegistryClass.getCheck('SNPLPORE', queryName)
+    inQuerySel = checkSpec.function(querySpec.queryDescription, yearlyRecDF, qcCheckInstance, dmInstance)[0]
+    qc.qcChecks.pushQueryToDB(inQuerySel, queryName, qcCheckInstance, dmInstance)
+
+    resultDF = engine.evaluate(queryName)
+    sqlDF = dm.generalDMClass.connect_to_AcessDB_DF(f'SELECT * FROM [{queryName}]', qcCheckInstance.inDBFE)
+
+    assert len(resultDF) == len(sqlDF)
+    if querySpec.joinField is not None:
+        assert (qe.qcEngineClass.parityKeys(resultDF[querySpec.joinField].unique()) ==
+                qe.qcEngineClass.parityKeys(sqlDF[querySpec.joinField].unique()))
+    assert engine.checkParity(querySpec, resultDF, dmInstance)
+
+def test_evaluatorsCoverQueries(qcCheckInstance):
+    """
+    The fixture 'tbl_QCQueries' defines every query with an evaluator
+    """
+
+    querySpecs = qc.qcChecks.define_QuerySpecs(qc.qcChecks.define_QCQueries(qcCheckInstance))
+
+    assert set(qce.qcEngineSNPLPOREClass.evaluators) <= set(querySpecs)
+
+def test_flagsRecordedAfterCommit(qcCheckInstance, dmInstance, sqliteBackend):
+    """
+    The engine flag state is only updated once the flag batch of the check is committed - a rolled back batch
+    leaves the flag table and the engine flag state unchanged
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    engine, yearlyRecDF, querySpecs = loadEngine(qcCheckInstance, dmInstance)
+    qcCheckInstance.engine = engine
+    querySpec = querySpecs['qa_f112_Incomplete_Weather_X']
+    protocolClass = qcr.qcRegistryClass.loadProtocol('SNPLPORE')
+
+    # Flag updates of tbl_Event_Details fail
+    cnxn = sqlite3.connect(dbPath)
+    cnxn.execute("CREATE TRIGGER trg_NoUpdate BEFORE UPDATE ON tbl_Event_Details BEGIN SELECT RAISE(ABORT, "
+                 "'tbl_Event_Details is read only'); END;")
+    cnxn.commit()
+    flagsBefore = cnxn.execute('SELECT Event_ID, QCFlag FROM tbl_Event_Details ORDER BY Event_ID').fetchall()
+
+    resultDF = engine.evaluate(querySpec.queryName)
+    candidatesBefore = engine.flagCandidateKeys(querySpec, resultDF)
+    assert len(candidatesBefore) > 0
+
+    with pytest.raises(sqlite3.IntegrityError, match='tbl_Event_Details is read only'):
+        protocolClass.processQuery(querySpec, yearlyRecDF, qcCheckInstance, dmInstance)
+
+    assert cnxn.execute('SELECT Event_ID, QCFlag FROM tbl_Event_Details ORDER BY Event_ID').fetchall() == flagsBefore
+    candidatesAfter = engine.flagCandidateKeys(querySpec, resultDF)
+    assert sorted(candidatesAfter['Event_ID']) == sorted(candidatesBefore['Event_ID'])
+
+    # Committed batch - the flags are recorded
+    cnxn.execute('DROP TRIGGER trg_NoUpdate')
+    cnxn.commit()
+    cnxn.close()
+    protocolClass.processQuery(querySpec, yearlyRecDF, qcCheckInstance, dmInstance)
+
+    assert len(engine.flagCandidateKeys(querySpec, resultDF)) == 0
@@ -0,0 +1,97 @@
+"""
+test_QC_Incremental.py
+Incremental QC mode (QC_Incremental.py) on the SQLite reference backend.
+"""
+import sqlite3
+import pytest
+import generalDM as dm
+import QC_Checks as qc
+import QC_Incremental as qci
+from conftest import fixtureYear
+
+def runIncremental(sqliteBackend, dmInstance, monkeypatch):
+    """
+    Incremental QC run for the fixture year with a new QC Check Instance, the tables read and hashed by
+    'tableFingerprint' are recorded
+
+    :return: (qcIncrementalClass instance of the run, list of the hashed tables)
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    hashedTables = []
+    tableFingerprint = dm.generalDMClass.tableFingerprint
+
+    def recordingFingerprint(tableName, inDB, *args, **kwargs):
+        hashedTables.append(tableName)
+        return tableFingerprint(tableName, inDB, *args, **kwargs)
+
+    monkeypatch.setattr(dm.generalDMClass, 'tableFingerprint', recordingFingerprint)
+    qcCheckInstance = qc.qcChecks(protocol='SNPLPORE', inDBBE=inDBBE, inDBFE=inDBFE, yearLU=fixtureYear,
+                                  inUser='tester')
+    qc.qcChecks.process_QCRequest(qcCheckInstance, dmInstance, jobs=1, incremental=True)
+
+    return qcCheckInstance.incremental, hashedTables
+
+def test_unchangedTablesReuseResults(sqliteBackend, dmInstance, monkeypatch):
+    """
+    A second run over unchanged tables reuses the results of all registered checks without hashing any table rows
+    """
+
+    firstRun, firstHashed = runIncremental(sqliteBackend, dmInstance, monkeypatch)
+    assert not firstRun.reusedChecks
+    assert set(firstHashed) >= set(firstRun.currentTables)
+
+    secondRun, secondHashed = runIncremental(sqliteBackend, dmInstance, monkeypatch)
+    registeredChecks = {queryName for queryName, tables in secondRun.checkTables.items() if tables is not None}
+    assert secondRun.changedTables == set()
+    assert secondRun.reusedChecks == registeredChecks
+    assert secondHashed == []
+
+def test_changedRowRerunsCheck(sqliteBackend, dmInstance, monkeypatch):
+    """
+    An updated row changes the change stamp of its table - only that table is hashed and only the checks reading it
+    are re-run
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    runIncremental(sqliteBackend, dmInstance, monkeypatch)
+    runIncremental(sqliteBackend, dmInstance, monkeypatch)
+
+    cnxn = sqlite3.connect(dbPath)
+    cnxn.execute("UPDATE tbl_SNPL_Observations SET SNPL_Bands = 3, Updated_Date = '2024-01-15 10:00:00' WHERE "
+                 "SNPL_Data_ID = 1")
+    cnxn.commit()
+    cnxn.close()
+
+    changedRun, changedHashed = runIncremental(sqliteBackend, dmInstance, monkeypatch)
+    assert changedRun.changedTables == {'tbl_SNPL_Observations'}
+    assert changedHashed[0] == 'tbl_SNPL_Observations' and set(changedHashed) == {'tbl_SNPL_Observations'}
+
+    rerunChecks = {queryName for queryName, tables in changedRun.checkTables.items() if tables is not None and
+                   'tbl_SNPL_Observations' in tables}
+    assert rerunChecks and not (rerunChecks & changedRun.reusedChecks)
+    assert changedRun.reusedChecks == {queryName for queryName, tables in changedRun.checkTables.items() if
+                                       tables is not None} - rerunChecks
+
+def test_missingStateTable(qcCheckInstance, sqliteBackend, monkeypatch):
+    """
+    The state reader checks for 'tbl_QC_Fingerprints' - no state if the table does not exist, a failed read of the
+    existing table is raised
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    incremental = qci.qcIncrementalClass(qcCheckInstance, object, {}, {})
+    assert incremental.readStateDF() is None
+
+    cnxn = sqlite3.connect(dbPath)
+    cnxn.execute(f'CREATE TABLE {qci.qcIncrementalClass.fingerprintTable} (Time_Frame TEXT, Object_Name TEXT)')
+    cnxn.commit()
+    cnxn.close()
+    assert incremental.readStateDF().empty
+
+    def lockedRead(query, inDB, params=None):
+        raise OSError('Back End locked')
+
+    monkeypatch.setattr(dm.generalDMClass, 'connect_to_AcessDB_DF', lockedRead)
+    with pytest.raises(OSError):
+        incremental.readStateDF()
@@ -0,0 +1,57 @@
+"""
+test_QC_Scheduler.py
+Dependency-aware QC check scheduler (QC_Scheduler.py).
+"""
+import time
+import threading
+import pytest
+import QC_Scheduler as qcs
+
+def failingCheck(failName, started, delay=0.0):
+    """
+    Check function recording the started checks, 'failName' exits as the protocol 'processQuery' does on an error
+
+    :return: checkFunction
+    """
+
+    lock = threading.Lock()
+
+    def checkFunction(checkName):
+        with lock:
+            started.append(checkName)
+        if checkName == failName:
+            exit()
+        time.sleep(delay)
+
+    return checkFunction
+
+def test_systemExitStopsPoolRun():
+    """
+    A check exiting on a worker stops the run - the queued checks are cancelled and SystemExit is raised in the
+    calling thread
+    """
+
+    started = []
+    scheduler = qcs.qcSchedulerClass(['a', 'b', 'c', 'd', 'e'], writeGroups={'d': 'tbl_Events', 'e': 'tbl_Events'},
+                                     jobs=2)
+
+    with pytest.raises(SystemExit):
+        scheduler.run(failingCheck('a', started, delay=0.5))
+
+    assert started[0] == 'a'
+    assert 'd' not in started and 'e' not in started
+    assert all(scheduler.writeDone[checkName].is_set() for checkName in scheduler.checkNames)
+
+def test_systemExitStopsSequentialRun():
+    """
+    A check exiting in a sequential run (jobs 1) stops the run and SystemExit is raised
+    """
+
+    started = []
+    scheduler = qcs.qcSchedulerClass(['a', 'b', 'c'], jobs=1)
+
+    with pytest.raises(SystemExit):
+        scheduler.run(failingCheck('b', started))
+
+    assert started == ['a', 'b']
+    assert scheduler.failed.is_set()
@@ -0,0 +1,135 @@
+"""
+test_QC_Snapshot.py
+Snapshot cache of the backend tables (QC_Snapshot.py) in a test cache directory on the SQLite reference backend.
+"""
+import os
+import sqlite3
+import pytest
+import generalDM as dm
+import QC_Snapshot as qs
+from conftest import fixtureYear
+
+@pytest.fixture
+def snapshot(sqliteBackend, tmp_path, monkeypatch):
+    """
+    Snapshot cache of the fixture Back End for the fixture year in a test cache directory
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    monkeypatch.setattr(qs.qcSnapshotClass, 'cacheDir', str(tmp_path / 'snapshots'))
+    return qs.qcSnapshotClass(inDBBE, fixtureYear)
+
+def tableReader(tableName, inDBBE, reads):
+    """
+    Backend read function of a table counting the reads
+
+    :return: Function without arguments returning the table dataframe
+    """
+
+    def readBackend():
+        reads.append(tableName)
+        return dm.generalDMClass.connect_to_AcessDB_DF(f'SELECT * FROM {tableName}', inDBBE)
+
+    return readBackend
+
+def snapshotFiles():
+    """
+    Snapshot file names in the cache directory - index and temporary files excluded
+
+    :return: Sorted list of the file names
+    """
+
+    return sorted(fileName for fileName in os.listdir(qs.qcSnapshotClass.cacheDir) if fileName !=
+                  qs.qcSnapshotClass.indexFile and not fileName.endswith('.tmp'))
+
+def test_changeStampInvalidates(snapshot, sqliteBackend):
+    """
+    A changed table stamp (updated record) reads the backend again and replaces the snapshot of the table
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    reads = []
+    readEvents = tableReader('tbl_Events', inDBBE, reads)
+
+    snapshot.readTable('tbl_Events', readEvents)
+    snapshot.readTable('tbl_Events', readEvents)
+    assert reads == ['tbl_Events']
+    firstFiles = snapshotFiles()
+
+    cnxn = sqlite3.connect(dbPath)
+    cnxn.execute("UPDATE tbl_Events SET Updated_Date = '2099-01-01 00:00:00' WHERE Event_ID = 'E0000'")
+    cnxn.commit()
+    cnxn.close()
+
+    tableDF = snapshot.readTable('tbl_Events', readEvents)
+    assert reads == ['tbl_Events', 'tbl_Events']
+    assert (tableDF['Event_ID'] == 'E0000').any()
+    assert len(snapshotFiles()) == 1 and snapshotFiles() != firstFiles
+    assert (snapshot.cacheHits, snapshot.cacheMisses) == (1, 2)
+
+def test_scopeChangeInvalidates(snapshot, sqliteBackend):
+    """
+    A changed scope (event set of the year) reads the backend again, the same scope is read from the snapshot
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    reads = []
+    readEvents = tableReader('tbl_Events', inDBBE, reads)
+
+    snapshot.readTable('tbl_Events', readEvents, scope=['E0001', 'E0002'])
+    snapshot.readTable('tbl_Events', readEvents, scope=['E0002', 'E0001'])
+    assert len(reads) == 1
+
+    snapshot.readTable('tbl_Events', readEvents, scope=['E0001', 'E0002', 'E0003'])
+    assert len(reads) == 2
+    assert len(snapshotFiles()) == 1
+
+def test_ageExpiry(snapshot, sqliteBackend):
+    """
+    A snapshot older than 'maxAgeHours' is read again from the backend
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    reads = []
+    readEvents = tableReader('tbl_Events', inDBBE, reads)
+
+    snapshot.readTable('tbl_Events', readEvents)
+    snapshotFile = os.path.join(qs.qcSnapshotClass.cacheDir, snapshotFiles()[0])
+    writeTime = os.path.getmtime(snapshotFile)
+    os.utime(snapshotFile, (writeTime, writeTime - (qs.qcSnapshotClass.maxAgeHours + 1) * 3600))
+
+    snapshot.readTable('tbl_Events', readEvents)
+    assert len(reads) == 2
+    assert os.path.getmtime(snapshotFile) > writeTime - 3600
+
+def test_leastRecentlyUsedEvicted(snapshot, sqliteBackend, monkeypatch):
+    """
+    The snapshots least recently used (read or written), not the oldest written, are evicted above 'maxCacheBytes' -
+    ranked by the cache index, file access times are not used
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    reads = []
+    tableNames = ['tbl_Events', 'tbl_Event_Details', 'tbl_SNPL_Observations']
+    for tableName in tableNames:
+        snapshot.readTable(tableName, tableReader(tableName, inDBBE, reads))
+    files = {tableName: next(fileName for fileName in snapshotFiles() if fileName.startswith(
+        snapshot.snapshotPrefix(tableName))) for tableName in tableNames}
+
+    # First written table used last
+    snapshot.readTable('tbl_Events', tableReader('tbl_Events', inDBBE, reads))
+    assert reads == tableNames
+
+    # Access times contradicting the use order
+    for accessTime, tableName in enumerate(reversed(tableNames)):
+        filePath = os.path.join(qs.qcSnapshotClass.cacheDir, files[tableName])
+        os.utime(filePath, (accessTime, os.path.getmtime(filePath)))
+
+    fileSizes = {tableName: os.path.getsize(os.path.join(qs.qcSnapshotClass.cacheDir, fileName)) for
+                 tableName, fileName in files.items()}
+    monkeypatch.setattr(qs.qcSnapshotClass, 'maxCacheBytes', fileSizes['tbl_Events'] +
+                        fileSizes['tbl_SNPL_Observations'])
+
+    assert qs.qcSnapshotClass.evict() == 1
+    assert snapshotFiles() == sorted([files['tbl_Events'], files['tbl_SNPL_Observations']])
+    assert set(qs.qcSnapshotClass.readIndex()) == set(snapshotFiles())
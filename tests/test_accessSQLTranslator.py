@@ -0,0 +1,97 @@
+"""
+test_accessSQLTranslator.py
+Access SQL to SQLite SQL translation (accessSQLTranslator.py) - the translated statements are executed on an in
+memory SQLite database.
+"""
+import sqlite3
+import pytest
+import accessSQLTranslator as sqt
+
+@pytest.fixture
+def cnxn():
+    """
+    In memory SQLite database with a small events table
+    """
+
+    cnxn = sqlite3.connect(':memory:')
+    cnxn.execute('CREATE TABLE tbl_Events (Event_ID TEXT, Start_Date TEXT, QCFlag TEXT, Verified INTEGER)')
+    cnxn.executemany('INSERT INTO tbl_Events VALUES (?, ?, ?, ?)',
+                     [('E1', '2023-04-02 08:30:00', None, -1), ('E2', '2022-05-01 09:00:00', 'LESPC', 0),
+                      ('E3', '2023-06-15 10:00:00', 'lespc;DFO', -1)])
+    cnxn.execute('CREATE TABLE tmpQCTable (Event_ID TEXT)')
+    cnxn.execute("INSERT INTO tmpQCTable VALUES ('E2')")
+    yield cnxn
+    cnxn.close()
+
+def runTranslated(cnxn, sql, params=()):
+    """
+    Translate and execute an Access SQL statement
+
+    :return: List of the result records
+    """
+
+    return cnxn.execute(sqt.accessSQLTranslatorClass().translate(sql), params).fetchall()
+
+def test_iifIsNullConcatenation(cnxn):
+    """
+    IIf, IsNull and '&' concatenation
+    """
+
+    sql = ("SELECT [Event_ID], IIf(IsNull([QCFlag]),'DFO',[QCFlag] & ';DFO') AS NewFlag FROM tbl_Events "
+           "ORDER BY [Event_ID];")
+
+    assert runTranslated(cnxn, sql) == [('E1', 'DFO'), ('E2', 'LESPC;DFO'), ('E3', 'lespc;DFO;DFO')]
+
+def test_nzLenYear(cnxn):
+    """
+    Nz, Len and Year
+    """
+
+    sql = ("SELECT [Event_ID], Nz([QCFlag],'None'), Len(Nz([QCFlag],'')), Year([Start_Date]) FROM tbl_Events "
+           "ORDER BY [Event_ID];")
+
+    assert runTranslated(cnxn, sql) == [('E1', 'None', 0, 2023), ('E2', 'LESPC', 5, 2022),
+                                        ('E3', 'lespc;DFO', 9, 2023)]
+
+def test_inStrCaseInsensitive(cnxn):
+    """
+    InStr is case insensitive as the Access text comparison
+    """
+
+    sql = "SELECT [Event_ID] FROM tbl_Events WHERE InStr(';' & [QCFlag] & ';', ?) > 0 ORDER BY [Event_ID];"
+
+    assert runTranslated(cnxn, sql, (';LESPC;',)) == [('E2',), ('E3',)]
+    assert runTranslated(cnxn, sql, (';dfo;',)) == [('E3',)]
+
+def test_dateLiteralAndTrue(cnxn):
+    """
+    #date# literals and '= True' (Access stores True as -1)
+    """
+
+    sql = "SELECT [Event_ID] FROM tbl_Events WHERE [Start_Date] >= #04/01/2023# AND [Verified] = True;"
+
+    assert runTranslated(cnxn, sql) == [('E1',), ('E3',)]
+
+def test_joinedUpdate(cnxn):
+    """
+    Joined UPDATE with a table qualified SET field
+    """
+
+    sql = ("UPDATE tmpQCTable INNER JOIN tbl_Events ON tmpQCTable.Event_ID = tbl_Events.Event_ID SET "
+           "tbl_Events.QCFlag = IIf(IsNull([QCFlag]),'DFO',[QCFlag] & ';DFO');")
+    runTranslated(cnxn, sql)
+
+    assert cnxn.execute('SELECT Event_ID, QCFlag FROM tbl_Events ORDER BY Event_ID').fetchall() == [
+        ('E1', None), ('E2', 'LESPC;DFO'), ('E3', 'lespc;DFO')]
+
+def test_translationCached():
+    """
+    Translations are cached keyed by the source SQL
+    """
+
+    translator = sqt.accessSQLTranslatorClass()
+    sql = "SELECT IIf(IsNull([QCFlag]),'None',[QCFlag]) FROM tbl_Events;"
+    assert translator.translate(sql) == translator.translate(sql)
+
+    cacheStats = translator.cacheStats()
+    assert (cacheStats['cachedStatements'], cacheStats['cacheHits'], cacheStats['cacheMisses']) == (1, 1, 1)
@@ -0,0 +1,235 @@
+"""
+test_accessSession.py
+Access COM session (accessSession.py) driven through the in-memory fake COM backend.
+"""
+import threading
+import pytest
+import accessSession as acs
+import dbBackends as dbb
+
+inDBFE = r'C:\QC\PORE_SNPL_FE.accdb'
+inDBBE = r'C:\QC\PORE_SNPL_BE.accdb'
+
+class recordingBackendClass(acs.fakeAccessBackendClass):
+    """
+    Fake COM backend recording the threads the COM calls are made on and the thread initialization
+    """
+
+    def __init__(self):
+        acs.fakeAccessBackendClass.__init__(self)
+        self.threadNames = set()
+        self.initialized = 0
+        self.uninitialized = 0
+
+    def initializeThread(self):
+        self.initialized += 1
+
+    def uninitializeThread(self):
+        self.uninitialized += 1
+
+    def openApplication(self, inDBPath):
+        self.threadNames.add(threading.current_thread().name)
+        return acs.fakeAccessBackendClass.openApplication(self, inDBPath)
+
+@pytest.fixture
+def backend():
+    """
+    Fake COM backend with an existing query and table in the Front End
+    """
+
+    backend = recordingBackendClass()
+    backend.addQuery(inDBFE, 'qsel_QA_Control', 'SELECT * FROM tbl_Events;')
+    backend.addTable(inDBFE, 'tbl_Events')
+    return backend
+
+def test_databaseOpenedOncePerSession(backend):
+    """
+    Each database is opened once per session and reused by all metadata operations
+    """
+
+    with acs.accessSessionClass(backend=backend) as session:
+        assert session.queryExists('QSEL_QA_CONTROL', inDBFE)
+        assert session.tableExists('tbl_Events', inDBFE)
+        assert not session.queryExists('qa_Missing', inDBFE)
+        session.pushQuery('SELECT Event_ID FROM tbl_Events;', 'qa_Test', inDBFE)
+        session.queryDesc('qa_Test', 'Test query', inDBFE)
+        assert backend.launchCount == 1
+
+        session.tableExists('tbl_Events', inDBBE)
+        assert backend.launchCount == 2
+
+    # A new session opens the database again
+    with acs.accessSessionClass(backend=backend) as session:
+        session.queryExists('qa_Test', inDBFE)
+    assert backend.launchCount == 3
+
+def test_comCallsOnOneThread(backend):
+    """
+    All COM calls of the session run on its single worker thread, also when called from several threads
+    """
+
+    with acs.accessSessionClass(backend=backend) as session:
+        threads = [threading.Thread(target=session.queryExists, args=('qsel_QA_Control', dbPath)) for dbPath in
+                   [inDBFE, inDBBE, r'C:\QC\Other.accdb']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        callThreads = set(session.run(lambda: threading.current_thread().name) for _ in range(3))
+
+    assert len(backend.threadNames) == 1
+    assert backend.threadNames == callThreads
+    assert next(iter(callThreads)).startswith('AccessCOM')
+    assert backend.initialized == 1 and backend.uninitialized == 1
+
+def test_queryPushAndDescription(backend):
+    """
+    A pushed query is created in the database with its description, a dropped query is deleted
+    """
+
+    with acs.accessSessionClass(backend=backend) as session:
+        session.pushQuery('SELECT Event_ID FROM tbl_Events;', 'qa_Test', inDBFE)
+        session.queryDesc('qa_Test', 'Test query', inDBFE)
+        session.queryDesc('qa_Test', 'Updated test query', inDBFE)
+
+        queryDef = backend.databaseState(inDBFE)['queries']['qa_Test']
+        assert queryDef.SQL == 'SELECT Event_ID FROM tbl_Events;'
+        assert queryDef.Properties('Description').Value == 'Updated test query'
+        assert session.catalog(inDBFE).queryDefinitions()['qa_Test'] == ('SELECT Event_ID FROM tbl_Events;',
+                                                                         'Updated test query', None)
+
+        assert session.queryExistsDelete('qa_Test', inDBFE)
+        assert 'qa_Test' not in backend.databaseState(inDBFE)['queries']
+        assert not session.queryExistsDelete('qa_Test', inDBFE)
+
+        assert session.tableExistsDelete('tbl_Events', inDBFE)
+        assert not backend.databaseState(inDBFE)['tables']
+
+def test_shutdownClosesApplications(backend):
+    """
+    On exit of the session all opened Access applications are closed, the worker thread is stopped and the previous
+    active session is restored
+    """
+
+    assert acs.accessSessionClass.activeSession is None
+    with acs.accessSessionClass(backend=backend) as session:
+        assert acs.accessSessionClass.activeSession is session
+        session.queryExists('qsel_QA_Control', inDBFE)
+        session.queryExists('qsel_QA_Control', inDBBE)
+        applications = list(session.applications.values())
+        executor = session.executor
+
+        # Nested session - the outer session is restored on exit
+        with acs.accessSessionClass(backend=backend) as innerSession:
+            assert acs.accessSessionClass.activeSession is innerSession
+        assert acs.accessSessionClass.activeSession is session
+
+    assert acs.accessSessionClass.activeSession is None
+    assert len(applications) == 2 and not any(accessApp.isOpen for accessApp in applications)
+    assert session.executor is None and session.applications == {} and session.catalogs == {}
+    with pytest.raises(RuntimeError):
+        executor.submit(lambda: None)
+
+    # A closed session is closed again without error
+    session.close()
+
+def test_accessBackendUsesActiveSession(backend):
+    """
+    The Access backend metadata operations (query definitions, description, drop) are served from the active session
+    """
+
+    accessBackend = dbb.accessBackendClass()
+    with acs.accessSessionClass(backend=backend):
+        accessBackend.setDescription('qsel_QA_Control', 'Yearly records', inDBFE)
+        assert accessBackend.queryDefinitions(inDBFE) == {'qsel_QA_Control': ('SELECT * FROM tbl_Events;',
+                                                                              'Yearly records', None)}
+        assert accessBackend.dropObject('qsel_QA_Control', inDBFE, 'query')
+        assert not accessBackend.dropObject('tbl_Missing', inDBFE, 'table')
+
+    assert backend.launchCount == 1
+
+def test_catalogCurrentAfterPushAndDrop(backend):
+    """
+    The catalog is kept current as queries and tables are pushed and dropped - no reload of the DAO collections
+    """
+
+    with acs.accessSessionClass(backend=backend) as session:
+        catalog = session.catalog(inDBFE)
+        session.pushQuery('SELECT Event_ID FROM tbl_Events;', 'qa_Test', inDBFE)
+        assert catalog.queryExists('QA_TEST')
+        assert catalog.querySQL('qa_Test') == 'SELECT Event_ID FROM tbl_Events;'
+
+        session.queryExistsDelete('qa_Test', inDBFE)
+        assert not catalog.queryExists('qa_Test')
+        assert catalog.querySQL('qa_Test') is None
+
+        session.pushQuery('SELECT Start_Date FROM tbl_Events;', 'qa_Test', inDBFE)
+        assert catalog.querySQL('qa_Test') == 'SELECT Start_Date FROM tbl_Events;'
+
+        session.registerTable('tmpQCTable', inDBFE)
+        assert catalog.tableExists('tmpqctable')
+        session.tableExistsDelete('tbl_Events', inDBFE)
+        assert not catalog.tableExists('tbl_Events')
+
+        assert session.catalog(inDBFE) is catalog
+
+def test_staleCatalogAfterExternalEdit(backend):
+    """
+    Queries created, edited or dropped outside of the session after the catalog was loaded - drops and pushes recover
+    from the stale entries and 'refreshCatalog' reloads the edits
+    """
+
+    with acs.accessSessionClass(backend=backend) as session:
+        catalog = session.catalog(inDBFE)
+
+        # Dropped outside of the session
+        del backend.databaseState(inDBFE)['queries']['qsel_QA_Control']
+        assert catalog.queryExists('qsel_QA_Control')
+        assert not session.queryExistsDelete('qsel_QA_Control', inDBFE)
+        assert not catalog.queryExists('qsel_QA_Control')
+
+        # Created outside of the session - replaced by the pushed query
+        backend.addQuery(inDBFE, 'qa_Test', 'SELECT * FROM tbl_Events;')
+        session.pushQuery('SELECT Event_ID FROM tbl_Events;', 'qa_Test', inDBFE)
+        assert backend.databaseState(inDBFE)['queries']['qa_Test'].SQL == 'SELECT Event_ID FROM tbl_Events;'
+        assert catalog.querySQL('qa_Test') == 'SELECT Event_ID FROM tbl_Events;'
+
+        # Edited outside of the session
+        backend.databaseState(inDBFE)['queries']['qa_Test'].SQL = 'SELECT Event_ID, QCFlag FROM tbl_Events;'
+        assert catalog.querySQL('qa_Test') == 'SELECT Event_ID FROM tbl_Events;'
+        assert session.refreshCatalog(inDBFE) is catalog
+        assert catalog.querySQL('qa_Test') == 'SELECT Event_ID, QCFlag FROM tbl_Events;'
+
+        # Table dropped outside of the session
+        del backend.databaseState(inDBFE)['tables']['tbl_Events']
+        assert not session.tableExistsDelete('tbl_Events', inDBFE)
+
+    # The next session loads the current catalog
+    with acs.accessSessionClass(backend=backend) as session:
+        assert session.catalog(inDBFE).queryDefinitions() == {'qa_Test': ('SELECT Event_ID, QCFlag FROM tbl_Events;',
+                                                                          None, None)}
+
+def test_pushHashRecordedOnQuery(backend):
+    """
+    The push hash is set as a QueryDef property with the hash of the SQL as stored (read back after the push), the
+    catalog and the next session read it with the query
+    """
+
+    def rewrite(sql):
+        return sql.upper()
+
+    with acs.accessSessionClass(backend=backend) as session:
+        session.pushQuery('SELECT Event_ID FROM tbl_Events;', 'qa_Test', inDBFE)
+        # Stored SQL rewritten on save
+        backend.databaseState(inDBFE)['queries']['qa_Test'].SQL = 'SELECT tbl_Events.Event_ID FROM tbl_Events;'
+
+        pushHash = session.recordPushHash('qa_Test', 'abc', rewrite, inDBFE)
+        assert pushHash == 'abc:SELECT TBL_EVENTS.EVENT_ID FROM TBL_EVENTS;'
+        queryDef = backend.databaseState(inDBFE)['queries']['qa_Test']
+        assert queryDef.Properties(acs.accessCatalogClass.pushHashProperty).Value == pushHash
+        assert session.catalog(inDBFE).queryDefinitions()['qa_Test'] == ('SELECT tbl_Events.Event_ID FROM tbl_Events;',
+                                                                         None, pushHash)
+
+    with acs.accessSessionClass(backend=backend) as session:
+        assert session.catalog(inDBFE).queryDefinitions()['qa_Test'][2] == pushHash
@@ -0,0 +1,61 @@
+"""
+test_bufferedLog.py
+Buffered log writer (bufferedLog.py) - console echo order, logfile order and flush on exit.
+"""
+import os
+import sys
+import subprocess
+import pytest
+import bufferedLog as bl
+import generalDM as dm
+
+repoDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_echoInOrderWithPrints(dmInstance, capsys):
+    """
+    The console echo of the logfile messages is written in order with the print output, the logfile has the messages
+    """
+
+    for i in range(3):
+        print(f'print {i}')
+        dm.generalDMClass.messageLogFile(dmInstance, logMsg=f'message {i}')
+
+    consoleLines = capsys.readouterr().out.splitlines()
+    assert [line.split(' - ')[0] for line in consoleLines] == ['print 0', 'message 0', 'print 1', 'message 1',
+                                                               'print 2', 'message 2']
+
+    bl.logWriter.flush()
+    with open(dmInstance.logFileName) as logFile:
+        assert [line.split(' - ')[0] for line in logFile] == ['message 0', 'message 1', 'message 2']
+
+def test_linesWrittenInOrder(tmp_path):
+    """
+    Lines queued from one thread are written to the logfile in order across batches
+    """
+
+    logWriter = bl.bufferedLogWriterClass(maxBatch=7)
+    logFilePath = str(tmp_path / 'ordered.log')
+    for i in range(1000):
+        logWriter.write(logFilePath, f'line {i}')
+    logWriter.stop()
+
+    with open(logFilePath) as logFile:
+        assert logFile.read().splitlines() == [f'line {i}' for i in range(1000)]
+    assert logWriter.linesWritten == 1000 and logWriter.batchesWritten > 1
+
+@pytest.mark.parametrize('exitCode', ['', 'raise RuntimeError("unhandled")', 'sys.exit(2)'])
+def test_flushedOnExit(tmp_path, exitCode):
+    """
+    Queued lines are written on interpreter exit without an explicit flush - normal exit, unhandled exception and
+    sys.exit
+    """
+
+    logFilePath = str(tmp_path / 'exit.log')
+    script = (f'import sys, bufferedLog as bl\n'
+              f'for i in range(2000):\n'
+              f'    bl.logWriter.write({logFilePath!r}, f"line {{i}}")\n'
+              f'{exitCode}\n')
+    subprocess.run([sys.executable, '-c', script], cwd=repoDir, capture_output=True)
+
+    with open(logFilePath) as logFile:
+        assert logFile.read().splitlines() == [f'line {i}' for i in range(2000)]
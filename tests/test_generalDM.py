@@ -0,0 +1,280 @@
+"""
+test_generalDM.py
+Data management routines (generalDM.py) on the SQLite reference backend.
+"""
+import sqlite3
+from contextlib import contextmanager
+import pytest
+import generalDM as dm
+import dbBackends as dbb
+import QC_Checks as qc
+
+def newRun():
+    """
+    Start of a new run - the query fingerprint cache is read again from the database
+    """
+
+    dm.generalDMClass.closeConnections()
+
+class rewritingBackendClass(dbb.sqliteBackendClass):
+    """
+    SQLite backend storing created views with rewritten SQL, as Access rewrites the QueryDef SQL on save
+    """
+
+    def createView(self, inQuerySel, queryName, inDB):
+        dbb.sqliteBackendClass.createView(self, inQuerySel.replace('FROM tbl_Events', 'FROM tbl_Events AS tbl_Events'),
+                                          queryName, inDB)
+
+def test_queryPushSkippedAcrossRuns(qcCheckInstance, dmInstance, sqliteBackend):
+    """
+    An unchanged query is not pushed again on the next run - the stored SQL differs from the source SQL (rewritten on
+    save), the skip compares the push hash recorded with the query.  No table is added to the Front End.
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    dm.generalDMClass.setBackend(rewritingBackendClass(defaultDB=dbPath))
+    inQuerySel = "SELECT Event_ID, IIf(IsNull([QCFlag]),'None',[QCFlag]) AS Flag FROM tbl_Events;"
+    assert qc.qcChecks.pushQueryToDB(inQuerySel, 'qsel_Test', qcCheckInstance, dmInstance)
+
+    newRun()
+    assert not qc.qcChecks.pushQueryToDB(inQuerySel, 'qsel_Test', qcCheckInstance, dmInstance)
+
+    newRun()
+    assert not qc.qcChecks.pushQueryToDB(inQuerySel, 'qsel_Test', qcCheckInstance, dmInstance)
+    assert qc.qcChecks.pushQueryToDB(inQuerySel.replace('None', 'Null'), 'qsel_Test', qcCheckInstance, dmInstance)
+
+    cnxn = sqlite3.connect(dbPath)
+    tableNames = {record[0] for record in cnxn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    cnxn.close()
+    assert 'tbl_QC_QueryHashes' not in tableNames
+
+def test_queryEditedOutsideIsPushed(qcCheckInstance, dmInstance, sqliteBackend):
+    """
+    A query edited in the database right after it was pushed (stored SQL changed) is pushed again on the next run
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    inQuerySel = "SELECT Event_ID FROM tbl_Events;"
+    assert qc.qcChecks.pushQueryToDB(inQuerySel, 'qsel_Test', qcCheckInstance, dmInstance)
+
+    cnxn = sqlite3.connect(dbPath)
+    cnxn.execute('DROP VIEW qsel_Test')
+    cnxn.execute('CREATE VIEW qsel_Test AS SELECT Event_ID, QCFlag FROM tbl_Events')
+    cnxn.commit()
+    cnxn.close()
+
+    newRun()
+    assert qc.qcChecks.pushQueryToDB(inQuerySel, 'qsel_Test', qcCheckInstance, dmInstance)
+    columns = dm.generalDMClass.connect_to_AcessDB_DF('SELECT * FROM qsel_Test', qcCheckInstance.inDBFE).columns
+    assert list(columns) == ['Event_ID']
+
+    newRun()
+    assert not qc.qcChecks.pushQueryToDB(inQuerySel, 'qsel_Test', qcCheckInstance, dmInstance)
+
+def test_executeBatchRollsBack(dmInstance, sqliteBackend):
+    """
+    A failed statement rolls back the whole batch and the error is raised - no statement of the batch is committed
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    cnxn = sqlite3.connect(dbPath)
+    flagsBefore = cnxn.execute('SELECT Event_ID, QCFlag FROM tbl_Events ORDER BY Event_ID').fetchall()
+    cnxn.close()
+
+    writeBatch = dm.statementBatchClass(inDBBE)
+    writeBatch.add("UPDATE tbl_Events SET QCFlag = 'DFO';", label='flag all')
+    writeBatch.add("UPDATE tbl_Missing SET QCFlag = 'DFO';", label='missing table')
+
+    with pytest.raises(Exception):
+        dm.generalDMClass.executeBatch(writeBatch, dmInstance)
+
+    assert len(writeBatch) == 0
+    cnxn = sqlite3.connect(dbPath)
+    assert cnxn.execute('SELECT Event_ID, QCFlag FROM tbl_Events ORDER BY Event_ID').fetchall() == flagsBefore
+    cnxn.close()
+
+    # Committed batch
+    writeBatch.add("UPDATE tbl_Events SET QCFlag = ?;", params=('DFO',), label='flag all')
+    timingDF = dm.generalDMClass.executeBatch(writeBatch, dmInstance)
+
+    assert list(timingDF['Label']) == ['flag all']
+    cnxn = sqlite3.connect(dbPath)
+    assert {record[0] for record in cnxn.execute('SELECT QCFlag FROM tbl_Events')} == {'DFO'}
+    cnxn.close()
+
+def test_accessReadErrorsRaised(sqliteBackend, monkeypatch):
+    """
+    The Access backend read raises the error of a failed query (no exit, no partial result) and reads a valid query -
+    the pooled ODBC connection is replaced by a connection to the fixture database
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+
+    @contextmanager
+    def pooledConnection(inDB):
+        cnxn = sqlite3.connect(dbPath)
+        try:
+            yield cnxn
+        finally:
+            cnxn.close()
+
+    monkeypatch.setattr(dm.generalDMClass, 'pooledConnection', pooledConnection)
+    accessBackend = dbb.accessBackendClass()
+
+    assert len(accessBackend.readDF('SELECT Event_ID FROM tbl_Events', inDBBE)) == 60
+    with pytest.raises(sqlite3.OperationalError):
+        accessBackend.readDF('SELECT * FROM tbl_Missing', inDBBE)
+
+    dm.generalDMClass.setBackend(accessBackend)
+    with pytest.raises(sqlite3.OperationalError):
+        dm.generalDMClass.connect_to_AcessDB_DF('SELECT * FROM tbl_Missing', inDBBE)
+
+def test_readColumnarInfersWholeBatch(sqliteBackend):
+    """
+    Columns without a driver type code (SQLite) are typed from all values of a batch and widened by later batches -
+    int/float mixes are not truncated, int columns with nulls are Int32, other mixes are object
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    cnxn = sqlite3.connect(dbPath)
+    cnxn.execute('CREATE TABLE tbl_Mixed (Row_ID INTEGER, Int_Value, Mixed_Value, Late_Float, Late_Text, Flag)')
+    cnxn.executemany('INSERT INTO tbl_Mixed VALUES (?, ?, ?, ?, ?, ?)',
+                     [(1, 5, 1, None, 7, 'A'), (2, None, 2.5, 2, 8, None), (3, 7, 3, 3, 9, 'B'),
+                      (4, 8, None, 4.75, 'x', 'A'), (5, 9, 5, None, 10, 'B')])
+    cnxn.commit()
+    cnxn.close()
+
+    for chunkSize in (2, 10):
+        columnarDF = dm.generalDMClass.readColumnarDF('SELECT * FROM tbl_Mixed ORDER BY Row_ID', inDBBE,
+                                                      categoricalColumns=['Flag'], chunkSize=chunkSize)
+
+        assert str(columnarDF['Row_ID'].dtype) == 'int32'
+        assert str(columnarDF['Int_Value'].dtype) == 'Int32'
+        assert columnarDF['Int_Value'].isna().tolist() == [False, True, False, False, False]
+        assert columnarDF['Mixed_Value'].dtype == 'float64'
+        assert columnarDF['Mixed_Value'].tolist()[:2] == [1.0, 2.5]
+        assert columnarDF['Late_Float'].dtype == 'float64'
+        assert columnarDF['Late_Float'].tolist()[1:4] == [2.0, 3.0, 4.75]
+        assert columnarDF['Late_Text'].dtype == object
+        assert columnarDF['Late_Text'].tolist() == [7, 8, 9, 'x', 10]
+        assert columnarDF['Flag'].dtype == 'category'
+        assert columnarDF['Flag'].isna().tolist() == [False, True, False, False, False]
+
+class odbcConnectionClass:
+    """
+    SQLite connection standing in for a pooled PYODBC connection - 'getinfo' fails once the connection is closed or
+    marked broken, 'rollback' fails if marked broken
+    """
+
+    def __init__(self, dbPath):
+        self.cnxn = sqlite3.connect(dbPath, check_same_thread=False)
+        self.closed = False
+        self.broken = False
+
+    def getinfo(self, infoType):
+        if self.closed or self.broken:
+            raise sqlite3.ProgrammingError('Connection is not open')
+        # SQL_CURSOR_COMMIT_BEHAVIOR - prepared statements are preserved
+        return 2 if infoType == dbb.accessBackendClass.odbcCursorCommitBehavior else 'SQLite'
+
+    def cursor(self):
+        return self.cnxn.cursor()
+
+    def commit(self):
+        self.cnxn.commit()
+
+    def rollback(self):
+        if self.broken:
+            raise sqlite3.OperationalError('Communication link failure')
+        self.cnxn.rollback()
+
+    def close(self):
+        self.closed = True
+        self.cnxn.close()
+
+@pytest.fixture
+def odbcPool(sqliteBackend, monkeypatch):
+    """
+    Connection pool of SQLite stand in connections to the fixture database, the Access backend is the run backend
+
+    :return: (pool, accessBackend, opened connections)
+    """
+
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    opened = []
+
+    def connect_DB_Access(inDB):
+        opened.append(odbcConnectionClass(dbPath))
+        return opened[-1]
+
+    pool = dm.connectionPoolClass(maxIdlePerDB=1)
+    accessBackend = dbb.accessBackendClass()
+    monkeypatch.setattr(dm.generalDMClass, 'connect_DB_Access', connect_DB_Access)
+    monkeypatch.setattr(dm.generalDMClass, 'connectionPool', pool)
+    dm.generalDMClass.setBackend(accessBackend)
+
+    return pool, accessBackend, opened
+
+def test_connectionPoolReuse(odbcPool, sqliteBackend):
+    """
+    Released connections are reused, unhealthy idle connections are discarded, the pool keeps at most 'maxIdlePerDB'
+    idle connections per database and 'closeAll' closes the idle connections
+    """
+
+    pool, accessBackend, opened = odbcPool
+    inDBBE, inDBFE, dbPath = sqliteBackend
+
+    cnxn = pool.acquire(inDBBE)
+    pool.release(inDBBE, cnxn)
+    assert pool.acquire(inDBBE) is cnxn
+
+    # Pool full - the second released connection is closed
+    otherCnxn = pool.acquire(inDBBE)
+    pool.release(inDBBE, cnxn)
+    pool.release(inDBBE, otherCnxn)
+    assert otherCnxn.closed and not cnxn.closed
+
+    # Health check before reuse - the broken idle connection is replaced
+    cnxn.broken = True
+    newCnxn = pool.acquire(inDBBE)
+    assert newCnxn is not cnxn and not newCnxn.closed and cnxn.closed
+    pool.release(inDBBE, newCnxn)
+    pool.release(inDBFE, pool.acquire(inDBFE))
+
+    statsDic = pool.closeAll()
+    assert statsDic == {'connectsOpened': 4, 'connectsSaved': 1, 'connectsDiscarded': 1, 'idleConnections': 2}
+    assert all(connection.closed for connection in opened)
+    assert pool.poolStats()['idleConnections'] == 0
+
+def test_preparedCursorsEvicted(odbcPool, sqliteBackend):
+    """
+    The prepared statement cache reuses the cursor per connection and drops the cursors of connections closed by the
+    pool - stale on acquire, failed rollback on release and at teardown
+    """
+
+    pool, accessBackend, opened = odbcPool
+    inDBBE, inDBFE, dbPath = sqliteBackend
+    selectSQL = 'SELECT Count(*) AS Events FROM tbl_Events WHERE Event_ID <> ?'
+
+    for _ in range(3):
+        assert accessBackend.readPrepared(selectSQL, ('E0000',), inDBBE)['Events'][0] == 59
+    statsDF = accessBackend.statementCacheStats()
+    assert statsDF[['Prepares', 'Executions']].values.tolist() == [[1, 3]]
+    assert list(accessBackend.preparedCursors) == [opened[0]]
+
+    # Stale on acquire
+    opened[0].broken = True
+    accessBackend.readPrepared(selectSQL, ('E0000',), inDBBE)
+    assert list(accessBackend.preparedCursors) == [opened[1]]
+
+    # Failed rollback on release
+    cnxn = pool.acquire(inDBBE)
+    assert cnxn is opened[1]
+    cnxn.broken = True
+    pool.release(inDBBE, cnxn)
+    assert accessBackend.preparedCursors == {}
+
+    accessBackend.readPrepared(selectSQL, ('E0000',), inDBBE)
+    assert list(accessBackend.preparedCursors) == [opened[2]]
+    pool.closeAll()
+    assert accessBackend.preparedCursors == {}